@@ -0,0 +1 @@
+'''Benchmarks for the frequency_analysis package. Run modules with "python -m benchmarks.<name>".'''
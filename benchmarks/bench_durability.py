@@ -0,0 +1,42 @@
+'''Benchmark of ingestion speed for each durability profile.
+
+Usage: python -m benchmarks.bench_durability [number of sentences]
+'''
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from benchmarks.corpus import sentences
+from frequency_analysis import Analysis
+from frequency_analysis.db_create import DURABILITY
+
+
+def measure(data, **kwargs):
+    '''Return number of counted sentences per second for the new analysis in a temp folder.'''
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = perf_counter()
+            with Analysis(**kwargs) as analysis:
+                for word_list in data:
+                    analysis.count_all(word_list, pos=True)
+            return len(data) / (perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+
+
+def main(number=5000):
+    data = sentences(number)
+    print(f'{number} sentences, {sum(map(len, data))} words')
+    print(f'{"Profile":>8} | {"per-row, sent/s":>16} | {"accumulated, sent/s":>20}')
+    for durability in DURABILITY:
+        row = measure(data, durability=durability)
+        accumulated = measure(data, durability=durability, buffer_size=100000)
+        print(f'{durability:>8} | {row:>16,.0f} | {accumulated:>20,.0f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
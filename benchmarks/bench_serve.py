@@ -0,0 +1,106 @@
+'''Load test of the HTTP query server (python -m frequency_analysis.serve).
+
+Creates analysis of the synthetic corpus in a temp folder, starts the server in a subprocess
+and measures throughput and latency of word lookups for each number of concurrent clients
+(each client sends requests one by one over its own keep-alive connection).
+
+Usage: python -m benchmarks.bench_serve [number of sentences] [seconds for each step]
+'''
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from benchmarks.corpus import sentences
+from frequency_analysis import Analysis
+
+CLIENTS = (1, 8, 32, 128)
+
+
+async def request(reader, writer, target: str) -> dict:
+    '''Send GET request over the keep-alive connection and return JSON of the response.'''
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    length = next(
+        int(line.split(':')[1])
+        for line in head.split('\r\n')
+        if line.lower().startswith('content-length')
+    )
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(port: int, words: list, deadline: float, latencies: list):
+    '''Look up random words until the deadline.'''
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    rnd = random.Random(len(latencies))
+    while perf_counter() < deadline:
+        start = perf_counter()
+        await request(reader, writer, f'/word?word={rnd.choice(words)}')
+        latencies.append(perf_counter() - start)
+    writer.close()
+
+
+async def load(port: int, words: list, clients: int, seconds: float) -> tuple:
+    '''Return (requests per second, p50 ms, p95 ms) for the number of concurrent clients.'''
+    latencies: list = []
+    start = perf_counter()
+    await asyncio.gather(
+        *(client(port, words, start + seconds, latencies) for _ in range(clients))
+    )
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95)] * 1000,
+    )
+
+
+async def stats(port: int) -> dict:
+    '''Return statistics of the server.'''
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    result = await request(reader, writer, '/stats')
+    writer.close()
+    return result
+
+
+def main(number=20000, seconds=3.0):
+    data = sentences(number)
+    words = sorted({x.strip('.,!?;:').lower() for sentence in data for x in sentence})
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            with Analysis(durability='bulk') as analysis:
+                analysis.count_stream(data)
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'frequency_analysis.serve', '--port', '0'],
+                stdout=subprocess.PIPE,
+                text=True,
+                env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+            )
+            try:
+                port = int(server.stdout.readline().rsplit(':', 1)[1])
+                print(f'{number} sentences, {len(words)} words, {seconds} s for each step')
+                print(f'{"Clients":>8} | {"requests/s":>11} | {"p50, ms":>8} | {"p95, ms":>8}')
+                for clients in CLIENTS:
+                    rate, p50, p95 = asyncio.run(load(port, words, clients, float(seconds)))
+                    print(f'{clients:>8} | {rate:>11,.0f} | {p50:>8.2f} | {p95:>8.2f}')
+                batching = asyncio.run(stats(port))['batching']
+                print(
+                    f'{batching["lookups"]} word lookups were read by {batching["batches"]} queries'
+                )
+            finally:
+                server.terminate()
+                server.wait()
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(*(kind(x) for kind, x in zip((int, float), sys.argv[1:])))
@@ -0,0 +1,205 @@
+'''Benchmark suite of ingestion and report generation with results saved as JSON.
+
+Ingestion – sentences per second of count_all(), count_words() and count_symbols() calls
+    for each combination of pos/bigram flags and analysis mode:
+        n – new analysis;
+        a – append the corpus to the analysis of the same corpus;
+        c – continue the analysis of the first half of the corpus with the whole corpus.
+Reports – wall time and peak memory of Python allocations (tracemalloc) of treat()
+    and each sheet_*() method (with closing of the workbook) for the analysis of the corpus.
+Corpus – seeded Zipf-distributed Latin and Cyrillic pseudo-words (see corpus.zipf_sentences()).
+
+Usage:
+    python -m benchmarks.bench_suite [--sentences N] [--min-length N] [--max-length N]
+                                     [--vocabulary N] [--exponent X] [--output FILE.json]
+    python -m benchmarks.bench_suite --compare OLD.json NEW.json
+'''
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.corpus import zipf_sentences
+from frequency_analysis import Analysis, Result
+
+METHODS = ('count_all', 'count_words', 'count_symbols')
+MODES = ('n', 'a', 'c')
+
+#   (sheet method, positional arguments)
+SHEETS = (
+    ('treat', ()),
+    ('sheet_stats', ()),
+    ('sheet_top_symbols', ()),
+    ('sheet_top_symbol_bigrams', ()),
+    ('sheet_all_symbol_bigrams', ()),
+    ('sheet_top_words', ()),
+    ('sheet_top_word_bigrams', ()),
+    ('sheet_en_top_symbols', ()),
+    ('sheet_ru_top_symbols', ()),
+    ('sheet_en_symbol_bigrams', ()),
+    ('sheet_ru_symbol_bigrams', ()),
+    ('sheet_custom_top_symbols', ('aeiouаеиоу',)),
+    ('sheet_custom_symbol_bigrams', ('aeiouаеиоу',)),
+    ('sheet_prefix_words', (('ta', 'не', 'qu'),)),
+)
+
+
+def count(data, method: str, pos: bool, bigrams: bool, mode: str):
+    '''Count all sentences by the method in the analysis of the current folder.'''
+    with Analysis(mode=mode) as analysis:
+        call = getattr(analysis, method)
+        if method == 'count_all':
+            for word_list in data:
+                call(word_list, pos, bigrams, bigrams)
+        else:
+            for word_list in data:
+                call(word_list, pos, bigrams)
+
+
+def ingestion(data, method: str, pos: bool, bigrams: bool, mode: str) -> float:
+    '''Return sentences per second of the method in the mode (in a temp folder).'''
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            if mode != 'n':
+                previous = data if mode == 'a' else data[: len(data) // 2]
+                count(previous, method, pos, bigrams, 'n')
+            start = perf_counter()
+            count(data, method, pos, bigrams, mode)
+            return len(data) / (perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+
+
+def reports(data) -> dict:
+    '''Return {sheet method: {"seconds", "peak_mb"}} for the analysis of the data.'''
+    result = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            with Analysis(durability='bulk') as analysis:
+                analysis.count_stream(data, pos=True)
+            for method, args in SHEETS:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    tracemalloc.start()
+                    start = perf_counter()
+                    with Result() as writer:
+                        getattr(writer, method)(*args)
+                    seconds = perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                os.remove(os.path.join('frequency_analysis', 'result.xlsx'))
+                result[method] = {'seconds': seconds, 'peak_mb': peak / 2**20}
+        finally:
+            os.chdir(cwd)
+    return result
+
+
+def environment() -> dict:
+    '''Return versions and commit of the measured code.'''
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def run(args) -> dict:
+    '''Measure ingestion and reports for the corpus of the arguments.'''
+    corpus = {
+        'sentences': args.sentences,
+        'min_length': args.min_length,
+        'max_length': args.max_length,
+        'vocabulary': args.vocabulary,
+        'exponent': args.exponent,
+    }
+    data = zipf_sentences(
+        args.sentences,
+        min_length=args.min_length,
+        max_length=args.max_length,
+        vocabulary=args.vocabulary,
+        exponent=args.exponent,
+    )
+    print(f'{args.sentences} sentences, {sum(map(len, data))} words')
+    print(f'{"Method":>14} | {"pos":>5} | {"bigrams":>7} | {"mode":>4} | {"sent/s":>9}')
+    results = {'environment': environment(), 'corpus': corpus, 'ingestion': {}}
+    for method, pos, bigrams, mode in itertools.product(
+        METHODS, (False, True), (False, True), MODES
+    ):
+        rate = ingestion(data, method, pos, bigrams, mode)
+        key = f'{method} pos={pos} bigrams={bigrams} mode={mode}'
+        results['ingestion'][key] = rate
+        print(f'{method:>14} | {pos!s:>5} | {bigrams!s:>7} | {mode:>4} | {rate:>9,.0f}')
+
+    results['reports'] = reports(data)
+    print(f'\n{"Sheet method":>28} | {"seconds":>8} | {"peak, MB":>8}')
+    for method, values in results['reports'].items():
+        print(f'{method:>28} | {values["seconds"]:>8.3f} | {values["peak_mb"]:>8.1f}')
+    return results
+
+
+def compare(old_path: str, new_path: str):
+    '''Print ratios of new results to old ones (>1 – faster ingestion, slower/bigger reports).'''
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f'{old["environment"]["commit"]} -> {new["environment"]["commit"]}')
+    if old['corpus'] != new['corpus']:
+        print('Warning: results are measured with different corpora')
+    for key, rate in new['ingestion'].items():
+        if key in old['ingestion']:
+            print(f'{key:>48} | sent/s x{rate / old["ingestion"][key]:.2f}')
+    for method, data in new['reports'].items():
+        if method in old['reports']:
+            previous = old['reports'][method]
+            print(
+                f'{method:>48} | time x{data["seconds"] / previous["seconds"]:.2f}'
+                f' | peak x{data["peak_mb"] / previous["peak_mb"]:.2f}'
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_suite')
+    parser.add_argument('--sentences', type=int, default=2000)
+    parser.add_argument('--min-length', type=int, default=3)
+    parser.add_argument('--max-length', type=int, default=25)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--exponent', type=float, default=1.0, help='Zipf exponent')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = run(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'\nResults are saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,47 @@
+'''Benchmark of symbol counting speed for each symbol backend.
+
+Direct count_symbols() calls are compared with batched count_stream() calls
+(the numpy backend counts symbols of the whole batch with array operations).
+
+Usage: python -m benchmarks.bench_symbols [number of sentences]
+'''
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from benchmarks.corpus import sentences
+from frequency_analysis import Analysis
+
+
+def measure(data, stream, **kwargs):
+    '''Return number of counted sentences per second for the new analysis in a temp folder.'''
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = perf_counter()
+            with Analysis(**kwargs) as analysis:
+                if stream:
+                    analysis.count_stream(data, pos=True, words=False)
+                else:
+                    for word_list in data:
+                        analysis.count_symbols(word_list, pos=True)
+            return len(data) / (perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+
+
+def main(number=5000):
+    data = sentences(number)
+    print(f'{number} sentences, {sum(map(len, data))} words')
+    print(f'{"Backend":>8} | {"calls, sent/s":>14} | {"stream, sent/s":>15}')
+    for backend in ('sql', 'numpy'):
+        calls = measure(data, False, symbol_backend=backend, buffer_size=100000)
+        stream = measure(data, True, symbol_backend=backend, buffer_size=100000)
+        print(f'{backend:>8} | {calls:>14,.0f} | {stream:>15,.0f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
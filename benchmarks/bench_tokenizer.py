@@ -0,0 +1,89 @@
+'''Micro-benchmark of the Tokenizer against the previous regex-per-word implementation.
+
+Usage: python -m benchmarks.bench_tokenizer [number of sentences]
+'''
+
+import random
+import re
+import sys
+from inspect import signature
+from time import perf_counter
+
+from frequency_analysis.frequency import Analysis
+from frequency_analysis.tokenizer import Tokenizer
+
+WORDS = (
+    'the', 'of', 'United', 'Nations', "don't", 'well-known', 'co-operation', 'e-mail',
+    'мир', 'Ёлка', 'тест-драйв', '(see', 'note)', '1999', 'A/RES/55/2', 'and/or', '«цитата»',
+)
+PUNCTUATION = ('', '', '', '.', ',', '!', ';')
+
+
+def old_create_clear_word_list(word_pattern, word_list):
+    '''The previous FrequencyAnalysis.__create_clear_word_list() implementation.'''
+    shift = 0
+    clear_word_list = []
+    for n, word in enumerate(word_list[:], 1):
+        if res := re.findall(word_pattern, word):
+            [clear_word_list.append(x) for x in res]
+            [word_list.insert(n + shift, '') for _ in range(len(res) - 1)]
+            shift += len(res) - 1
+        else:
+            clear_word_list.append('')
+    return clear_word_list
+
+
+def old_classify(word_pattern, allowed_symbols, word):
+    '''The previous per-symbol classification from FrequencyAnalysis.__count_symbols().'''
+    return [bool(re.search(word_pattern, x)) for x in word if x in allowed_symbols]
+
+
+def new_classify(tokenizer, word):
+    '''Per-symbol classification with the precomputed Tokenizer sets.'''
+    allowed_symbols = tokenizer.allowed_symbols
+    word_symbols = tokenizer.word_symbols
+    return [x in word_symbols for x in word if x in allowed_symbols]
+
+
+def sentences(number, length, seed=0):
+    '''Generate reproducible sentences with the fixed number of words.'''
+    rnd = random.Random(seed)
+    return [
+        [rnd.choice(WORDS) + rnd.choice(PUNCTUATION) for _ in range(length)]
+        for _ in range(number)
+    ]
+
+
+def measure(func, data):
+    '''Return number of processed sentences per second.'''
+    start = perf_counter()
+    for word_list in data:
+        func(word_list)
+    return len(data) / (perf_counter() - start)
+
+
+def main(number=2000):
+    parameters = signature(Analysis).parameters
+    word_pattern = parameters['word_pattern'].default
+    allowed_symbols = [chr(x) for x in parameters['allowed_symbols'].default]
+    tokenizer = Tokenizer(word_pattern, allowed_symbols)
+
+    print(f'{"Words":>6} | {"old split/s":>12} | {"new split/s":>12} | {"x":>6} | '
+          f'{"old symb/s":>12} | {"new symb/s":>12} | {"x":>6}')
+    for length in (5, 20, 100, 500):
+        data = sentences(max(number * 20 // length, 10), length)
+        old_split = measure(lambda x: old_create_clear_word_list(word_pattern, x[:]), data)
+        new_split = measure(tokenizer.split, data)
+        old_symb = measure(
+            lambda x: [old_classify(word_pattern, allowed_symbols, w) for w in x], data
+        )
+        new_symb = measure(lambda x: [new_classify(tokenizer, w) for w in x], data)
+        print(
+            f'{length:>6} | {old_split:>12,.0f} | {new_split:>12,.0f} | '
+            f'{new_split / old_split:>6.1f} | {old_symb:>12,.0f} | {new_symb:>12,.0f} | '
+            f'{new_symb / old_symb:>6.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,68 @@
+'''Reproducible synthetic corpus for benchmarks.'''
+
+import random
+
+SYLLABLES = ('ta', 'ne', 'ro', 'si', 'ka', 'mu', 'le', 'po', 'in', 'th', 'er', 'an', 'st', 'qu')
+PUNCTUATION = ('', '', '', '', '', '.', ',', '!', '?', ';', ':')
+
+
+def sentences(number: int, seed=0, min_length=3, max_length=25, vocabulary=20000):
+    '''Generate list of sentences (word lists) from a random vocabulary of pseudo-words.'''
+    rnd = random.Random(seed)
+    words = [
+        ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(1, 5)))
+        for _ in range(vocabulary)
+    ]
+    result = []
+    for _ in range(number):
+        sentence = [rnd.choice(words) + rnd.choice(PUNCTUATION)]
+        sentence += (
+            rnd.choice(words) + rnd.choice(PUNCTUATION)
+            for _ in range(rnd.randint(min_length, max_length) - 1)
+        )
+        sentence[0] = sentence[0].capitalize()
+        result.append(sentence)
+    return result
+
+
+LATIN_SYLLABLES = SYLLABLES
+CYRILLIC_SYLLABLES = (
+    'та', 'не', 'ро', 'си', 'ка', 'му', 'ле', 'по', 'ин', 'ст', 'ер', 'ан', 'ё', 'жи'
+)
+
+
+def zipf_sentences(
+    number: int,
+    seed=0,
+    min_length=3,
+    max_length=25,
+    vocabulary=50000,
+    exponent=1.0,
+    cyrillic=0.5,
+):
+    '''Generate list of sentences with Zipf-distributed words (rank r has weight 1 / r ** exponent).
+
+    cyrillic – share of Cyrillic pseudo-words in the vocabulary (the rest are Latin),
+        both alphabets are spread over all ranks.
+    '''
+    rnd = random.Random(seed)
+    words = []
+    for _ in range(vocabulary):
+        syllables = CYRILLIC_SYLLABLES if rnd.random() < cyrillic else LATIN_SYLLABLES
+        words.append(''.join(rnd.choice(syllables) for _ in range(rnd.randint(1, 4))))
+    weights = []
+    total = 0.0
+    for rank in range(1, vocabulary + 1):
+        total += 1 / rank**exponent
+        weights.append(total)
+    result = []
+    for _ in range(number):
+        sentence = [
+            x + rnd.choice(PUNCTUATION)
+            for x in rnd.choices(
+                words, cum_weights=weights, k=rnd.randint(min_length, max_length)
+            )
+        ]
+        sentence[0] = sentence[0].capitalize()
+        result.append(sentence)
+    return result
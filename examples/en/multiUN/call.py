@@ -1,11 +1,22 @@
-import io
 from datetime import datetime
+from html import unescape
 from os import listdir
-from bs4 import BeautifulSoup
 
 import frequency_analysis
 
 
+def s_tags(text):
+    '''Split XML text to contents of <s> tags (the last element is the unfinished one).'''
+    *sentences, rest = text.split('</s>')
+    start = max(rest.rfind('<s>'), rest.rfind('<s '))
+    if start == -1:
+        # only a tag, which is cut by the end of the chunk, is carried to the next one
+        start = rest.rfind('<')
+        if start == -1 or '>' in rest[start:]:
+            start = len(rest)
+    return [unescape(x[x.rfind('>') + 1 :]) for x in sentences] + [rest[start:]]
+
+
 start = datetime.now()
 file_list = listdir('multiUN/')
 word_pattern = '[a-zA-Z]+(?:(?:-?[a-zA-Z]+)+|\'?[a-zA-Z]+)|[a-zA-Z]'
@@ -15,12 +26,7 @@ with frequency_analysis.Analysis(
     mode='n', word_pattern=word_pattern, allowed_symbols=allowed_symbols
 ) as analyze:
     for n, file in enumerate(file_list):
-        with io.open('multiUN/' + file, mode='r', encoding='utf-8') as f:
-            data = f.read()
-        bs_data = BeautifulSoup(data, 'xml')
-
-        for sentence in bs_data.find_all('s'):
-            analyze.count_all(sentence.text.split(), pos=True)
+        analyze.count_file('multiUN/' + file, s_tags, pos=True)
         print(n, file)
 print('fin at:', datetime.now().strftime('%H:%M:%S'))
 print('total time taked to analysis:', datetime.now() - start)
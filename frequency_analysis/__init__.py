@@ -1,5 +1,7 @@
 ﻿'''Symbol/symbol bigram/word/word bigram frequency analyzer with excel output.'''
+from frequency_analysis.export import Export
 from frequency_analysis.frequency import Analysis
 from frequency_analysis.results import Result
+from frequency_analysis.store import FrequencyStore
 
 __version__ = '0.1.4.5'
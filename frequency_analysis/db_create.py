@@ -1,6 +1,155 @@
 ﻿'''Additional module to frequency.py for creating separate DB for each analysis.'''
 
 import io
+import os
+import sqlite3
+import time
+from typing import Iterator
+
+from frequency_analysis import queries
+
+#   journal_mode, synchronous, cache_size, page_size, mmap_size – SQLite pragmas
+#       (page_size is applied only to a new DB);
+#   commit_rows – number of written rows between commits;
+#   commit_interval – max number of seconds between commits.
+DURABILITY = {
+    # the DB is always consistent, a crash loses only uncommitted data
+    'safe': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'page_size': 4096,
+        'mmap_size': 0,
+        'commit_rows': 10000,
+        'commit_interval': 10,
+    },
+    # WAL journal – the DB is consistent, but the last commits can be lost on power failure
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'page_size': 4096,
+        'mmap_size': 1 << 28,
+        'commit_rows': 100000,
+        'commit_interval': 30,
+    },
+    # no journal and no syncs – a crash during the analysis can corrupt the DB
+    'bulk': {
+        'journal_mode': 'OFF',
+        'synchronous': 'OFF',
+        'cache_size': -524288,
+        'page_size': 65536,
+        'mmap_size': 1 << 30,
+        'commit_rows': 1000000,
+        'commit_interval': 300,
+    },
+}
+
+#   progress of the analysis for each input source, saved in the same transaction as the data
+#       source        – file path, or '' for sentences passed directly (and unnamed streams);
+#       sentences     – number of counted sentences of the source;
+#       file_position – text file position from tell() after the last read chunk
+#                         (opaque value, can exceed 64 bits, so it's kept as TEXT);
+#       file_tail     – unfinished text before file_position;
+#       file_skip     – number of counted sentences after file_position.
+CHECKPOINTS = '''
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        source TEXT PRIMARY KEY,
+        sentences INTEGER NOT NULL,
+        file_position TEXT,
+        file_tail TEXT,
+        file_skip INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+'''
+
+#   n-grams of order 3 and more (see ngrams.py)
+NGRAMS = '''
+    CREATE TABLE IF NOT EXISTS {} (
+        n INTEGER,
+        key,
+        quantity INTEGER NOT NULL,
+        as_first INTEGER NOT NULL,
+        as_last INTEGER NOT NULL,
+        position_sum INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (n, key)
+    ) WITHOUT ROWID;
+'''
+
+#   integer IDs of words for word bigrams, packed n-gram keys and ye/yo pairs
+VOCABULARY = '''
+    CREATE TABLE IF NOT EXISTS vocabulary (
+        id INTEGER PRIMARY KEY,
+        word TEXT NOT NULL UNIQUE
+    );
+'''
+
+#   word bigrams by IDs of both words from the "vocabulary" table
+#       (error – max overcount of quantity in heavy hitters mode, see heavy.py)
+WORD_BIGRAMS = '''
+    CREATE TABLE {} (
+        first_id INTEGER,
+        second_id INTEGER,
+        quantity INTEGER NOT NULL,
+        as_first INTEGER NOT NULL,
+        as_last INTEGER NOT NULL,
+        position_sum INTEGER NOT NULL DEFAULT 0,
+        error INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (first_id, second_id),
+        FOREIGN KEY (first_id)
+            REFERENCES vocabulary (id),
+        FOREIGN KEY (second_id)
+            REFERENCES vocabulary (id)
+    ) WITHOUT ROWID;
+'''
+
+#   ye/yo word pairs by IDs from the "vocabulary" table with quantities of both writings
+#   (NULL quantities – pairs aren't counted during the analysis, see yo.py)
+YO_WORDS = '''
+    CREATE TABLE {} (
+        yo_id INTEGER,
+        ye_id INTEGER,
+        mandatory BOOLEAN,
+        yo_quantity INTEGER,
+        ye_quantity INTEGER,
+        PRIMARY KEY (yo_id, ye_id),
+        FOREIGN KEY (yo_id)
+            REFERENCES vocabulary (id),
+        FOREIGN KEY (ye_id)
+            REFERENCES vocabulary (id)
+    ) WITHOUT ROWID;
+'''
+
+#   indexes for the top-list queries of the result sheets (see finalize()):
+#       rows are read in descending quantity order without sorting the whole table,
+#       and all selected columns are in the index (primary key columns are included implicitly);
+#       they are dropped before further counting (see drop_indexes())
+INDEXES = {
+    'words_by_quantity': 'words (quantity DESC, word, as_first, as_last, position_sum, error)',
+    'word_bigrams_by_quantity': '''
+        word_bigrams (quantity DESC, as_first, as_last, position_sum, error)
+    ''',
+    'symbol_ngrams_by_quantity': '''
+        symbol_ngrams (n, quantity DESC, key, as_first, as_last, position_sum)
+    ''',
+    'word_ngrams_by_quantity': '''
+        word_ngrams (n, quantity DESC, key, as_first, as_last, position_sum)
+    ''',
+}
+
+
+def create_additional(cursor):
+    '''Create tables of checkpoints and n-grams if they are missing.'''
+    cursor.execute(CHECKPOINTS)
+    cursor.execute(NGRAMS.format('symbol_ngrams'))
+    cursor.execute(NGRAMS.format('word_ngrams'))
+    cursor.execute(VOCABULARY)
+
+
+def set_durability(db, durability: str):
+    '''Set SQLite pragmas of the chosen durability profile.'''
+    profile = DURABILITY[durability]
+    for pragma in ('page_size', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size'):
+        db.execute(f'PRAGMA {pragma}={profile[pragma]};')
 
 
 def create_new(db, allowed_symbols):
@@ -13,7 +162,7 @@ def create_new(db, allowed_symbols):
             quantity INTEGER NOT NULL,
             as_first INTEGER NOT NULL,
             as_last INTEGER NOT NULL,
-            position REAL
+            position_sum INTEGER NOT NULL DEFAULT 0
         ) WITHOUT ROWID;
         '''
     )
@@ -25,7 +174,7 @@ def create_new(db, allowed_symbols):
             quantity INTEGER NOT NULL,
             as_first INTEGER NOT NULL,
             as_last INTEGER NOT NULL,
-            position REAL,
+            position_sum INTEGER NOT NULL DEFAULT 0,
             PRIMARY KEY (first_symb, second_symb),
             FOREIGN KEY (first_symb)
                 REFERENCES symbols (chr),
@@ -41,119 +190,222 @@ def create_new(db, allowed_symbols):
             quantity INTEGER NOT NULL,
             as_first INTEGER NOT NULL,
             as_last INTEGER NOT NULL,
-            position REAL
-        ) WITHOUT ROWID;
-        '''
-    )
-    cursor.execute(
-        '''
-        CREATE TABLE word_bigrams (
-            first_word TEXT,
-            second_word TEXT,
-            quantity INTEGER NOT NULL,
-            as_first INTEGER NOT NULL,
-            as_last INTEGER NOT NULL,
-            position REAL,
-            PRIMARY KEY (first_word, second_word),
-            FOREIGN KEY (first_word)
-                REFERENCES words (word),
-            FOREIGN KEY (second_word)
-                REFERENCES words (word)
+            position_sum INTEGER NOT NULL DEFAULT 0,
+            error INTEGER NOT NULL DEFAULT 0
         ) WITHOUT ROWID;
         '''
     )
+    cursor.execute(WORD_BIGRAMS.format('word_bigrams'))
+
+    create_additional(cursor)
+
+    db.commit()
+
+    cursor.executemany(queries.NEW_SYMBOL, ((x,) for x in allowed_symbols))
+    db.commit()
+
+
+def finalize(db, path: str) -> dict:
+    '''Prepare DB of the finished analysis for the result sheets.
+
+    Create quantity indexes, collect statistics for the query planner (ANALYZE)
+        and write compacted copy of the DB to the path (VACUUM INTO, SQLite 3.27+).
+    Existing copy is replaced when the new one is written.
+    Return {step: seconds}.
+    '''
+    cursor = db.cursor()
+    timings = {}
+    start = time.perf_counter()
+    for name, columns in INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {columns};')
+    db.commit()
+    timings['indexes'] = time.perf_counter() - start
 
+    start = time.perf_counter()
+    cursor.execute('ANALYZE;')
+    db.commit()
+    timings['analyze'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # VACUUM INTO requires a new file
+    temp_path = path + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    cursor.execute('VACUUM INTO ?;', (temp_path,))
+    os.replace(temp_path, path)
+    timings['vacuum'] = time.perf_counter() - start
+    return timings
+
+
+def drop_indexes(db):
+    '''Drop quantity indexes and planner statistics of finalize() before further counting.
+
+    Indexes would be updated with each written row, so they are built again by finalize()
+        after the counting.
+    '''
+    cursor = db.cursor()
+    for name in INDEXES:
+        cursor.execute(f'DROP INDEX IF EXISTS {name};')
+    for (table,) in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE 'sqlite_stat%';"
+    ).fetchall():
+        cursor.execute(f'DROP TABLE {table};')
     db.commit()
 
-    for symb in allowed_symbols:
-        symb = symb.replace("'", "''")
+
+def migrate(db):
+    '''Convert DB of previous versions in place (REAL average position -> INTEGER position sum).
+
+    Average position is restored as sum with rounding, so it's exact for the counted data.
+    Symbols of the analysis without position counting had default position 1 – they get 0,
+        as the space, which position wasn't counted.
+    Old "position" column is dropped if SQLite version allows (3.35+), or is left unused.
+    Tables of checkpoints and n-grams are created if missing.
+    Word bigrams and ye/yo pairs with TEXT keys are rebuilt with IDs from the "vocabulary" table.
+    Words and word bigrams get "error" column (0 – exact quantity).
+    Ye/yo pairs get quantities of both writings from the "words" table.
+    '''
+    cursor = db.cursor()
+    create_additional(cursor)
+    yo_columns = [x[1] for x in cursor.execute('PRAGMA table_info(yo_words);')]
+    for table in ('symbols', 'symbol_bigrams', 'words', 'word_bigrams'):
+        columns = [x[1] for x in cursor.execute(f'PRAGMA table_info({table});')]
+        if 'position_sum' in columns or 'position' not in columns:
+            continue
         cursor.execute(
-            f'''
-            INSERT INTO symbols (chr, quantity, as_first, as_last, position)
-            VALUES ('{symb}', 0, 0, 0, 1)
-            ON CONFLICT DO NOTHING;
-            '''
+            f'ALTER TABLE {table} ADD COLUMN position_sum INTEGER NOT NULL DEFAULT 0;'
         )
+        if table != 'symbols' or cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM symbols WHERE position != 1 AND chr != ' ');"
+        ).fetchone()[0]:
+            cursor.execute(
+                f'''
+                UPDATE {table}
+                SET position_sum=CAST(ROUND(IFNULL(position, 0) * quantity) AS INTEGER)
+                {"WHERE chr != ' '" if table == 'symbols' else ''};
+                '''
+            )
+        if sqlite3.sqlite_version_info >= (3, 35):
+            cursor.execute(f'ALTER TABLE {table} DROP COLUMN position;')
+    _intern(
+        cursor,
+        'word_bigrams',
+        WORD_BIGRAMS,
+        ('first_word', 'second_word', 'first_id', 'second_id'),
+        'quantity, as_first, as_last, position_sum',
+    )
+    _intern(
+        cursor, 'yo_words', YO_WORDS, ('yo_word', 'ye_word', 'yo_id', 'ye_id'), 'mandatory'
+    )
+    if yo_columns and 'yo_quantity' not in yo_columns:
+        for column in ('yo_quantity', 'ye_quantity'):
+            if column not in [x[1] for x in cursor.execute('PRAGMA table_info(yo_words);')]:
+                cursor.execute(f'ALTER TABLE yo_words ADD COLUMN {column} INTEGER;')
+    for table in ('words', 'word_bigrams'):
+        if 'error' not in [x[1] for x in cursor.execute(f'PRAGMA table_info({table});')]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN error INTEGER NOT NULL DEFAULT 0;')
     db.commit()
 
 
+def _intern(cursor, table: str, template: str, columns: tuple, values: str):
+    '''Rebuild the table with TEXT word keys into the table with vocabulary IDs.
+
+    columns – names of both TEXT columns and both ID columns.
+    '''
+    first, second, first_id, second_id = columns
+    if first not in [x[1] for x in cursor.execute(f'PRAGMA table_info({table});')]:
+        return
+    cursor.execute(
+        f'''
+        INSERT OR IGNORE INTO vocabulary (word)
+        SELECT {first} FROM {table} UNION SELECT {second} FROM {table};
+        '''
+    )
+    cursor.execute(template.format(f'{table}_ids'))
+    cursor.execute(
+        f'''
+        INSERT INTO {table}_ids ({first_id}, {second_id}, {values})
+        SELECT a.id, b.id, {values}
+        FROM {table}
+        JOIN vocabulary AS a ON a.word = {first}
+        JOIN vocabulary AS b ON b.word = {second};
+        '''
+    )
+    cursor.execute(f'DROP TABLE {table};')
+    cursor.execute(f'ALTER TABLE {table}_ids RENAME TO {table};')
+
+
+def read_yo_words(folder='') -> Iterator[tuple]:
+    '''Yield (yo word, ye word, mandatory) from "yo.txt" (mandatory yo) and "ye-yo.txt".'''
+    for name, mandatory in (('yo.txt', 1), ('ye-yo.txt', 0)):
+        with io.open(os.path.join(folder, name), mode='r', encoding='utf-8') as f:
+            for line in f:
+                if yo_word := line.strip():
+                    yield yo_word, yo_word.replace('ё', 'е'), mandatory
+
+
 def yo_mode(db, recreate=False):
     '''Create additional table for a demonstration ye/yo Cyrillic misspelling.
 
     Require additional files with ye/yo word lists.
-    One of the options: https://github.com/uqqu/yo_dict'''
+    One of the options: https://github.com/uqqu/yo_dict
+    Both lists are read in one pass and deduplicated in memory (the first pair wins, so words
+        of both lists are mandatory), pairs are written with bulk statements in one transaction.
+    '''
     cursor = db.cursor()
     if recreate:
         cursor.execute('''DROP TABLE IF EXISTS yo_words;''')
+    cursor.execute(YO_WORDS.format('yo_words'))
+
+    pairs: dict = {}  # {(yo word, ye word): mandatory}
+    for yo_word, ye_word, mandatory in read_yo_words():
+        pairs.setdefault((yo_word, ye_word), mandatory)
+    # pairs are staged in a temp table, so words and IDs are added by set-based statements
+    cursor.execute('CREATE TEMP TABLE yo_list (yo_word TEXT, ye_word TEXT, mandatory BOOLEAN);')
+    cursor.executemany(queries.NEW_YO_LIST, ((*x, y) for x, y in pairs.items()))
     cursor.execute(
         '''
-        CREATE TABLE yo_words (
-            yo_word TEXT,
-            ye_word TEXT,
-            mandatory BOOLEAN,
-            PRIMARY KEY (yo_word, ye_word),
-            FOREIGN KEY (yo_word)
-                REFERENCES words (word),
-            FOREIGN KEY (ye_word)
-                REFERENCES words (word)
-        ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO vocabulary (word)
+        SELECT yo_word FROM yo_list UNION SELECT ye_word FROM yo_list;
         '''
     )
+    cursor.execute(
+        '''
+        INSERT OR IGNORE INTO words (word, quantity, as_first, as_last, position_sum)
+        SELECT word, 0, 0, 0, 0
+        FROM (SELECT yo_word AS word FROM yo_list UNION SELECT ye_word FROM yo_list);
+        '''
+    )
+    cursor.execute(
+        '''
+        INSERT OR IGNORE INTO yo_words (yo_id, ye_id, mandatory)
+        SELECT a.id, b.id, mandatory
+        FROM yo_list
+        JOIN vocabulary AS a ON a.word = yo_word
+        JOIN vocabulary AS b ON b.word = ye_word
+        ORDER BY a.id, b.id;
+        '''
+    )
+    cursor.execute('DROP TABLE yo_list;')
+    db.commit()
 
-    with io.open('yo.txt', mode='r', encoding='utf-8') as f:
-        for line in f:
-            yo_word = line.strip()
-            yo_word = yo_word.replace("'", "''")
-            cursor.execute(
-                f'''
-                INSERT INTO words (word, quantity, as_first, as_last, position)
-                VALUES ('{yo_word}', 0, 0, 0, 1)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
-            ye_word = yo_word.replace('ё', 'е')
-            ye_word = ye_word.replace("'", "''")
-            cursor.execute(
-                f'''
-                INSERT INTO words (word, quantity, as_first, as_last, position)
-                VALUES ('{ye_word}', 0, 0, 0, 1)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
-
-            cursor.execute(
-                f'''
-                INSERT INTO yo_words (yo_word, ye_word, mandatory)
-                VALUES ('{yo_word}', '{ye_word}', 1)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
 
-    with io.open('ye-yo.txt', mode='r', encoding='utf-8') as f:
-        for line in f:
-            yo_word = line.strip()
-            yo_word = yo_word.replace("'", "''")
-            cursor.execute(
-                f'''
-                INSERT INTO words (word, quantity, as_first, as_last, position)
-                VALUES ('{yo_word}', 0, 0, 0, 1)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
-            ye_word = line.strip().replace('ё', 'е')
-            ye_word = ye_word.replace("'", "''")
-            cursor.execute(
-                f'''
-                INSERT INTO words (word, quantity, as_first, as_last, position)
-                VALUES ('{yo_word}', 0, 0, 0, 1)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
+def yo_quantities(cursor):
+    '''Set quantities of both writings of ye/yo pairs from the "words" table.
 
-            cursor.execute(
-                f'''
-                INSERT INTO yo_words (yo_word, ye_word, mandatory)
-                VALUES ('{yo_word}', '{ye_word}', 0)
-                ON CONFLICT DO NOTHING;
-                '''
-            )
+    Needed before counting of pairs, if the words were counted without them (see yo.py).
+    '''
+    cursor.execute(
+        '''
+        UPDATE yo_words
+        SET
+            yo_quantity = IFNULL((
+                SELECT quantity FROM words
+                WHERE word = (SELECT word FROM vocabulary WHERE id = yo_id)
+            ), 0),
+            ye_quantity = IFNULL((
+                SELECT quantity FROM words
+                WHERE word = (SELECT word FROM vocabulary WHERE id = ye_id)
+            ), 0);
+        '''
+    )
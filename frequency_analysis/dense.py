@@ -0,0 +1,204 @@
+﻿'''Additional module to frequency.py for counting symbols into dense NumPy arrays.
+
+Allowed symbols are a closed alphabet, so each symbol gets an index and all symbol data
+    is kept in fixed arrays instead of DB rows:
+        symbols        – [symbol index, (quantity, as_first, as_last, position sum)];
+        symbol_bigrams – [first index, second index, (quantity, as_first, as_last, position sum)].
+Counted items are collected as flat index lists and reduced into arrays with bincount by batches.
+Whole batches of words can be counted without per-symbol Python code at all (count_batch()):
+    words are encoded into one UTF-32 code point array, and all positions, masks and pair codes
+    are computed with array operations.
+Arrays are written to the DB only on flush (right before each commit).
+
+Requires numpy (optional dependency – pip install frequency_analysis[numpy]).
+'''
+
+from frequency_analysis import queries
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SymbolCounter:
+    '''Count symbols and symbol bigrams of the closed alphabet with NumPy arrays.
+
+    Has the same symbol methods as writers, so FrequencyAnalysis can use it instead of them.
+    word_symbols – allowed symbols, which are matched by word_pattern themselves
+        (see tokenizer.Tokenizer), only for count_batch().
+    '''
+
+    def __init__(self, allowed_symbols, word_symbols=(), batch_size: int = 1 << 16):
+        if np is None:
+            raise Exception("Symbol backend 'numpy' requires numpy package.")
+        self.alphabet = list(dict.fromkeys(allowed_symbols))
+        self.index = {x: n for n, x in enumerate(self.alphabet)}
+        self.size = len(self.alphabet)
+        self.batch_size = batch_size
+        # {code point: symbol index} and {code point: is word symbol} as arrays,
+        #   the last item is for all code points out of the alphabet range
+        max_code = max((ord(x) for x in self.alphabet if len(x) == 1), default=0)
+        self.lookup = np.full(max_code + 2, -1, dtype=np.int64)
+        self.word_lookup = np.zeros(max_code + 2, dtype=bool)
+        for symb, n in self.index.items():
+            if len(symb) == 1:
+                self.lookup[ord(symb)] = n
+                self.word_lookup[ord(symb)] = symb in word_symbols
+        self.symbols = np.zeros((self.size, 4), dtype=np.int64)
+        self.symbol_bigrams = np.zeros((self.size, self.size, 4), dtype=np.int64)
+        # pending items of the current batch: symbol (or bigram) indices and positions
+        self.symbol_keys: list = []
+        self.symbol_positions: list = []
+        self.symbol_edges_keys: tuple = ([], [])
+        self.bigram_keys: list = []
+        self.bigram_positions: list = []
+        self.bigram_edges_keys: tuple = ([], [])
+
+    def space(self):
+        '''Count space between words.'''
+        self.symbol_keys.append(self.index[' '])
+        self.symbol_positions.append(0)
+
+    def symbol(self, symb: str, position: int):
+        '''Count single symbol. Position is 0 if it isn't counted.'''
+        self.symbol_keys.append(self.index[symb])
+        self.symbol_positions.append(position)
+
+    def symbol_bigram(self, first: str, second: str, position: int):
+        '''Count symbol bigram. Position is 0 if it isn't counted.'''
+        self.bigram_keys.append(self.index[first] * self.size + self.index[second])
+        self.bigram_positions.append(position)
+
+    def symbol_edges(self, first: str, last: str):
+        '''Count first and last symbols of the word (not allowed symbols are ignored).'''
+        if (key := self.index.get(first)) is not None:
+            self.symbol_edges_keys[0].append(key)
+        if (key := self.index.get(last)) is not None:
+            self.symbol_edges_keys[1].append(key)
+
+    def symbol_bigram_first(self, first: str, second: str):
+        '''Count symbol bigram at the beginning of the word.'''
+        self.bigram_edges_keys[0].append(self.index[first] * self.size + self.index[second])
+
+    def symbol_bigram_last(self, first: str, second: str):
+        '''Count symbol bigram at the end of the word.'''
+        self.bigram_edges_keys[1].append(self.index[first] * self.size + self.index[second])
+
+    def __codes(self, strings: list):
+        '''Return code points of all strings as one array and lengths of strings.'''
+        codes = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32)
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        return np.minimum(codes, len(self.lookup) - 1), lengths
+
+    def count_batch(self, pairs: list, pos: bool, bigrams: bool, space: bool):
+        '''Count symbols of (raw word, clear word) pairs of many sentences at once.
+
+        The result is the same as of per-symbol counting in FrequencyAnalysis:
+            position of the word symbol is counted in the clear word
+                (allowed non-word symbols before it are shifted out), of other – in the raw word;
+            bigrams are counted for adjacent allowed symbols of the raw word;
+            edges are counted by the clear word;
+            space is counted for each pair.
+        '''
+        size = self.size
+        codes, lengths = self.__codes([x for x, _ in pairs])
+        index = self.lookup[codes]
+        allowed = index >= 0
+        word_ids = np.repeat(np.arange(len(lengths)), lengths)
+        char_starts = (np.cumsum(lengths) - lengths)[word_ids]
+        if pos:
+            positions = np.arange(len(codes)) - char_starts + 1
+            non_word = allowed & ~self.word_lookup[codes]
+            shift = np.cumsum(non_word)
+            shift -= (shift - non_word)[char_starts]
+            positions = np.where(non_word, positions, positions - shift)
+        else:
+            positions = np.zeros(len(codes), dtype=np.int64)
+
+        keys = index[allowed]
+        self.symbols[:, 0] += np.bincount(keys, minlength=size)
+        if pos:
+            self.symbols[:, 3] += np.bincount(keys, positions[allowed], minlength=size).astype(
+                np.int64
+            )
+        if space:
+            self.symbols[self.index[' '], 0] += len(pairs)
+
+        bigrams_data = self.symbol_bigrams.reshape(-1, 4)
+        if bigrams and len(codes) > 1:
+            adjacent = allowed[:-1] & allowed[1:] & (word_ids[:-1] == word_ids[1:])
+            keys = index[:-1][adjacent] * size + index[1:][adjacent]
+            bigrams_data[:, 0] += np.bincount(keys, minlength=size * size)
+            if pos:
+                bigrams_data[:, 3] += np.bincount(
+                    keys, positions[1:][adjacent] - 1, minlength=size * size
+                ).astype(np.int64)
+
+        codes, lengths = self.__codes([x for _, x in pairs])
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        for column, chars in enumerate((starts[lengths > 1], ends[lengths > 1] - 1), 1):
+            keys = self.lookup[codes[chars]]
+            self.symbols[:, column] += np.bincount(keys[keys >= 0], minlength=size)
+        if bigrams:
+            for column, chars in enumerate((starts[lengths > 2], ends[lengths > 2] - 2), 1):
+                first = self.lookup[codes[chars]]
+                second = self.lookup[codes[chars + 1]]
+                both = (first >= 0) & (second >= 0)
+                keys = first[both] * size + second[both]
+                bigrams_data[:, column] += np.bincount(keys, minlength=size * size)
+
+    def check(self):
+        '''Reduce pending items if the batch is full.'''
+        if len(self.symbol_keys) + len(self.bigram_keys) >= self.batch_size:
+            self.reduce()
+
+    def reduce(self):
+        '''Add all pending items to arrays.'''
+        symbols = self.symbols
+        bigrams = self.symbol_bigrams.reshape(-1, 4)
+        for array, keys, positions in (
+            (symbols, self.symbol_keys, self.symbol_positions),
+            (bigrams, self.bigram_keys, self.bigram_positions),
+        ):
+            if keys:
+                array[:, 0] += np.bincount(keys, minlength=len(array))
+                array[:, 3] += np.bincount(keys, positions, minlength=len(array)).astype(np.int64)
+                keys.clear()
+                positions.clear()
+        for array, edges in ((symbols, self.symbol_edges_keys), (bigrams, self.bigram_edges_keys)):
+            for column, keys in enumerate(edges, 1):
+                if keys:
+                    array[:, column] += np.bincount(keys, minlength=len(array))
+                    keys.clear()
+
+    def flush(self, cursor):
+        '''Write all counted data to the DB and reset arrays.'''
+        self.reduce()
+        rows = np.flatnonzero(self.symbols.any(axis=1))
+        cursor.executemany(
+            queries.SYMBOLS_ADD,
+            ((*self.symbols[x].tolist(), self.alphabet[x]) for x in rows.tolist()),
+        )
+        bigrams = self.symbol_bigrams.reshape(-1, 4)
+        rows = np.flatnonzero(bigrams.any(axis=1))
+        counted = rows[bigrams[rows, 0] > 0].tolist()
+        edges_only = rows[bigrams[rows, 0] == 0].tolist()
+        for query, keys in (
+            (queries.UPSERT['symbol_bigrams'], counted),
+            (queries.EDGES['symbol_bigrams'], edges_only),
+        ):
+            cursor.executemany(
+                query,
+                (
+                    (
+                        *bigrams[x].tolist(),
+                        self.alphabet[x // self.size],
+                        self.alphabet[x % self.size],
+                    )
+                    for x in keys
+                ),
+            )
+        self.symbols.fill(0)
+        self.symbol_bigrams.fill(0)
@@ -0,0 +1,189 @@
+﻿'''Export of the analysis data to CSV, JSON Lines or Parquet files (without excel limits).
+
+Data is selected with the same queries as for the result sheets (see selection.py)
+    and is read from the DB by batches, so memory doesn't depend on the table size.
+Each table is written to the separate file of the analysis folder (e.g. "words.csv",
+    "symbols_i.csv" for case insensitive symbols).
+Position is exported as sum (average position is position_sum / (quantity - error)).
+
+Parquet requires pyarrow (optional dependency – pip install frequency_analysis[parquet]).
+'''
+
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+
+from frequency_analysis import db_create, selection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+BATCH_SIZE = 10000
+
+
+def _csv(path: str, columns: tuple, rows):
+    with io.open(path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(name for name, _ in columns)
+        while batch := rows.fetchmany(BATCH_SIZE):
+            writer.writerows(batch)
+
+
+def _jsonl(path: str, columns: tuple, rows):
+    with io.open(path, mode='w', encoding='utf-8') as f:
+        while batch := rows.fetchmany(BATCH_SIZE):
+            f.writelines(
+                json.dumps(
+                    {
+                        name: value if value is None else kind(value)
+                        for (name, kind), value in zip(columns, row)
+                    },
+                    ensure_ascii=False,
+                )
+                + '\n'
+                for row in batch
+            )
+
+
+def _parquet(path: str, columns: tuple, rows):
+    types = {str: pa.string(), int: pa.int64(), bool: pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        while batch := rows.fetchmany(BATCH_SIZE):
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(
+                            [x if x is None else kind(x) for x in values], type=types[kind]
+                        )
+                        for (_, kind), values in zip(columns, zip(*batch))
+                    ],
+                    schema=schema,
+                )
+            )
+
+
+#   {format: (file extension, writer function)}
+FORMATS = {'csv': ('csv', _csv), 'jsonl': ('jsonl', _jsonl), 'parquet': ('parquet', _parquet)}
+
+
+class Exporter:
+    '''Export tables of the analysis to files of the chosen format.
+
+    Methods accept the same limit and min_quantity arguments as the result sheets.
+    '''
+
+    def __init__(self, cursor, folder: str, file_format: str):
+        self.cursor = cursor
+        self.folder = folder
+        self.extension, self.write = FORMATS[file_format]
+
+    def __export(self, name: str, table: str, rows):
+        '''Write the executed selection of the table to "<name>.<extension>" file.'''
+        file_name = f'{name}.{self.extension}'
+        path = os.path.join(self.folder, file_name)
+        if os.path.isfile(path):
+            print(f'File "{file_name}" already exists')
+            return
+        self.write(path, selection.COLUMNS[table], rows)
+        print(f'... "{file_name}" was written')
+
+    def treat(self, limits=(0,) * 4, min_quantities=(1,) * 4):
+        '''Export main tables all at once (and ye/yo words, if they were counted).
+
+        Input:
+            limits – tuple – max number of rows in the file (0 – unlimited)
+                    — (symbols, symbol bigrams, words, word bigrams)
+                    — default values – (0, 0, 0, 0) (ommited = default);
+            min_quantities – tuple – min quantity of the row
+                    — (/same as on 'limits'/)
+                    — default values – (1, 1, 1, 1) (ommited = default).
+        '''
+        limits = tuple(limits) + (0,) * (4 - len(limits))
+        min_quantities = tuple(min_quantities) + (1,) * (4 - len(min_quantities))
+        self.export_symbols(limits[0], min_quantities[0])
+        self.export_symbol_bigrams(limits[1], min_quantities[1])
+        self.export_words(limits[2], min_quantities[2])
+        self.export_word_bigrams(limits[3], min_quantities[3])
+        if self.cursor.execute(
+            '''
+            SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'yo_words');
+            '''
+        ).fetchone()[0]:
+            self.export_yo_words()
+
+    def export_symbols(self, limit=0, min_quantity=1, *, ignore_case=False):
+        '''Export symbols to "symbols" ("symbols_i" with ignore_case) file.'''
+        self.__export(
+            f'symbols{"_i" if ignore_case else ""}',
+            'symbols',
+            selection.top_symbols(self.cursor, limit, min_quantity, ignore_case=ignore_case),
+        )
+
+    def export_symbol_bigrams(self, limit=0, min_quantity=1, *, ignore_case=False):
+        '''Export symbol bigrams to "symbol_bigrams" ("symbol_bigrams_i" with ignore_case) file.'''
+        self.__export(
+            f'symbol_bigrams{"_i" if ignore_case else ""}',
+            'symbol_bigrams',
+            selection.top_symbol_bigrams(
+                self.cursor, limit, min_quantity, ignore_case=ignore_case
+            ),
+        )
+
+    def export_words(self, limit=0, min_quantity=1):
+        '''Export words to "words" file.'''
+        self.__export('words', 'words', selection.top_words(self.cursor, limit, min_quantity))
+
+    def export_word_bigrams(self, limit=0, min_quantity=1):
+        '''Export word bigrams to "word_bigrams" file.'''
+        self.__export(
+            'word_bigrams',
+            'word_bigrams',
+            selection.top_word_bigrams(self.cursor, limit, min_quantity),
+        )
+
+    def export_yo_words(self, limit=0, min_quantity=1):
+        '''Export ye/yo word pairs with quantities of both writings to "yo_words" file.'''
+        self.__export(
+            'yo_words', 'yo_words', selection.yo_words(self.cursor, limit, min_quantity)
+        )
+
+
+class Export:
+    '''Context manager with data validation for end-user Exporter class.'''
+
+    def __init__(self, name='frequency_analysis', file_format='csv'):
+        self.name = name
+        self.file_format = file_format
+        self.db = None
+
+    def __enter__(self):
+        if not re.search('^[a-zа-яё0-9_.@() -]+$', self.name, re.I):
+            raise Exception(f"Foldername '{self.name}' is unvalid. Please, enter other.")
+        if not os.path.isfile(os.path.join(os.getcwd(), self.name, 'result.db')):
+            raise Exception(
+                f"DB file in the '{self.name}' folder is not exist! "
+                "Create a new analysis, or set name of folder with existing DB."
+            )
+        if self.file_format not in FORMATS:
+            raise Exception(
+                f"File format must be one of {', '.join(FORMATS)}. If empty – works as 'csv'."
+            )
+        if self.file_format == 'parquet' and pa is None:
+            raise Exception("File format 'parquet' requires pyarrow package.")
+
+        self.db = sqlite3.connect(os.path.join(os.getcwd(), self.name, 'result.db'))
+        db_create.migrate(self.db)
+        return Exporter(self.db.cursor(), os.path.join(os.getcwd(), self.name), self.file_format)
+
+    def __exit__(self, type_, value, traceback):
+        self.db.close()
+
+
+__all__ = ['Export']
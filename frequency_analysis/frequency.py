@@ -1,24 +1,63 @@
 ﻿'''Main module for frequency analysis.'''
 
+import io
 import os
 import re
 import sqlite3
-from typing import List, Union
+from copy import copy
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Union
 
-from frequency_analysis import db_create
+from frequency_analysis import db_create, dense, heavy, ngrams, parallel, profiling, writers, yo
+from frequency_analysis.tokenizer import Tokenizer
 
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|\n+')
 
-def commit(func):
-    '''Decorator for commit changes once per 100 cycles.'''
 
-    def inner(self, *args, **kwargs):
-        self.counter += 1
-        if self.counter > 100:
-            self.counter = 0
-            self.db.commit()
-        return func(self, *args, **kwargs)
+def read_positions(
+    path: str,
+    sentence_splitter: Optional[Callable[[str], list]] = None,
+    encoding='utf-8',
+    read_size=1 << 20,
+    resume: Optional[tuple] = None,
+) -> Iterator[tuple]:
+    '''Lazily read text file by chunks and yield (sentence, file checkpoint) pairs.
 
-    return inner
+    The rest of each chunk after the last sentence end is carried to the next chunk.
+    File checkpoint – (position, tail, skip): file position after the last read chunk,
+        unfinished text before it and number of sentences read after it (including current).
+    Reading from the checkpoint passed as resume continues right after its sentence.
+    '''
+    split = sentence_splitter or SENTENCE_END.split
+    position, tail, skip = resume or (0, '', 0)
+    with io.open(path, mode='r', encoding=encoding) as f:
+        if position:
+            f.seek(position)
+        while chunk := f.read(read_size):
+            *sentences, next_tail = split(tail + chunk)
+            number = 0
+            for sentence in sentences:
+                if not sentence or sentence.isspace():
+                    continue
+                number += 1
+                if skip:
+                    skip -= 1
+                    continue
+                yield sentence, (position, tail, number)
+            position, tail = f.tell(), next_tail
+    if tail and not tail.isspace() and not skip:
+        yield tail, (position, tail, 1)
+
+
+def read_sentences(
+    path: str,
+    sentence_splitter: Optional[Callable[[str], list]] = None,
+    encoding='utf-8',
+    read_size=1 << 20,
+) -> Iterator[str]:
+    '''Lazily read text file by chunks and yield sentences one by one.'''
+    for sentence, _ in read_positions(path, sentence_splitter, encoding, read_size):
+        yield sentence
 
 
 class FrequencyAnalysis:
@@ -28,10 +67,48 @@ class FrequencyAnalysis:
         /all values are optional/
         name            – the name for the analysis folder;
         word_pattern    – regex pattern to extract words from a sentence;
-        allowed_symbols – symbols which will be taken into account in the process of analysis.
+        allowed_symbols – symbols which will be taken into account in the process of analysis;
+        buffer_size     – number of unique items to accumulate in memory before bulk writing
+                            to the DB (0 – write each item immediately);
+        flush_interval  – max number of seconds between bulk writings in accumulation mode;
+        tokenizer       – prebuilt Tokenizer (from word_pattern and allowed_symbols if omitted);
+        durability      – name of the profile from db_create.DURABILITY for commit scheduling;
+        checkpoints     – {source: (sentences, file position, file tail, file skip)}
+                            of the previous analysis to continue from (mode 'c');
+        symbol_backend  – 'sql' – count symbols with the writer,
+                          'numpy' – count symbols into dense arrays (dense.SymbolCounter);
+        symbol_ngrams,
+        word_ngrams     – orders of n-grams to count (1 – symbols/words, 2 – bigrams,
+                            3 and more – n-grams from ngrams.py);
+        heavy_hitters   – capacity of the approximate summary for word bigrams
+                            (heavy.HeavyHitters, 0 – exact counting);
+        heavy_words     – count words with the approximate summary too;
+        yo_pairs        – map of ye/yo words from yo.load_pairs() to count quantities of pairs
+                            during the analysis (None – pairs aren't counted);
+        profiler        – profiling.Profiler to time the stages of counting (None – disabled).
     '''
 
-    def __init__(self, name, word_pattern, allowed_symbols, total_symbols, total_words, db):
+    def __init__(
+        self,
+        name,
+        word_pattern,
+        allowed_symbols,
+        total_symbols,
+        total_words,
+        db,
+        buffer_size=0,
+        flush_interval=60,
+        tokenizer=None,
+        durability='safe',
+        checkpoints=None,
+        symbol_backend='sql',
+        symbol_ngrams=(1, 2),
+        word_ngrams=(1, 2),
+        heavy_hitters=0,
+        heavy_words=False,
+        yo_pairs=None,
+        profiler=None,
+    ):
         self.name = name
         self.word_pattern = word_pattern
         self.allowed_symbols = allowed_symbols
@@ -39,204 +116,350 @@ class FrequencyAnalysis:
         self.total_words = total_words
         self.db = db
         self.cursor = db.cursor()
-        self.counter = 0
         self.space = ' ' in self.allowed_symbols
+        self.tokenizer = tokenizer or Tokenizer(word_pattern, allowed_symbols)
+        self.checkpoints = checkpoints or {}
+        self.counted: dict = {}  # {source: number of passed sentences}
+        self.symbol_ngrams = tuple(sorted(set(symbol_ngrams)))
+        self.word_ngrams = tuple(sorted(set(word_ngrams)))
+        # orders of n-grams from ngrams.py (without symbols/words and bigrams)
+        self.symbol_orders = tuple(x for x in self.symbol_ngrams if x > 2)
+        self.word_orders = tuple(x for x in self.word_ngrams if x > 2)
+        profile = db_create.DURABILITY[durability]
+        if buffer_size:
+            self.writer = writers.Accumulator(
+                db,
+                buffer_size,
+                flush_interval,
+                profile['commit_rows'],
+                profile['commit_interval'],
+            )
+        else:
+            self.writer = writers.RowWriter(
+                db, profile['commit_rows'], profile['commit_interval']
+            )
+        self.dense = None
+        if symbol_backend == 'numpy':
+            self.dense = dense.SymbolCounter(
+                self.tokenizer.allowed_symbols, self.tokenizer.word_symbols
+            )
+            self.writer.counters.append(self.dense)
+        self.symbol_writer = self.dense or self.writer
+        self.vocabulary = None
+        if 2 in self.word_ngrams or self.word_orders:
+            self.vocabulary = ngrams.Vocabulary(db)
+            self.writer.counters.append(self.vocabulary)
+        self.word_writer = self.word_bigram_writer = self.writer
+        self.heavy = None
+        if heavy_hitters:
+            self.heavy = heavy.HeavyHitters(db, heavy_hitters, heavy_words)
+            self.writer.counters.append(self.heavy)
+            self.word_bigram_writer = self.heavy
+            if heavy_words:
+                self.word_writer = self.heavy
+        self.yo_counter = None
+        if yo_pairs:
+            self.yo_counter = yo.YoCounter(yo_pairs, self.word_writer)
+            self.writer.counters.append(self.yo_counter)
+            self.word_writer = self.yo_counter
+        self.profiler = profiler
+        if profiler:
+            self.__profile(profiler)
+
+    def __profile(self, profiler):
+        '''Replace methods of the counting stages with timing wrappers of the profiler.'''
+        self.tokenizer = copy(self.tokenizer)
+        self.tokenizer.split = profiler.timed('tokenize', self.tokenizer.split)
+        self.__count_symbols = profiler.timed('symbol update', self.__count_symbols)
+        self.__count_words = profiler.timed('word update', self.__count_words)
+        if self.dense:
+            self.dense.count_batch = profiler.timed('symbol update', self.dense.count_batch)
+        for writer, names in (
+            (self.symbol_writer, ('symbol_bigram', 'symbol_bigram_first', 'symbol_bigram_last')),
+            (self.word_bigram_writer, ('word_bigram', 'word_bigram_first', 'word_bigram_last')),
+        ):
+            for name in names:
+                setattr(writer, name, profiler.timed('bigram update', getattr(writer, name)))
+        self.writer.flush = profiler.timed('flush', self.writer.flush)
+        self.writer.commit = profiler.timed('commit', self.writer.commit)
+        count_batch = self.__count_batch
+
+        def profiled_batch(batch: list, *args):
+            count_batch(batch, *args)
+            profiler.add('sentences', len(batch))
+            profiler.check()
+
+        self.__count_batch = profiled_batch
+
+    def stats(self) -> dict:
+        '''Return snapshot of the profiler timers and counters (see profiling.Profiler.stats()).'''
+        if not self.profiler:
+            raise Exception("Profiling is disabled. Use Analysis(profile=True) to enable it.")
+        return self.profiler.stats()
+
+    def __count_sentence(
+        self,
+        word_list: list,
+        symbols: bool,
+        words: bool,
+        pos: bool,
+        symbol_bigrams: bool,
+        word_bigrams: bool,
+    ):
+        '''Count symbols and/or words of the single sentence.'''
+        pairs, clear_word_list = self.tokenizer.split(word_list)
+        if symbols:
+            for word, clear_word in pairs:
+                if self.total_symbols == 0 and self.space:
+                    self.symbol_writer.space()
+                self.__count_symbols(word, clear_word, pos, symbol_bigrams)
+
+        if words and clear_word_list:
+            self.__count_words(clear_word_list, pos, word_bigrams)
+
+    def __count_batch(
+        self, batch: list, args: tuple, source: str, file_checkpoint=(None, None, 0)
+    ):
+        '''Count the batch of sentences as one call and update the checkpoint of the source.
 
-    def __create_clear_word_list(self, word_list):
-        shift = 0
-        clear_word_list = []
-        for n, word in enumerate(word_list[:], 1):
-            if res := re.findall(self.word_pattern, word):
-                [clear_word_list.append(x) for x in res]
-                [word_list.insert(n + shift, '') for _ in range(len(res) - 1)]
-                shift += len(res) - 1
-            else:
-                clear_word_list.append('')
-        return clear_word_list
+        With the dense symbol backend symbols of the whole batch are counted at once
+            (single sentences of direct calls are faster without array operations).
+        '''
+        symbols, words, pos, symbol_bigrams, word_bigrams = args
+        if (
+            self.dense
+            and symbols
+            and len(batch) > 1
+            and not self.total_symbols
+            and not self.symbol_orders
+        ):
+            batch_pairs = []
+            for word_list in batch:
+                if isinstance(word_list, str):
+                    word_list = word_list.split()
+                pairs, clear_word_list = self.tokenizer.split(word_list)
+                batch_pairs.extend(pairs)
+                if words and clear_word_list:
+                    self.__count_words(clear_word_list, pos, word_bigrams)
+            self.dense.count_batch(
+                batch_pairs, pos, symbol_bigrams and 2 in self.symbol_ngrams, self.space
+            )
+        else:
+            for word_list in batch:
+                if isinstance(word_list, str):
+                    word_list = word_list.split()
+                self.__count_sentence(word_list, *args)
+        self.counted[source] = self.counted.get(source, 0) + len(batch)
+        self.writer.progress[source] = (self.counted[source], *file_checkpoint)
+        if self.dense:
+            self.dense.check()
+        self.writer.check()
+
+    def __count_call(self, word_list: list, args: tuple):
+        '''Count the sentence of the direct call, if it wasn't counted before the continuation.'''
+        if self.counted.get('', 0) < self.checkpoints.get('', (0,))[0]:
+            self.counted[''] = self.counted.get('', 0) + 1
+        else:
+            self.__count_batch([word_list], args, '')
+
+    def __skip(self, source: str, sentences: Iterator) -> Iterator:
+        '''Skip sentences of the source, which were counted before the analysis continuation.'''
+        counted = self.counted.get(source, 0)
+        if (skip := self.checkpoints.get(source, (0,))[0] - counted) > 0:
+            self.counted[source] = counted + sum(1 for _ in islice(sentences, skip))
+        return sentences
 
-    @commit
     def count_all(self, word_list: list, pos=False, symbol_bigrams=True, word_bigrams=True):
         '''Count symbols, words, symbol bigrams, word bigrams, all their average positions.
 
         Input:
             Word list – sentence for analysis.
                 It must be exactly sentence for properly word position counting;
-            Average position counting – disabled by default. Slows down performance by ≈20%;
+            Average position counting – disabled by default;
             Symbol bigrams counting – enabled by default;
             Word bigrams counting – enabled by default.
         '''
-        clear_word_list = self.__create_clear_word_list(word_list)
-        for word, clear_word in zip(word_list, clear_word_list):
-            if self.total_symbols == 0 and self.space:
-                self.cursor.execute(
-                    '''
-                    UPDATE symbols
-                    SET quantity=quantity+1
-                    WHERE chr=' ';
-                    '''
-                )
-            self.__count_symbols(word, clear_word, pos, symbol_bigrams)
-
-        if cutted_clear_word_list := [x.replace("'", "''") for x in clear_word_list if x]:
-            self.__count_words(cutted_clear_word_list, pos, word_bigrams)
+        self.__count_call(word_list, (True, True, pos, symbol_bigrams, word_bigrams))
 
-    @commit
     def count_words(self, word_list: list, pos=False, bigrams=True):
-        '''Decorated wrapper for user calling.'''
-        clear_word_list = self.__create_clear_word_list(word_list)
-        if cutted_clear_word_list := [x.replace("'", "''") for x in clear_word_list if x]:
-            self.__count_words(cutted_clear_word_list, pos, bigrams)
+        '''Count words and word bigrams only. Arguments are the same as for count_all().'''
+        self.__count_call(word_list, (False, True, pos, False, bigrams))
 
-    @commit
     def count_symbols(self, word_list: list, pos=False, bigrams=True):
-        '''Decorated wrapper for user calling.'''
-        for word, clear_word in zip(word_list, self.__create_clear_word_list(word_list)):
-            if self.total_symbols == 0 and self.space:
-                self.cursor.execute(
-                    '''
-                    UPDATE symbols
-                    SET quantity=quantity+1
-                    WHERE chr=' ';
-                    '''
-                )
-            self.__count_symbols(word, clear_word, pos, bigrams)
+        '''Count symbols and symbol bigrams only. Arguments are the same as for count_all().'''
+        self.__count_call(word_list, (True, False, pos, bigrams, False))
+
+    def count_stream(
+        self,
+        sentences: Iterable[Union[str, list]],
+        pos=False,
+        symbol_bigrams=True,
+        word_bigrams=True,
+        *,
+        symbols=True,
+        words=True,
+        batch_size=1000,
+        source='',
+    ):
+        '''Count all sentences from any iterable (e.g. generator) with bounded memory.
+
+        Input:
+            Sentences – iterable of word lists or of strings (will be split by whitespaces);
+            pos, symbol_bigrams, word_bigrams – same as for count_all();
+            symbols, words – disable counting of symbols or words (keyword-only);
+            Batch size – number of sentences processed as one call (keyword-only);
+            Source – name of the stream for checkpoints (keyword-only);
+                default – shared with direct count_*() calls.
+        '''
+        args = (symbols, words, pos, symbol_bigrams, word_bigrams)
+        sentences = self.__skip(source, iter(sentences))
+        while batch := list(islice(sentences, batch_size)):
+            self.__count_batch(batch, args, source)
+
+    def count_file(
+        self,
+        path: str,
+        sentence_splitter: Optional[Callable[[str], list]] = None,
+        pos=False,
+        symbol_bigrams=True,
+        word_bigrams=True,
+        *,
+        symbols=True,
+        words=True,
+        encoding='utf-8',
+        read_size=1 << 20,
+        batch_size=1000,
+    ):
+        '''Read the text file by chunks, split it to sentences and count them all.
+
+        Input:
+            Path – path to the text file;
+            Sentence splitter – function, which splits text to sentences like re.split()
+                (the last element must be the rest of text after the last sentence end);
+                default – split after '.', '!', '?', '…' and on line breaks;
+            pos, symbol_bigrams, word_bigrams, symbols, words, batch_size – same as
+                for count_stream();
+            Encoding, read size (number of characters in one reading) – keyword-only.
+        The checkpoint source is the path, so on continuation (mode 'c') the file is read
+            right from the last committed sentence.
+        '''
+        args = (symbols, words, pos, symbol_bigrams, word_bigrams)
+        resume = None
+        if checkpoint := self.checkpoints.pop(path, None):
+            self.counted[path] = checkpoint[0]
+            if checkpoint[1] is not None:
+                resume = (int(checkpoint[1]), checkpoint[2], checkpoint[3])
+        pairs = read_positions(path, sentence_splitter, encoding, read_size, resume)
+        while batch := list(islice(pairs, batch_size)):
+            position, tail, skip = batch[-1][1]
+            self.__count_batch([x for x, _ in batch], args, path, (str(position), tail, skip))
+
+    def flush(self):
+        '''Write all accumulated data and checkpoints to the DB and commit them.'''
+        self.writer.flush()
+        self.writer.commit()
+
+    def rollback(self):
+        '''Drop all data after the last commit, so the analysis can be continued (mode 'c')
+        right after the last committed checkpoint.
+        '''
+        self.writer.rollback()
 
     def __count_words(self, word_list: list, pos: bool, bigrams: bool):
-        '''Word/word bigrams counting.'''
-        last_word = None
-        for word_pos, word in enumerate(word_list, 1):
+        '''Word/word bigrams/word n-grams counting (bigrams – all n-grams of order 2+).'''
+        orders = self.word_orders if bigrams else ()
+        bigrams = bigrams and 2 in self.word_ngrams
+        words = [x.lower() for x in word_list]
+        ids = [self.vocabulary.get(x) for x in words] if bigrams or orders else ()
+        last_id = None
+        for word_pos, word in enumerate(words, 1):
             if self.total_words > 0:
                 self.total_words -= 1
                 continue
-            self.cursor.execute(
-                f'''
-                INSERT INTO words
-                    (word, quantity, as_first, as_last {', position' if pos else ''})
-                VALUES ('{word.lower()}', 1, 0, 0 {f', {word_pos}' if pos else ''})
-                ON CONFLICT (word) DO UPDATE SET quantity=quantity+1
-                    {f', position=(position*quantity+{word_pos}) / (quantity+1)' if pos else ''};
-                '''
-            )
-            if last_word and bigrams:
-                self.cursor.execute(
-                    f'''
-                    INSERT INTO word_bigrams
-                        (first_word, second_word, quantity, as_first, as_last
-                            {', position' if pos else ''})
-                    VALUES ('{last_word}', '{word.lower()}', 1, 0, 0
-                        {f', {word_pos-1}' if pos else ''})
-                    ON CONFLICT (first_word, second_word) DO UPDATE SET quantity=quantity+1
-                    {f', position=(position*quantity+{word_pos-1}) / (quantity+1)' if pos else ''};
-                    '''
-                )
-            last_word = word.lower()
-        if len(word_list) > 1 and not self.total_words:
-            self.cursor.execute(
-                f'''
-                UPDATE words
-                SET as_first=as_first+1
-                WHERE word='{word_list[0].lower()}';
-                '''
-            )
-            self.cursor.execute(
-                f'''
-                UPDATE words
-                SET as_last=as_last+1
-                WHERE word='{word_list[-1].lower()}';
-                '''
-            )
-            if len(word_list) > 2 and bigrams:
-                self.cursor.execute(
-                    f'''
-                    UPDATE word_bigrams
-                    SET as_first=as_first+1
-                    WHERE first_word='{word_list[0].lower()}'
-                        AND second_word='{word_list[1].lower()}';
-                    '''
-                )
-                self.cursor.execute(
-                    f'''
-                    UPDATE word_bigrams
-                    SET as_last=as_last+1
-                    WHERE first_word='{word_list[-2].lower()}'
-                        AND second_word='{word_list[-1].lower()}';
-                    '''
-                )
+            self.word_writer.word(word, word_pos if pos else 0)
+            if bigrams:
+                if last_id is not None:
+                    self.word_bigram_writer.word_bigram(
+                        last_id, ids[word_pos - 1], word_pos - 1 if pos else 0
+                    )
+                last_id = ids[word_pos - 1]
+        if len(words) > 1 and not self.total_words:
+            self.word_writer.word_edges(words[0], words[-1])
+            if len(words) > 2 and bigrams:
+                self.word_bigram_writer.word_bigram_first(ids[0], ids[1])
+                self.word_bigram_writer.word_bigram_last(ids[-2], ids[-1])
+        if orders and not self.total_words:
+            for n in orders:
+                for start in range(len(ids) - n + 1):
+                    key = (n, ngrams.pack(ids[start : start + n], ngrams.WORD_BITS))
+                    self.writer.ngram('word_ngrams', key, start + 1 if pos else 0)
+                if len(ids) > n:
+                    key = (n, ngrams.pack(ids[:n], ngrams.WORD_BITS))
+                    self.writer.ngram_first('word_ngrams', key)
+                    key = (n, ngrams.pack(ids[-n:], ngrams.WORD_BITS))
+                    self.writer.ngram_last('word_ngrams', key)
 
     def __count_symbols(self, word: str, clear_word: str, pos: bool, bigrams: bool):
-        '''Symbol/symbol bigrams counting.'''
+        '''Symbol/symbol bigrams/symbol n-grams counting (bigrams – all n-grams of order 2+).
+
+        N-grams of order 3+ are counted for sequences of allowed symbols (as bigrams),
+            their position is the position of the first symbol.
+        '''
+        allowed_symbols = self.tokenizer.allowed_symbols
+        word_symbols = self.tokenizer.word_symbols
+        writer = self.symbol_writer
+        orders = self.symbol_orders if bigrams else ()
+        bigrams = bigrams and 2 in self.symbol_ngrams
+        sequence: list = []  # code points of the current sequence of allowed symbols
+        positions: list = []  # and their positions
         last_symb = None
         shift = 0
         for symb_pos, symb in enumerate(word, 1):
-            if symb not in self.allowed_symbols:
+            if symb not in allowed_symbols:
                 last_symb = None
+                sequence = []
+                positions = []
                 continue
             if self.total_symbols > 0:
                 self.total_symbols -= 1
                 continue
-            if re.search(self.word_pattern, symb):
+            if symb in word_symbols:
                 position = symb_pos - shift
             else:
                 shift += 1
                 position = symb_pos
-            symb = symb.replace("'", "''")
-            self.cursor.execute(
-                f'''
-                UPDATE symbols
-                SET quantity=quantity+1
-                    {f', position=(position*quantity+{position}) / (quantity+1)' if pos else ''}
-                WHERE chr='{symb}';
-                '''
-            )
+            writer.symbol(symb, position if pos else 0)
 
             if last_symb and bigrams:
-                self.cursor.execute(
-                    f'''
-                    INSERT INTO symbol_bigrams
-                        (first_symb, second_symb, quantity, as_first, as_last
-                            {', position' if pos else ''})
-                    VALUES ('{last_symb}', '{symb}', 1, 0, 0 {f', {position - 1}' if pos else ''})
-                    ON CONFLICT (first_symb, second_symb)
-                        DO UPDATE SET quantity=quantity+1
-                    {f', position=(position*quantity+{position-1}) / (quantity+1)' if pos else ''};
-                    '''
-                )
+                writer.symbol_bigram(last_symb, symb, position - 1 if pos else 0)
+
+            if orders:
+                sequence.append(ord(symb))
+                positions.append(position if pos else 0)
+                for n in orders:
+                    if len(sequence) >= n:
+                        key = (n, ngrams.pack(sequence[-n:], ngrams.SYMBOL_BITS))
+                        self.writer.ngram('symbol_ngrams', key, positions[-n])
 
             last_symb = symb
 
         if len(clear_word) > 1 and not self.total_symbols:
-            self.cursor.execute(
-                f'''
-                UPDATE symbols
-                SET as_first=as_first+1
-                WHERE chr='{clear_word[0]}';
-                '''
-            )
-            self.cursor.execute(
-                f'''
-                UPDATE symbols
-                SET as_last=as_last+1
-                WHERE chr='{clear_word[-1]}';
-                '''
-            )
+            writer.symbol_edges(clear_word[0], clear_word[-1])
             if len(clear_word) > 2 and bigrams:
-                values = [x.replace("'", "''") for x in clear_word]
-                if values[0] in self.allowed_symbols and values[1] in self.allowed_symbols:
-                    self.cursor.execute(
-                        f'''
-                        UPDATE symbol_bigrams
-                        SET as_first=as_first+1
-                        WHERE first_symb='{values[0]}' AND second_symb='{values[1]}';
-                        '''
-                    )
-                if values[-1] in self.allowed_symbols and values[-2] in self.allowed_symbols:
-                    self.cursor.execute(
-                        f'''
-                        UPDATE symbol_bigrams
-                        SET as_last=as_last+1
-                        WHERE first_symb='{values[-2]}' AND second_symb='{values[-1]}'
-                        '''
-                    )
+                if clear_word[0] in allowed_symbols and clear_word[1] in allowed_symbols:
+                    writer.symbol_bigram_first(clear_word[0], clear_word[1])
+                if clear_word[-1] in allowed_symbols and clear_word[-2] in allowed_symbols:
+                    writer.symbol_bigram_last(clear_word[-2], clear_word[-1])
+            for n in orders:
+                if len(clear_word) <= n:
+                    break
+                for edge, method in (
+                    (clear_word[:n], self.writer.ngram_first),
+                    (clear_word[-n:], self.writer.ngram_last),
+                ):
+                    if all(x in allowed_symbols for x in edge):
+                        key = (n, ngrams.pack(map(ord, edge), ngrams.SYMBOL_BITS))
+                        method('symbol_ngrams', key)
 
 
 class Analysis:
@@ -250,13 +473,45 @@ class Analysis:
                 \'?[a-zA-Zа-яА-ЯёЁ]+)|[a-zA-Zа-яА-ЯёЁ]',
         allowed_symbols: List[Union[int, str]] = [*range(32, 127), 1025, *range(1040, 1104), 1105],
         yo: int = 0,
+        buffer_size: int = 0,
+        flush_interval: float = 60,
+        workers: int = 1,
+        chunk_size: int = 1000,
+        durability: str = 'safe',
+        symbol_backend: str = 'sql',
+        symbol_ngrams: tuple = (1, 2),
+        word_ngrams: tuple = (1, 2),
+        heavy_hitters: int = 0,
+        heavy_words: bool = False,
+        yo_map: bool = False,
+        finalize: bool = False,
+        profile: bool = False,
+        profile_callback: Optional[Callable[[dict], None]] = None,
+        profile_interval: float = 10,
     ):
         self.name = name
         self.mode = mode
         self.word_pattern = word_pattern
         self.allowed_symbols = allowed_symbols
         self.yo = yo
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.durability = durability
+        self.symbol_backend = symbol_backend
+        self.symbol_ngrams = symbol_ngrams
+        self.word_ngrams = word_ngrams
+        self.heavy_hitters = heavy_hitters
+        self.heavy_words = heavy_words
+        self.yo_map = yo_map
+        self.auto_finalize = finalize
+        self.profile = profile
+        self.profile_callback = profile_callback
+        self.profile_interval = profile_interval
         self.db = None
+        self.analysis = None
+        self.profiler = None
 
     def __enter__(self):
         if not re.search('^[a-zа-яё0-9_.@() -]+$', self.name, re.I):
@@ -305,9 +560,68 @@ class Analysis:
             raise Exception(
                 "Yo mode require additional 'yo.txt' and 'ye-yo.txt' files near the script."
             )
+        if not isinstance(self.buffer_size, int) or self.buffer_size < 0:
+            raise Exception(
+                "Buffer size must be a non-negative integer (0 – write each item immediately)."
+            )
+        if self.durability not in db_create.DURABILITY:
+            raise Exception(
+                f"Durability must be one of {', '.join(db_create.DURABILITY)}. "
+                "If empty – works as 'safe'."
+            )
+        if self.symbol_backend not in ('sql', 'numpy'):
+            raise Exception(
+                "Symbol backend must be 'sql' or 'numpy'. If empty – works as 'sql'."
+            )
+        if self.symbol_backend == 'numpy' and dense.np is None:
+            raise Exception("Symbol backend 'numpy' requires numpy package.")
+        for orders in (self.symbol_ngrams, self.word_ngrams):
+            if (
+                not isinstance(orders, (tuple, list))
+                or not all(isinstance(x, int) and x > 0 for x in orders)
+                or 1 not in orders
+            ):
+                raise Exception(
+                    "N-gram orders must be a tuple of positive integers with 1 "
+                    "(symbols/words are always counted), e.g. (1, 2, 3). "
+                    "If empty – works as (1, 2)."
+                )
+        if not isinstance(self.workers, int) or self.workers < 1:
+            raise Exception("Number of workers must be a positive integer.")
+        if self.workers > 1 and self.mode == 'c':
+            raise Exception(
+                "Mode 'c' requires the same order of sentences as in the previous analysis "
+                "and can't be used with several workers."
+            )
+        if not isinstance(self.heavy_hitters, int) or self.heavy_hitters < 0:
+            raise Exception(
+                "Heavy hitters capacity must be a non-negative integer (0 – exact counting)."
+            )
+        if self.heavy_words and not self.heavy_hitters:
+            raise Exception("Heavy words mode requires heavy hitters capacity.")
+        if self.heavy_hitters and self.workers > 1:
+            raise Exception(
+                "Heavy hitters summaries of worker processes can't be merged with the error "
+                "bounds, so heavy hitters mode can't be used with several workers."
+            )
+        if not isinstance(self.yo_map, bool):
+            raise Exception("Yo map switch must be True or False. If empty – works as False.")
+        if self.yo_map and self.workers > 1:
+            raise Exception(
+                "Ye/yo pairs are counted in the main process and the map "
+                "can't be used with several workers."
+            )
+        if self.profile and self.workers > 1:
+            raise Exception(
+                "Profiling times the stages of the single process and can't be used "
+                "with several workers."
+            )
+        if self.profile_callback is not None and not callable(self.profile_callback):
+            raise Exception("Profile callback must be a function, which gets the stats dict.")
 
         if isinstance(self.allowed_symbols[0], int):
             self.allowed_symbols = [chr(x) for x in self.allowed_symbols]
+        tokenizer = Tokenizer(self.word_pattern, self.allowed_symbols)
 
         if not os.path.exists(os.path.join(os.getcwd(), self.name)):
             os.mkdir(os.path.join(os.getcwd(), self.name))
@@ -315,24 +629,123 @@ class Analysis:
         total_words = 0
         total_symbols = 0
         self.db = sqlite3.connect(os.path.join(os.getcwd(), self.name, 'result.db'))
+        db_create.set_durability(self.db, self.durability)
         cursor = self.db.cursor()
         if self.mode == 'n':
             db_create.create_new(self.db, self.allowed_symbols)
             if self.yo:
                 db_create.yo_mode(self.db)
-        elif self.mode == 'c':
+        else:
+            db_create.migrate(self.db)
+            db_create.drop_indexes(self.db)
+        checkpoints = {}
+        if self.mode == 'a':
+            cursor.execute('DELETE FROM checkpoints;')
+            self.db.commit()
+        if self.mode == 'c':
+            for source, *checkpoint in cursor.execute('SELECT * FROM checkpoints;'):
+                checkpoints[source] = tuple(checkpoint)
+        if self.mode == 'c' and not checkpoints:
+            # DB of previous versions – skip already counted words and symbols one by one
             total_words = cursor.execute('SELECT SUM(quantity) FROM words;').fetchone()[0]
             total_symbols = cursor.execute('SELECT SUM(quantity) FROM symbols;').fetchone()[0]
-        elif self.mode == 'a' and self.yo == 2:
+        if self.mode == 'a' and self.yo == 2:
             db_create.yo_mode(self.db, True)
-
-        return FrequencyAnalysis(
-            self.name, self.word_pattern, self.allowed_symbols, total_symbols, total_words, self.db
+        yo_pairs = None
+        if self.yo_map:
+            yo_pairs = yo.load_pairs(self.db)
+        else:
+            yo.reset_quantities(self.db)
+
+        if self.workers > 1:
+            self.analysis = parallel.ParallelAnalysis(
+                self.name,
+                tokenizer,
+                self.allowed_symbols,
+                self.workers,
+                self.chunk_size,
+                {
+                    'buffer_size': self.buffer_size or 100000,
+                    'flush_interval': self.flush_interval,
+                    'symbol_backend': self.symbol_backend,
+                    'symbol_ngrams': self.symbol_ngrams,
+                    'word_ngrams': self.word_ngrams,
+                },
+            )
+            return self.analysis
+        if self.profile:
+            self.profiler = profiling.Profiler(
+                self.db, self.profile_callback, self.profile_interval
+            )
+        self.analysis = FrequencyAnalysis(
+            self.name,
+            self.word_pattern,
+            self.allowed_symbols,
+            total_symbols,
+            total_words,
+            self.db,
+            self.buffer_size,
+            self.flush_interval,
+            tokenizer,
+            self.durability,
+            checkpoints,
+            self.symbol_backend,
+            self.symbol_ngrams,
+            self.word_ngrams,
+            self.heavy_hitters,
+            self.heavy_words,
+            yo_pairs,
+            self.profiler,
         )
+        return self.analysis
 
     def __exit__(self, type_, value, traceback):
+        if type_ is not None:
+            # data of the interrupted batch doesn't match the last checkpoints
+            if self.workers > 1:
+                self.analysis.terminate()
+            else:
+                self.analysis.rollback()
+        elif self.workers > 1:
+            self.analysis.close(self.db)
+        else:
+            self.analysis.flush()
         self.db.commit()
+        if self.profiler:
+            self.profiler.close()
+        if self.auto_finalize and type_ is None:
+            self.finalize()
         self.db.close()
+        self.db = None
+
+    def stats(self) -> dict:
+        '''Return snapshot of the profiler timers and counters (also after the analysis).'''
+        if not self.profiler:
+            raise Exception("Profiling is disabled. Use Analysis(profile=True) to enable it.")
+        return self.profiler.stats()
+
+    def finalize(self) -> dict:
+        '''Create report indexes, run ANALYZE and write compacted copy of the DB.
+
+        Can be called after the end of the analysis (then the DB of the "name" folder is opened).
+        Copy is written to the "result_compact.db" of the same folder (existing one is replaced).
+        Return {step: seconds}.
+        '''
+        path = os.path.join(os.getcwd(), self.name, 'result_compact.db')
+        db = self.db
+        if db is None:
+            if not os.path.isfile(os.path.join(os.getcwd(), self.name, 'result.db')):
+                raise Exception(f"DB file in the '{self.name}' folder is not exist!")
+            db = sqlite3.connect(os.path.join(os.getcwd(), self.name, 'result.db'))
+            db_create.migrate(db)
+        try:
+            timings = db_create.finalize(db, path)
+        finally:
+            if db is not self.db:
+                db.close()
+        for step, seconds in timings.items():
+            print(f'... {step} – {seconds:.2f} s')
+        return timings
 
 
 __all__ = ['Analysis']
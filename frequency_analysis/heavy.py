@@ -0,0 +1,136 @@
+﻿'''Additional module to frequency.py for approximate counting of the most frequent word bigrams
+    (and optionally words) in fixed memory.
+
+Each table is kept as a Space-Saving summary of the given capacity (number of monitored items):
+    a new item replaces the item with the minimal quantity and takes over its quantity as error.
+Guarantees for the summary of the stream with N counted items:
+    quantity of the monitored item is never less than the true one and exceeds it at most by
+        its error (so quantity - error is the lower bound);
+    any item out of the summary occurs at most min quantity (<= N / capacity) times,
+        so all items with more occurrences are in the summary.
+as_first, as_last and position sum are counted only while the item is monitored
+    (average position is position sum / (quantity - error)).
+The summary replaces the table rows on flush (right before each commit), the table is loaded
+    back to the summary by the top quantities for the continued analysis.
+'''
+
+from frequency_analysis import queries
+
+
+class SpaceSaving:
+    '''Space-Saving summary of one table.
+
+    Items – {key: [quantity, as_first, as_last, position sum, error]};
+    buckets – {quantity: set of keys} to find the item with minimal quantity at once.
+    '''
+
+    def __init__(self, cursor, table: str, capacity: int):
+        self.table = table
+        self.capacity = capacity
+        self.items: dict = {}
+        self.buckets: dict = {}
+        for *key, quantity, as_first, as_last, position_sum, error in cursor.execute(
+            queries.HEAVY_LOAD[table], (capacity,)
+        ):
+            key = tuple(key) if len(key) > 1 else key[0]
+            self.items[key] = [quantity, as_first, as_last, position_sum, error]
+            self.buckets.setdefault(quantity, set()).add(key)
+        self.min = min(self.buckets, default=0)
+        # keys changed and evicted since the last flush (the first flush rewrites the table)
+        self.changed: set = set()
+        self.removed: set = set()
+        self.rewrite = True
+
+    def add(self, key, position: int):
+        '''Count the item. Position is 0 if it isn't counted.'''
+        if (item := self.items.get(key)) is None:
+            if len(self.items) < self.capacity:
+                item = self.items[key] = [0, 0, 0, 0, 0]
+                self.buckets.setdefault(0, set()).add(key)
+                self.min = 0
+            else:
+                bucket = self.buckets[self.min]
+                evicted = bucket.pop()
+                del self.items[evicted]
+                self.changed.discard(evicted)
+                self.removed.add(evicted)
+                item = self.items[key] = [self.min, 0, 0, 0, self.min]
+                bucket.add(key)
+            self.removed.discard(key)
+        quantity = item[0]
+        bucket = self.buckets[quantity]
+        bucket.discard(key)
+        if not bucket:
+            del self.buckets[quantity]
+            if quantity == self.min:
+                self.min += 1
+        self.buckets.setdefault(quantity + 1, set()).add(key)
+        item[0] += 1
+        item[3] += position
+        self.changed.add(key)
+
+    def edge(self, key, index: int):
+        '''Count the item as first (index 1) or last (index 2), if it's monitored.'''
+        if (item := self.items.get(key)) is not None:
+            item[index] += 1
+            self.changed.add(key)
+
+    def flush(self, cursor):
+        '''Write changed items to the DB and delete evicted ones.'''
+        if self.rewrite:
+            cursor.execute(f'DELETE FROM {self.table};')
+            self.changed = set(self.items)
+            self.rewrite = False
+        else:
+            cursor.executemany(
+                queries.HEAVY_DELETE[self.table],
+                (x if isinstance(x, tuple) else (x,) for x in self.removed),
+            )
+        cursor.executemany(
+            queries.HEAVY_REPLACE[self.table],
+            (
+                (*self.items[x], *x) if isinstance(x, tuple) else (*self.items[x], x)
+                for x in self.changed
+            ),
+        )
+        self.changed.clear()
+        self.removed.clear()
+
+
+class HeavyHitters:
+    '''Count word bigrams (and words) with Space-Saving summaries.
+
+    Has the same word methods as writers, so FrequencyAnalysis can use it instead of them.
+    '''
+
+    def __init__(self, db, capacity: int, words: bool = False):
+        cursor = db.cursor()
+        self.word_bigrams = SpaceSaving(cursor, 'word_bigrams', capacity)
+        self.words = SpaceSaving(cursor, 'words', capacity) if words else None
+
+    def word(self, word: str, position: int):
+        '''Count single word. Position is 0 if it isn't counted.'''
+        self.words.add(word, position)
+
+    def word_edges(self, first: str, last: str):
+        '''Count first and last words of the sentence.'''
+        self.words.edge(first, 1)
+        self.words.edge(last, 2)
+
+    def word_bigram(self, first: int, second: int, position: int):
+        '''Count word bigram (by vocabulary IDs). Position is 0 if it isn't counted.'''
+        self.word_bigrams.add((first, second), position)
+
+    def word_bigram_first(self, first: int, second: int):
+        '''Count word bigram at the beginning of the sentence.'''
+        self.word_bigrams.edge((first, second), 1)
+
+    def word_bigram_last(self, first: int, second: int):
+        '''Count word bigram at the end of the sentence.'''
+        self.word_bigrams.edge((first, second), 2)
+
+    def flush(self, cursor):
+        '''Write summaries to the DB.'''
+        self.word_bigrams.flush(cursor)
+        if self.words:
+            self.words.flush(cursor)
@@ -0,0 +1,73 @@
+﻿'''Additional module to frequency.py for n-grams of any order (3 and more).
+
+Unigrams and bigrams have their own tables, all longer n-grams are kept in two generic tables
+    (symbol_ngrams and word_ngrams) with (n, key) primary key.
+N-gram key is packed into a single integer:
+    symbols – by their code points (SYMBOL_BITS each);
+    words   – by their IDs from the "vocabulary" table (WORD_BITS each).
+Keys which don't fit into SQLite INTEGER (63 bits) are stored as big-endian BLOB.
+'''
+
+from frequency_analysis import queries
+
+SYMBOL_BITS = 21
+WORD_BITS = 31
+
+
+def pack(ids, bits: int):
+    '''Pack integer IDs to the DB key.'''
+    key = 0
+    for x in ids:
+        key = key << bits | x
+    if key < 1 << 63:
+        return key
+    return key.to_bytes((key.bit_length() + 7) // 8, 'big')
+
+
+def unpack(key, n: int, bits: int) -> list:
+    '''Unpack the DB key of the n-gram to the list of integer IDs.'''
+    if isinstance(key, bytes):
+        key = int.from_bytes(key, 'big')
+    mask = (1 << bits) - 1
+    return [key >> (bits * x) & mask for x in range(n - 1, -1, -1)]
+
+
+def words(cursor, ids) -> dict:
+    '''Get {word ID: word} for all passed IDs from the "vocabulary" table.'''
+    ids = list(set(ids))
+    result = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        result.update(
+            cursor.execute(
+                f'SELECT id, word FROM vocabulary WHERE id IN ({", ".join("?" * len(chunk))});',
+                chunk,
+            )
+        )
+    return result
+
+
+class Vocabulary:
+    '''Intern words to integer IDs of the "vocabulary" table.
+
+    All known words are loaded to the memory on creation.
+    New words get their IDs immediately and are written to the DB on flush (before each commit).
+    '''
+
+    def __init__(self, db):
+        self.ids = dict(db.execute('SELECT word, id FROM vocabulary;'))
+        self.next_id = max(self.ids.values(), default=0) + 1
+        self.new: list = []
+
+    def get(self, word: str) -> int:
+        '''Get ID of the word (new ID for unknown word).'''
+        if (word_id := self.ids.get(word)) is None:
+            word_id = self.ids[word] = self.next_id
+            self.next_id += 1
+            self.new.append((word_id, word))
+        return word_id
+
+    def flush(self, cursor):
+        '''Write new words to the DB.'''
+        cursor.executemany(queries.NEW_VOCABULARY_WORD, self.new)
+        self.new.clear()
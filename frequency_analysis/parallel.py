@@ -0,0 +1,179 @@
+﻿'''Additional module to frequency.py for analysis in several processes.
+
+Each worker process counts sentences into its own temporary shard DB (near the main result.db).
+Shards are temporary, so they always use the 'bulk' durability profile.
+Shards are merged into the main DB on Analysis exit and removed.
+'''
+
+import multiprocessing
+import os
+import queue
+import sqlite3
+from itertools import islice
+
+from frequency_analysis import db_create, ngrams, queries
+
+
+def worker(shard_path, tokenizer, allowed_symbols, options, tasks):
+    '''Worker process entry point. Count all received chunks of tasks into the shard DB.
+
+    options – keyword arguments for FrequencyAnalysis (buffer_size, flush_interval etc.).
+    '''
+    from frequency_analysis.frequency import FrequencyAnalysis
+
+    if os.path.isfile(shard_path):
+        os.remove(shard_path)
+    db = sqlite3.connect(shard_path)
+    db_create.set_durability(db, 'bulk')
+    db_create.create_new(db, allowed_symbols)
+    analysis = FrequencyAnalysis(
+        '',
+        tokenizer.pattern.pattern,
+        allowed_symbols,
+        0,
+        0,
+        db,
+        tokenizer=tokenizer,
+        durability='bulk',
+        **options,
+    )
+    while (chunk := tasks.get()) is not None:
+        for method, data, kwargs in chunk:
+            getattr(analysis, method)(data, **kwargs)
+    analysis.flush()
+    db.commit()
+    db.close()
+
+
+def merge_shard(db, shard_path):
+    '''Add all counted data from the shard DB to the main DB (all values are plain sums).
+
+    Word bigrams and keys of word n-grams are remapped to word IDs of the main DB.
+    '''
+    cursor = db.cursor()
+    cursor.execute('ATTACH DATABASE ? AS shard;', (shard_path,))
+    for query in queries.MERGE.values():
+        cursor.execute(query)
+    cursor.execute(queries.MERGE_VOCABULARY)
+    cursor.execute(queries.MERGE_WORD_BIGRAMS)
+    word_ids = dict(cursor.execute(queries.SHARD_WORD_IDS))
+    cursor.executemany(
+        queries.UPSERT['word_ngrams'],
+        (
+            (
+                *values,
+                n,
+                ngrams.pack(
+                    (word_ids[x] for x in ngrams.unpack(key, n, ngrams.WORD_BITS)),
+                    ngrams.WORD_BITS,
+                ),
+            )
+            for n, key, *values in db.execute(queries.SHARD_WORD_NGRAMS)
+        ),
+    )
+    db.commit()
+    cursor.execute('DETACH DATABASE shard;')
+
+
+class ParallelAnalysis:
+    '''Drop-in replacement for FrequencyAnalysis, which sends sentences to worker processes.
+
+    Sentences are grouped in chunks of chunk_size calls. Each chunk is counted by a free worker.
+    Each file from count_file() is read and counted by a single worker as a whole,
+        so sentence_splitter must be picklable (e.g. module-level function).
+    options – keyword arguments for FrequencyAnalysis in workers (see worker()).
+    '''
+
+    def __init__(self, name, tokenizer, allowed_symbols, workers, chunk_size, options):
+        self.chunk_size = chunk_size
+        self.chunk: list = []
+        context = multiprocessing.get_context()
+        self.tasks = context.Queue(maxsize=workers * 2)
+        self.shards = [
+            os.path.join(os.getcwd(), name, f'result.shard{n}.db') for n in range(workers)
+        ]
+        self.processes = [
+            context.Process(
+                target=worker,
+                args=(path, tokenizer, allowed_symbols, options, self.tasks),
+                daemon=True,
+            )
+            for path in self.shards
+        ]
+        for process in self.processes:
+            process.start()
+
+    def __put(self, chunk):
+        '''Put chunk to the task queue, but don't wait forever if some worker has failed.'''
+        while True:
+            try:
+                self.tasks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                if not all(process.is_alive() for process in self.processes):
+                    raise Exception('One of the analysis worker processes has failed.')
+
+    def __add(self, method, word_list, kwargs):
+        self.chunk.append((method, list(word_list), kwargs))
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def count_all(self, word_list: list, pos=False, symbol_bigrams=True, word_bigrams=True):
+        '''Same as FrequencyAnalysis.count_all(), but counted in one of the worker processes.'''
+        self.__add(
+            'count_all',
+            word_list,
+            {'pos': pos, 'symbol_bigrams': symbol_bigrams, 'word_bigrams': word_bigrams},
+        )
+
+    def count_words(self, word_list: list, pos=False, bigrams=True):
+        '''Same as FrequencyAnalysis.count_words(), but counted in one of the worker processes.'''
+        self.__add('count_words', word_list, {'pos': pos, 'bigrams': bigrams})
+
+    def count_symbols(self, word_list: list, pos=False, bigrams=True):
+        '''Same as FrequencyAnalysis.count_symbols(), but counted in one of the worker processes.'''
+        self.__add('count_symbols', word_list, {'pos': pos, 'bigrams': bigrams})
+
+    def count_stream(
+        self, sentences, pos=False, symbol_bigrams=True, word_bigrams=True, **kwargs
+    ):
+        '''Same as FrequencyAnalysis.count_stream(), but counted by chunks in worker processes.'''
+        kwargs.update(pos=pos, symbol_bigrams=symbol_bigrams, word_bigrams=word_bigrams)
+        sentences = iter(sentences)
+        while batch := list(islice(sentences, self.chunk_size)):
+            self.__put([('count_stream', batch, kwargs)])
+
+    def count_file(self, path: str, sentence_splitter=None, **kwargs):
+        '''Same as FrequencyAnalysis.count_file(), but the file is counted in a worker process.'''
+        kwargs['sentence_splitter'] = sentence_splitter
+        self.__put([('count_file', path, kwargs)])
+
+    def flush(self):
+        '''Send the current incomplete chunk to workers.'''
+        if self.chunk:
+            self.__put(self.chunk)
+            self.chunk = []
+
+    def close(self, db):
+        '''Stop workers, merge their shards to the main DB and remove them.'''
+        self.flush()
+        for _ in self.processes:
+            self.__put(None)
+        for process in self.processes:
+            process.join()
+        if any(process.exitcode for process in self.processes):
+            raise Exception('One of the analysis worker processes has failed.')
+        for path in self.shards:
+            merge_shard(db, path)
+            os.remove(path)
+
+    def terminate(self):
+        '''Stop workers and remove their shards without merging (on errors in the main process).'''
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        for path in self.shards:
+            for suffix in ('', '-journal', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
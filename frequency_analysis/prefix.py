@@ -0,0 +1,172 @@
+﻿'''Prefix index over the words table for "top words with the prefix" queries.
+
+Words are kept as a sorted array (in the same byte order as the DB keys),
+    so words with any prefix are a contiguous range found by binary search.
+The segment tree of the quantities ([node: index of the most frequent word of the node range])
+    gives the most frequent word of any range in O(log n), so top k words of the range are
+    found in O(k log n) by splitting the range around each found word.
+Ties are ordered by word, as in the result sheets.
+
+File layout (little-endian, all sections are 8-byte aligned):
+    header     – magic, version, n (number of words), size (number of tree leaves),
+                   size and modification time of the DB at building (to detect outdated index);
+    offsets    – uint64[n + 1] – word boundaries in the text section;
+    quantities – int64[n + 1] – quantities of the words (+ -1 for empty tree leaves);
+    tree       – uint32[2 * size] – word indexes of the segment tree nodes;
+    text       – UTF-8 words one after another.
+The file is memory-mapped, so nothing except the found words is read into memory.
+'''
+
+import heapq
+import mmap
+import os
+import struct
+from array import array
+
+MAGIC = b'FAPX'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQQQ')
+FILE_NAME = 'prefix_index.bin'
+
+
+def _db_state(db_path: str) -> tuple:
+    '''Return size and modification time of the DB file.'''
+    stat = os.stat(db_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build(cursor, db_path: str, path: str):
+    '''Build prefix index of the "words" table to the path.'''
+    offsets = array('Q', [0])
+    quantities = array('q')
+    text = bytearray()
+    for word, quantity in cursor.execute('SELECT word, quantity FROM words ORDER BY word;'):
+        text += word.encode('utf-8')
+        offsets.append(len(text))
+        quantities.append(quantity)
+    n = len(quantities)
+    quantities.append(-1)
+    size = 1
+    while size < n:
+        size *= 2
+    tree = array('I', [n]) * (2 * size)
+    tree[size : size + n] = array('I', range(n))
+    for node in range(size - 1, 0, -1):
+        left, right = tree[2 * node], tree[2 * node + 1]
+        tree[node] = right if quantities[right] > quantities[left] else left
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, size, *_db_state(db_path)))
+        offsets.tofile(f)
+        quantities.tofile(f)
+        tree.tofile(f)
+        f.write(text)
+
+
+class PrefixIndex:
+    '''Memory-mapped prefix index file.'''
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n, self.size, *self.db_state = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise Exception(f"File '{path}' is not a prefix index of this version.")
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.offsets = view[start : start + 8 * (self.n + 1)].cast('Q')
+        start += 8 * (self.n + 1)
+        self.quantities = view[start : start + 8 * (self.n + 1)].cast('q')
+        start += 8 * (self.n + 1)
+        self.tree = view[start : start + 8 * self.size].cast('I')
+        start += 8 * self.size
+        self.text = view[start:]
+
+    def close(self):
+        '''Release the memory map.'''
+        for x in (self.offsets, self.quantities, self.tree, self.text):
+            x.release()
+        self.map.close()
+
+    def is_actual(self, db_path: str) -> bool:
+        '''Whether the DB wasn't changed after the index building.'''
+        return tuple(self.db_state) == _db_state(db_path)
+
+    def word(self, index: int) -> str:
+        '''Return word by its index in the sorted array.'''
+        return str(self.text[self.offsets[index] : self.offsets[index + 1]], 'utf-8')
+
+    def __bytes(self, index: int, length: int = -1) -> bytes:
+        '''Return UTF-8 word (or its first bytes) by its index.'''
+        start, end = self.offsets[index], self.offsets[index + 1]
+        if length >= 0:
+            end = min(end, start + length)
+        return bytes(self.text[start:end])
+
+    def range(self, prefix: str) -> tuple:
+        '''Return [start, end) range of the words with the prefix.'''
+        key = prefix.encode('utf-8')
+        low, high = 0, self.n
+        while low < high:
+            middle = (low + high) // 2
+            if self.__bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        start, high = low, self.n
+        while low < high:
+            middle = (low + high) // 2
+            if self.__bytes(middle, len(key)) == key:
+                low = middle + 1
+            else:
+                high = middle
+        return start, low
+
+    def __max(self, start: int, end: int) -> int:
+        '''Return index of the most frequent word of the [start, end) range.'''
+        best = self.n
+        quantities = self.quantities
+        start += self.size
+        end += self.size
+        while start < end:
+            for node in ((start,) if start & 1 else ()) + ((end - 1,) if end & 1 else ()):
+                index = self.tree[node]
+                if quantities[index] > quantities[best] or (
+                    quantities[index] == quantities[best] and index < best
+                ):
+                    best = index
+            start = (start + 1) >> 1
+            end >>= 1
+        return best
+
+    def top(self, prefix: str, k: int) -> list:
+        '''Return [(word, quantity)] of k most frequent words with the prefix (0 – all).'''
+        start, end = self.range(prefix)
+        result: list = []
+        heap = []
+        if start < end:
+            best = self.__max(start, end)
+            heap.append((-self.quantities[best], best, start, end))
+        while heap and (not k or len(result) < k):
+            quantity, best, start, end = heapq.heappop(heap)
+            result.append((self.word(best), -quantity))
+            for low, high in ((start, best), (best + 1, end)):
+                if low < high:
+                    index = self.__max(low, high)
+                    heapq.heappush(heap, (-self.quantities[index], index, low, high))
+        return result
+
+
+def load(cursor):
+    '''Open prefix index of the DB of the cursor, if it exists and is actual (else None).'''
+    db_path = cursor.execute('PRAGMA database_list;').fetchone()[2]
+    path = os.path.join(os.path.dirname(db_path), FILE_NAME)
+    if not os.path.isfile(path):
+        return None
+    index = PrefixIndex(path)
+    if index.is_actual(db_path):
+        return index
+    index.close()
+    print(f"Prefix index '{path}' is outdated, rebuild it to use.")
+    return None
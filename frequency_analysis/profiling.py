@@ -0,0 +1,193 @@
+﻿'''Additional module to frequency.py and results.py for optional profiling of the stages.
+
+Profiler is created only when profiling is requested. Profiled methods are replaced on the
+    instance by timing wrappers, so without profiling the counting and writing code runs as is.
+Timers are cumulative ({stage: [calls, seconds]}), stages of the nested calls are included in
+    the outer ones (e.g. "bigram update" is a part of "symbol update" and "word update").
+SQL statements of the connection are counted by their first keyword (set_trace_callback).
+Selections of treat() with several workers are timed on the worker connections separately
+    from the time, which the sheet waits for them (see Profiler.prepared()).
+'''
+
+import threading
+from time import monotonic, perf_counter
+
+
+class Profiler:
+    '''Cumulative timers and counters of the stages with periodic reporting.
+
+    callback – function, which gets stats() snapshot every "interval" seconds
+        (checked after each counted batch/written sheet) and on close.
+    '''
+
+    def __init__(self, db, callback=None, interval: float = 10):
+        self.db = db
+        self.callback = callback
+        self.interval = interval
+        self.start = self.last_report = monotonic()
+        self.timers: dict = {}  # {stage: [calls, seconds]}
+        self.counters: dict = {}  # {name: value}
+        # {sheet method: [calls, query seconds, total seconds, worker query seconds]}
+        self.sheets: dict = {}
+        self.statements: dict = {}  # {first keyword: number of executed statements}
+        self.sheet = None  # timer of the current sheet
+        self.lock = threading.Lock()  # statements of worker connections are counted concurrently
+        db.set_trace_callback(self.__trace)
+
+    def __trace(self, statement: str):
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+        with self.lock:
+            self.statements[keyword] = self.statements.get(keyword, 0) + 1
+
+    def watch(self, db):
+        '''Count SQL statements of another connection (e.g. of the worker thread) too.'''
+        db.set_trace_callback(self.__trace)
+
+    def timed(self, stage: str, function):
+        '''Return wrapper of the function, which adds its calls and time to the stage timer.'''
+        timer = self.timers.setdefault(stage, [0, 0.0])
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer[0] += 1
+                timer[1] += perf_counter() - start
+
+        return wrapper
+
+    def timed_sheet(self, name: str, function):
+        '''Return wrapper of the sheet method with its total time and time of DB queries.
+
+        Time of the sheet writing is the total time without query time (see ProfiledCursor).
+        '''
+
+        def wrapper(*args, **kwargs):
+            if self.sheet is not None:
+                return function(*args, **kwargs)
+            self.sheet = timer = self.sheets.setdefault(name, [0, 0.0, 0.0, 0.0])
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer[0] += 1
+                timer[2] += perf_counter() - start
+                self.sheet = None
+                self.check()
+
+        return wrapper
+
+    def prepared(self, wait_seconds: float, worker_seconds: float):
+        '''Add time of the selection, which was prepared by the worker thread, to the current sheet.
+
+        Waiting for the selection is a part of the query time, its execution on the worker
+            connection is counted separately (it runs concurrently with writing of other sheets).
+        '''
+        if self.sheet is not None:
+            self.sheet[1] += wait_seconds
+            self.sheet[3] += worker_seconds
+
+    def add(self, counter: str, value: int = 1):
+        '''Increase the counter.'''
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def stats(self) -> dict:
+        '''Return snapshot of all timers and counters.
+
+        {
+            "elapsed": seconds since the start of profiling,
+            "stages": {stage: {"calls", "seconds"}},
+            "counters": {name: value},
+            "sheets": {
+                sheet method: {"calls", "query_seconds", "write_seconds", "worker_query_seconds"}
+            },
+            "statements": {first keyword of SQL statement: number}
+        }
+        '''
+        return {
+            'elapsed': monotonic() - self.start,
+            'stages': {x: {'calls': y[0], 'seconds': y[1]} for x, y in self.timers.items()},
+            'counters': dict(self.counters),
+            'sheets': {
+                x: {
+                    'calls': y[0],
+                    'query_seconds': y[1],
+                    'write_seconds': y[2] - y[1],
+                    'worker_query_seconds': y[3],
+                }
+                for x, y in self.sheets.items()
+            },
+            'statements': dict(self.statements),
+        }
+
+    def check(self):
+        '''Pass the snapshot to the callback if the reporting interval has passed.'''
+        if self.callback and monotonic() - self.last_report >= self.interval:
+            self.last_report = monotonic()
+            self.callback(self.stats())
+
+    def close(self):
+        '''Stop counting SQL statements and pass the final snapshot to the callback.'''
+        self.db.set_trace_callback(None)
+        if self.callback:
+            self.callback(self.stats())
+
+
+class ProfiledCursor:
+    '''DB cursor proxy, which adds time of queries and reading of rows to the current sheet.'''
+
+    def __init__(self, cursor, profiler: Profiler):
+        self.cursor = cursor
+        self.profiler = profiler
+
+    def __getattr__(self, name: str):
+        return getattr(self.cursor, name)
+
+    def __timed(self, function, *args):
+        start = perf_counter()
+        try:
+            return function(*args)
+        finally:
+            if self.profiler.sheet is not None:
+                self.profiler.sheet[1] += perf_counter() - start
+
+    def execute(self, *args):
+        self.__timed(self.cursor.execute, *args)
+        return self
+
+    def fetchone(self):
+        return self.__timed(self.cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self.__timed(self.cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self.__timed(self.cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.__timed(self.cursor.__next__)
+
+
+def print_stats(stats: dict):
+    '''Default periodic callback – print the snapshot in a short form.'''
+    print(f'Profile after {stats["elapsed"]:.1f} s:')
+    for stage, data in stats['stages'].items():
+        print(f'... {stage} – {data["seconds"]:.2f} s, {data["calls"]} calls')
+    for sheet, data in stats['sheets'].items():
+        print(
+            f'... {sheet} – query {data["query_seconds"]:.2f} s, '
+            f'write {data["write_seconds"]:.2f} s'
+            + (
+                f', worker query {data["worker_query_seconds"]:.2f} s'
+                if data['worker_query_seconds']
+                else ''
+            )
+        )
+    if stats['counters']:
+        print('... ' + ', '.join(f'{x}: {y}' for x, y in stats['counters'].items()))
+    if stats['statements']:
+        print('... SQL: ' + ', '.join(f'{x} {y}' for x, y in stats['statements'].items()))
@@ -0,0 +1,222 @@
+﻿'''Additional module with all SQL statements for data writing.
+
+All statements have a fixed text with "?" parameters, so each of them is compiled by SQLite
+only once per connection (sqlite3 module caches statements by their text).
+'''
+
+# Single item statements (RowWriter)
+#   position is a plain integer addition (0 if position isn't counted)
+
+SPACE = "UPDATE symbols SET quantity=quantity+1 WHERE chr=' ';"
+
+SYMBOL = '''
+    UPDATE symbols
+    SET quantity=quantity+1, position_sum=position_sum+?
+    WHERE chr=?;
+'''
+
+SYMBOL_FIRST = 'UPDATE symbols SET as_first=as_first+1 WHERE chr=?;'
+
+SYMBOL_LAST = 'UPDATE symbols SET as_last=as_last+1 WHERE chr=?;'
+
+SYMBOL_BIGRAM = '''
+    INSERT INTO symbol_bigrams (first_symb, second_symb, quantity, as_first, as_last, position_sum)
+    VALUES (?1, ?2, 1, 0, 0, ?3)
+    ON CONFLICT (first_symb, second_symb) DO UPDATE SET
+        quantity=quantity+1, position_sum=position_sum+?3;
+'''
+
+SYMBOL_BIGRAM_FIRST = '''
+    UPDATE symbol_bigrams SET as_first=as_first+1 WHERE first_symb=? AND second_symb=?;
+'''
+
+SYMBOL_BIGRAM_LAST = '''
+    UPDATE symbol_bigrams SET as_last=as_last+1 WHERE first_symb=? AND second_symb=?;
+'''
+
+WORD = '''
+    INSERT INTO words (word, quantity, as_first, as_last, position_sum)
+    VALUES (?1, 1, 0, 0, ?2)
+    ON CONFLICT (word) DO UPDATE SET quantity=quantity+1, position_sum=position_sum+?2;
+'''
+
+WORD_FIRST = 'UPDATE words SET as_first=as_first+1 WHERE word=?;'
+
+WORD_LAST = 'UPDATE words SET as_last=as_last+1 WHERE word=?;'
+
+WORD_BIGRAM = '''
+    INSERT INTO word_bigrams (first_id, second_id, quantity, as_first, as_last, position_sum)
+    VALUES (?1, ?2, 1, 0, 0, ?3)
+    ON CONFLICT (first_id, second_id) DO UPDATE SET
+        quantity=quantity+1, position_sum=position_sum+?3;
+'''
+
+WORD_BIGRAM_FIRST = '''
+    UPDATE word_bigrams SET as_first=as_first+1 WHERE first_id=? AND second_id=?;
+'''
+
+WORD_BIGRAM_LAST = '''
+    UPDATE word_bigrams SET as_last=as_last+1 WHERE first_id=? AND second_id=?;
+'''
+
+# Bulk statements (Accumulator)
+#   all of them take the same parameters: (quantity, as_first, as_last, position sum, *key),
+#   unused ones are just skipped
+
+SYMBOLS_ADD = '''
+    UPDATE symbols
+    SET quantity=quantity+?1, as_first=as_first+?2, as_last=as_last+?3,
+        position_sum=position_sum+?4
+    WHERE chr=?5;
+'''
+
+KEYS = {
+    'symbols': ('chr',),
+    'symbol_bigrams': ('first_symb', 'second_symb'),
+    'words': ('word',),
+    'word_bigrams': ('first_id', 'second_id'),
+    'symbol_ngrams': ('n', 'key'),
+    'word_ngrams': ('n', 'key'),
+}
+
+
+def _upsert(table: str) -> str:
+    keys = KEYS[table]
+    columns = ', '.join(keys)
+    parameters = ', '.join(f'?{n}' for n in range(5, 5 + len(keys)))
+    return f'''
+        INSERT INTO {table} ({columns}, quantity, as_first, as_last, position_sum)
+        VALUES ({parameters}, ?1, ?2, ?3, ?4)
+        ON CONFLICT ({columns}) DO UPDATE SET
+            quantity=quantity+?1, as_first=as_first+?2, as_last=as_last+?3,
+            position_sum=position_sum+?4;
+    '''
+
+
+def _edges(table: str) -> str:
+    keys = KEYS[table]
+    where = ' AND '.join(f'{x}=?{n}' for n, x in enumerate(keys, 5))
+    return f'UPDATE {table} SET as_first=as_first+?2, as_last=as_last+?3 WHERE {where};'
+
+
+def _merge(table: str) -> str:
+    columns = ', '.join(KEYS[table])
+    return f'''
+        INSERT INTO main.{table} ({columns}, quantity, as_first, as_last, position_sum)
+        SELECT {columns}, quantity, as_first, as_last, position_sum
+        FROM shard.{table}
+        WHERE quantity > 0
+        ON CONFLICT ({columns}) DO UPDATE SET
+            quantity=quantity+excluded.quantity,
+            as_first=as_first+excluded.as_first,
+            as_last=as_last+excluded.as_last,
+            position_sum=position_sum+excluded.position_sum;
+    '''
+
+
+#   {table name: statement}
+UPSERT = {table: _upsert(table) for table in KEYS if table != 'symbols'}
+EDGES = {table: _edges(table) for table in KEYS if table != 'symbols'}
+#   add all data from the attached "shard" DB to the main one
+#       (word bigrams and n-grams depend on word IDs of the DB, so they are merged separately)
+MERGE = {table: _merge(table) for table in KEYS if table not in ('word_bigrams', 'word_ngrams')}
+
+MERGE_VOCABULARY = '''
+    INSERT OR IGNORE INTO main.vocabulary (word)
+    SELECT word FROM shard.vocabulary;
+'''
+
+#   (shard word ID, main word ID)
+SHARD_WORD_IDS = '''
+    SELECT s.id, m.id
+    FROM shard.vocabulary AS s
+    JOIN main.vocabulary AS m ON m.word = s.word;
+'''
+
+MERGE_WORD_BIGRAMS = '''
+    INSERT INTO main.word_bigrams (first_id, second_id, quantity, as_first, as_last, position_sum)
+    SELECT a.id, b.id, quantity, as_first, as_last, position_sum
+    FROM shard.word_bigrams
+    JOIN shard.vocabulary AS s1 ON s1.id = first_id
+    JOIN main.vocabulary AS a ON a.word = s1.word
+    JOIN shard.vocabulary AS s2 ON s2.id = second_id
+    JOIN main.vocabulary AS b ON b.word = s2.word
+    WHERE quantity > 0
+    ON CONFLICT (first_id, second_id) DO UPDATE SET
+        quantity=quantity+excluded.quantity,
+        as_first=as_first+excluded.as_first,
+        as_last=as_last+excluded.as_last,
+        position_sum=position_sum+excluded.position_sum;
+'''
+
+SHARD_WORD_NGRAMS = '''
+    SELECT n, key, quantity, as_first, as_last, position_sum
+    FROM shard.word_ngrams
+    WHERE quantity > 0;
+'''
+
+# Heavy hitters (heavy.py)
+#   items of the summary replace the table rows: (quantity, as_first, as_last, position sum,
+#   error, *key)
+
+
+def _heavy_load(table: str) -> str:
+    columns = ', '.join(KEYS[table])
+    return f'''
+        SELECT {columns}, quantity, as_first, as_last, position_sum, error
+        FROM {table}
+        ORDER BY quantity DESC
+        LIMIT ?;
+    '''
+
+
+def _heavy_replace(table: str) -> str:
+    keys = KEYS[table]
+    columns = ', '.join(keys)
+    parameters = ', '.join(f'?{n}' for n in range(6, 6 + len(keys)))
+    return f'''
+        INSERT OR REPLACE INTO {table} (
+            {columns}, quantity, as_first, as_last, position_sum, error
+        )
+        VALUES ({parameters}, ?1, ?2, ?3, ?4, ?5);
+    '''
+
+
+def _heavy_delete(table: str) -> str:
+    where = ' AND '.join(f'{x}=?' for x in KEYS[table])
+    return f'DELETE FROM {table} WHERE {where};'
+
+
+HEAVY_LOAD = {table: _heavy_load(table) for table in ('words', 'word_bigrams')}
+HEAVY_REPLACE = {table: _heavy_replace(table) for table in ('words', 'word_bigrams')}
+HEAVY_DELETE = {table: _heavy_delete(table) for table in ('words', 'word_bigrams')}
+
+# Ye/yo words (yo.py)
+#   (yo quantity, ye quantity, yo word ID, ye word ID)
+
+YO_WORD_QUANTITY = '''
+    UPDATE yo_words
+    SET yo_quantity=yo_quantity+?, ye_quantity=ye_quantity+?
+    WHERE yo_id=? AND ye_id=?;
+'''
+
+# Checkpoints
+#   (source, sentences, file position, file tail, file skip)
+
+CHECKPOINT = '''
+    INSERT OR REPLACE INTO checkpoints (source, sentences, file_position, file_tail, file_skip)
+    VALUES (?, ?, ?, ?, ?);
+'''
+
+# DB creation
+
+NEW_SYMBOL = '''
+    INSERT INTO symbols (chr, quantity, as_first, as_last, position_sum)
+    VALUES (?, 0, 0, 0, 0)
+    ON CONFLICT DO NOTHING;
+'''
+
+NEW_VOCABULARY_WORD = 'INSERT INTO vocabulary (id, word) VALUES (?, ?);'
+
+#   (yo word, ye word, mandatory) – to the temp table of the loaded ye/yo word lists
+NEW_YO_LIST = 'INSERT INTO yo_list (yo_word, ye_word, mandatory) VALUES (?, ?, ?);'
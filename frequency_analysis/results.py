@@ -4,9 +4,71 @@ import os
 import re
 import sqlite3
 from ast import literal_eval
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from string import ascii_letters, ascii_lowercase
+from time import perf_counter
 import xlsxwriter
 
+from frequency_analysis import db_create, ngrams, prefix, profiling, selection
+
+EXCEL_ROWS = 1048576
+BATCH_SIZE = 10000
+
+
+def _prepare(path: str, function, args: tuple, kwargs: dict, profiler=None) -> tuple:
+    '''Execute the selection on a new read-only connection and read the first batch of rows.
+
+    SQLite sorts and groups all rows before the first one is returned,
+        so the rest of the rows is read quickly (and in bounded memory) by the writing thread.
+    Return (connection, cursor, first batch, seconds of the selection).
+    '''
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    try:
+        if profiler:
+            profiler.watch(db)
+        start = perf_counter()
+        cursor = function(db.cursor(), *args, **kwargs)
+        batch = cursor.fetchmany(BATCH_SIZE)
+        return db, cursor, batch, perf_counter() - start
+    except BaseException:
+        db.close()
+        raise
+
+
+class PreparedRows:
+    '''Rows of the selection, which is executed by the worker thread (see _prepare()).
+
+    Can be iterated once (the connection is closed at the end) or read by fetchall().
+    With profiler waiting for the selection and reading of the rest of rows are counted
+        as query time of the current sheet, the selection itself – as its worker query time.
+    '''
+
+    def __init__(self, future, profiler=None):
+        self.future = future
+        self.profiler = profiler
+
+    def __iter__(self):
+        start = perf_counter()
+        db, cursor, batch, seconds = self.future.result()
+        if self.profiler:
+            self.profiler.prepared(perf_counter() - start, seconds)
+            cursor = profiling.ProfiledCursor(cursor, self.profiler)
+        try:
+            while batch:
+                yield from batch
+                batch = cursor.fetchmany(BATCH_SIZE)
+        finally:
+            db.close()
+
+    def fetchall(self) -> list:
+        return list(self)
+
+    def close(self):
+        '''Close the connection of the unused selection.'''
+        if not self.future.cancel() and self.future.exception() is None:
+            self.future.result()[0].close()
+
 
 class ExcelWriter:
     '''Convert generated .db data to excel view.
@@ -14,11 +76,20 @@ class ExcelWriter:
     All mandatory functions are called all at once by treat().
     Additional functions – sheet_en_symbol_bigrams(), sheet_ru_symbol_bigrams() and
         sheet_yo_words() are called individually.
+    With profiler (profiling.Profiler) time of DB queries and of writing is counted for each sheet.
+    Selections of treat() with several workers are prepared concurrently (see __select()).
     '''
 
-    def __init__(self, workbook, cursor):
+    def __init__(self, workbook, cursor, profiler=None):
         self.workbook = workbook
         self.cursor = cursor
+        self.profiler = profiler
+        self.prepared: dict = {}  # {(selection function, args, kwargs): PreparedRows}
+        if profiler:
+            self.cursor = profiling.ProfiledCursor(cursor, profiler)
+            for name in dir(self):
+                if name.startswith('sheet_'):
+                    setattr(self, name, profiler.timed_sheet(name, getattr(self, name)))
         self.f_bold = self.workbook.add_format({'bold': True, 'align': 'center'})
         self.f_percent = self.workbook.add_format({'num_format': '0.00%', 'align': 'center'})
         self.f_int = self.workbook.add_format({'num_format': '#,##0', 'align': 'center'})
@@ -26,14 +97,32 @@ class ExcelWriter:
         self.f_float = self.workbook.add_format({'num_format': '#,##0.00', 'align': 'center'})
         self.f_red_bg = self.workbook.add_format({'bg_color': '#FFC7CE', 'align': 'center'})
 
+        # was position counted for each data type
         self.pos_list = [
-            self.cursor.execute(f'SELECT AVG(position) FROM {x};').fetchone()[0]
+            self.cursor.execute(
+                f'SELECT EXISTS(SELECT 1 FROM {x} WHERE position_sum > 0);'
+            ).fetchone()[0]
             for x in ('symbols', 'symbol_bigrams', 'words', 'word_bigrams')
         ]
         self.sum_list = [
             self.cursor.execute(f'SELECT SUM(quantity) FROM {x};').fetchone()[0]
             for x in ('symbols', 'symbol_bigrams', 'words', 'word_bigrams')
         ]
+        # were words and word bigrams counted approximately (heavy hitters mode)
+        self.error_list = [
+            self.cursor.execute(f'SELECT EXISTS(SELECT 1 FROM {x} WHERE error > 0);').fetchone()[0]
+            for x in ('words', 'word_bigrams')
+        ]
+
+    def __select(self, function, *args, **kwargs):
+        '''Execute the selection function (see selection.py) on the cursor.
+
+        Rows of the same selection, which is prepared by treat() workers, are taken instead.
+        '''
+        key = (function, args, tuple(sorted(kwargs.items())))
+        if (rows := self.prepared.pop(key, None)) is not None:
+            return rows
+        return function(self.cursor, *args, **kwargs)
 
     def __add_main_style(
         self, sheet, f_width=5, a_width=12, *, two_columns=False, two_rows=0, color=None
@@ -55,6 +144,24 @@ class ExcelWriter:
         else:
             sheet.set_column(1 + two_columns, 99, a_width)
 
+    def __continued(self, sheet, name: str, header, rows):
+        '''Yield (sheet, row number, data row) for top-list rows from the iterable (DB cursor).
+
+        Rows after the Excel row limit are continued on new sheets "name (2)", "name (3)"…
+        header(sheet) – styles the sheet and writes its first row.
+        '''
+        header(sheet)
+        part = 1
+        number = 0
+        for row in rows:
+            number += 1
+            if number == EXCEL_ROWS:
+                part += 1
+                sheet = self.workbook.add_worksheet(f'{name} ({part})')
+                header(sheet)
+                number = 1
+            yield sheet, number, row
+
     def __fill_top_data(
         self,
         sheet,
@@ -62,39 +169,42 @@ class ExcelWriter:
         pos_data: bool,
         title_data: tuple,
         dbl: bool,
+        symbols: str,
         limit: int,
         chart_limit: int,
         min_quantity: int,
         sum_value: int,
     ):
-        '''Fill data for 1D (top-list) sheets.'''
-        values: list = [{}, {}]  # [case sensitive, case insensitive]
-        for symb in self.cursor.fetchall():
-            values[0][symb[0] + (symb[1] if dbl else '')] = list(symb[1 + dbl :])
-            if (s := (symb[0] + (symb[1] if dbl else '')).lower()) in values[1]:
-                if pos_data:
-                    try:
-                        values[1][s][3] = (
-                            values[1][s][3] * values[1][s][0] + symb[4 + dbl] * symb[1 + dbl]
-                        ) / (values[1][s][0] + symb[1 + dbl])
-                    except ZeroDivisionError:
-                        values[1][s][3] = 0
-                values[1][s][0] += symb[1 + dbl]
-                values[1][s][1] += symb[2 + dbl]
-                values[1][s][2] += symb[3 + dbl]
-            else:
-                values[1][s] = list(symb[1 + dbl :])
+        '''Fill data for 1D (top-list) sheets. Symbols – symbol filter ('' – all symbols).'''
+        values = [
+            (
+                self.__select(
+                    selection.top_symbol_bigrams, limit, min_quantity, ignore_case=ignore_case
+                )
+                if dbl
+                else self.__select(
+                    selection.top_symbols,
+                    limit,
+                    min_quantity,
+                    ignore_case=ignore_case,
+                    symbols=symbols,
+                )
+            ).fetchall()
+            for ignore_case in (False, True)
+        ]
 
-        for e in [0, 6 + len(title_data)]:
+        # both blocks are written row by row (constant memory workbook can't return to rows)
+        blocks = (0, 6 + len(title_data))
+        for e in blocks:
             sheet.write_row(1, e, title_data + ('Quantity', '% from all', 'As first', 'As last'))
             if pos_data:
                 sheet.write(1, 4 + len(title_data) + e, 'Avg. position')
-            values[bool(e)] = dict(
-                sorted(values[bool(e)].items(), key=lambda x: x[1][0], reverse=True)
-            )
-            for row, (symb, vals) in enumerate(values[bool(e)].items(), 2):
-                if (limit and row > limit + 1) or vals[0] < min_quantity:
-                    break
+        for row in range(2, 2 + max(len(x) for x in values)):
+            for e, items in zip(blocks, values):
+                if row - 2 >= len(items):
+                    continue
+                symb = items[row - 2][: 1 + dbl]
+                vals = items[row - 2][1 + dbl :]
                 sheet.write_string(row, 0 + e, symb[0])
                 if dbl:
                     sheet.write_string(row, 1 + e, symb[1])
@@ -106,11 +216,14 @@ class ExcelWriter:
                     sheet.write_formula(
                         row, 2 + dbl + e, f'={c}{row + 1}/SUM({c}:{c})', self.f_percent
                     )
-                if symb != ' ':
+                if symb != (' ',):
                     sheet.write_number(row, 3 + dbl + e, vals[1], self.f_int)
                     sheet.write_number(row, 4 + dbl + e, vals[2], self.f_int)
                     if pos_data:
-                        sheet.write_number(row, 5 + dbl + e, vals[3], self.f_float)
+                        sheet.write_number(
+                            row, 5 + dbl + e, vals[3] / vals[0] if vals[0] else 0, self.f_float
+                        )
+        for e in blocks:
             chart = self.workbook.add_chart({'type': 'pie'})
             chart.add_series(
                 {
@@ -125,67 +238,66 @@ class ExcelWriter:
             sheet.insert_chart(f'{"Q" if dbl else "O"}{21 if bool(e) else 3}', chart)
 
     def __2d_symbol_bigrams(self, sheet, min_quantity: int, ignore_case: bool, custom_symbols=''):
-        '''Fill data for 2D (bigrams n:n) sheets.'''
-        self.cursor.execute('SELECT DISTINCT first_symb FROM symbol_bigrams;')
-        fst_symbs = [x[0] for x in self.cursor.fetchall()]
-        self.cursor.execute('SELECT DISTINCT second_symb FROM symbol_bigrams;')
-        all_symbs = set(fst_symbs + [x[0] for x in self.cursor.fetchall()])
+        '''Fill data for 2D (bigrams n:n) sheets.
+
+        The whole table is read by one query and folded to the matrix with precomputed maps:
+            {DB symbol: symbols of the sheet, whose row it's counted in} and {symbol: row number}.
+        '''
+        rows = self.__select(selection.symbol_bigrams).fetchall()
+        all_symbs = {x for row in rows for x in row[:2]}
         if custom_symbols:
             all_symbs &= set(custom_symbols)
-        if ignore_case:
-            all_symbs = {x.lower() for x in all_symbs}
-        order: list = []
-        values: dict = {}
-        for symb in all_symbs:
-            clear_symb = symb.replace("'", "''")
-            if ignore_case:
-                where = f'''
-                    WHERE first_symb='{clear_symb.lower()}' OR first_symb='{clear_symb.upper()}';
-                    '''
-            else:
-                where = f"WHERE first_symb='{clear_symb}';"
-            self.cursor.execute(f'SELECT SUM(quantity) FROM symbol_bigrams {where}')
-            if (s := self.cursor.fetchone()[0]) and s >= min_quantity:
-                order.append(symb)
-                self.cursor.execute(f'SELECT * FROM symbol_bigrams {where}')
-                for pair in self.cursor.fetchall():
-                    b = (pair[0] + pair[1]).lower() if ignore_case else (pair[0] + pair[1])
-                    if b in values:
-                        if self.pos_list[1]:
-                            values[b][3] = (values[b][0] * values[b][3] + pair[2] * pair[5]) / (
-                                values[b][0] + pair[2]
-                            )
-                        values[b][0] += pair[2]
-                        values[b][1] += pair[3]
-                        values[b][2] += pair[4]
-                    else:
-                        values[b] = list(pair[2:])
+        fold = str.lower if ignore_case else str
+        groups: dict = {}
+        for symb in {fold(x) for x in all_symbs}:
+            for member in {symb.lower(), symb.upper()} if ignore_case else (symb,):
+                groups.setdefault(member, []).append(symb)
+        totals: dict = {}
+        for first, _, quantity, *_ in rows:
+            for symb in groups.get(first, ()):
+                totals[symb] = totals.get(symb, 0) + quantity
+        order = [x for x, total in totals.items() if total and total >= min_quantity]
         if custom_symbols:
             order = sorted(order, key=custom_symbols.index)
         else:
             order = sorted(order)
+        index = {x: n for n, x in enumerate(order, 1)}
+
+        values: dict = {}
+        for first, second, *counts in rows:
+            for symb in groups.get(first, ()):
+                if symb not in index:
+                    continue
+                if (val := values.get((fold(first), fold(second)))) is None:
+                    val = values[(fold(first), fold(second))] = [0, 0, 0, 0]
+                for n, x in enumerate(counts):
+                    val[n] += x
+
+        cells: dict = {}  # {row: [(column, values)]}
+        for (first, second), val in values.items():
+            if (row := index.get(first)) is not None and (column := index.get(second)) is not None:
+                cells.setdefault(row, []).append((column, val))
         for pos, symb in enumerate(order, 1):
-            sheet.write_string(pos, 0, symb, self.f_bold)
             sheet.write_string(0, pos, symb, self.f_bold)
-            sheet.write_row(pos, pos, (0,) * (len(order) - pos + 1), self.f_int_null)
-            sheet.write_column(pos, pos, (0,) * (len(order) - pos + 1), self.f_int_null)
-        for bigr, val in values.items():
-            if bigr[0] not in order or bigr[1] not in order:
-                continue
-            sheet.write_number(
-                order.index(bigr[0]) + 1, order.index(bigr[1]) + 1, val[0], self.f_int
-            )
-            sheet.write_comment(
-                order.index(bigr[0]) + 1,
-                order.index(bigr[1]) + 1,
-                f'As first: {val[1]}; as last: {val[2]}' + f'; position: {round(val[3], 2)}'
-                if self.pos_list[1]
-                else '',
-            )
+        for pos, symb in enumerate(order, 1):
+            sheet.write_string(pos, 0, symb, self.f_bold)
+            sheet.write_row(pos, 1, (0,) * len(order), self.f_int_null)
+            for column, val in cells.get(pos, ()):
+                sheet.write_number(pos, column, val[0], self.f_int)
+                sheet.write_comment(
+                    pos,
+                    column,
+                    f'As first: {val[1]}; as last: {val[2]}'
+                    + f'; position: {round(val[3] / val[0], 2)}'
+                    if self.pos_list[1]
+                    else '',
+                )
         f_cond_rules = {'type': 'top', 'value': 10, 'criteria': '%', 'format': self.f_red_bg}
         sheet.conditional_format(1, 1, len(order) + 1, len(order) + 1, f_cond_rules)
 
-    def treat(self, limits=(0,) * 4, chart_limits=(20,) * 4, min_quantities=(1,) * 5):
+    def treat(
+        self, limits=(0,) * 4, chart_limits=(20,) * 4, min_quantities=(1,) * 5, *, workers=1
+    ):
         '''Create main sheets all at once.
 
         Input:
@@ -197,24 +309,82 @@ class ExcelWriter:
                     — (top symbols, top symbol bigrams, top words, top word bigrams);
             min_quantities – tuple – min number of entries for each element to adding)
                     — (/same as on 'limits'/, +symbol bigrams table)
-                    — default values – (1, 1, 1, 1, 1) (ommited = default).
+                    — default values – (1, 1, 1, 1, 1) (ommited = default);
+            workers – number of threads, which execute queries of all sheets concurrently
+                    (each with its own read-only connection), keyword-only.
+                    Sheets are written in the same order by the current thread.
         '''
         for t, (l, v) in {limits: (4, 0), chart_limits: (4, 20), min_quantities: (5, 1)}.items():
             if len(t) < l:
                 literal_eval(f'{t} = tuple({t}) + ({v},) * ({l} - len({t}))')
+        if not isinstance(workers, int) or workers < 1:
+            raise Exception("Number of workers must be a positive integer.")
+        orders = [
+            (table, sheet_function, e, n)
+            for table, sheet_function, e in (
+                ('symbol_ngrams', self.sheet_top_symbol_ngrams, 1),
+                ('word_ngrams', self.sheet_top_word_ngrams, 3),
+            )
+            for (n,) in self.cursor.execute(f'SELECT DISTINCT n FROM {table};').fetchall()
+        ]
+        executor = None
+        if workers > 1:
+            executor = ThreadPoolExecutor(workers)
+            path = self.cursor.execute('PRAGMA database_list;').fetchone()[2]
+            # in order of the sheets, with the same arguments as in the calls of __select()
+            for function, args, kwargs in (
+                (selection.table_stats, (), {}),
+                *(
+                    (
+                        selection.top_symbols,
+                        (limits[0], min_quantities[0]),
+                        {'ignore_case': x, 'symbols': ''},
+                    )
+                    for x in (False, True)
+                ),
+                *(
+                    (
+                        selection.top_symbol_bigrams,
+                        (limits[1], min_quantities[1]),
+                        {'ignore_case': x},
+                    )
+                    for x in (False, True)
+                ),
+                (selection.symbol_bigrams, (), {}),
+                (selection.top_words, (limits[2], min_quantities[2]), {}),
+                (selection.top_word_bigrams, (limits[3], min_quantities[3]), {}),
+                *(
+                    (selection.top_ngrams, (table, n, limits[e], min_quantities[e]), {})
+                    for table, _, e, n in orders
+                ),
+            ):
+                self.prepared[(function, args, tuple(sorted(kwargs.items())))] = PreparedRows(
+                    executor.submit(_prepare, path, function, args, kwargs, self.profiler),
+                    self.profiler,
+                )
         print('Start of writing to .xlsx')
-        self.sheet_stats()
-        print('... "Stats" sheet was written')
-        self.sheet_top_symbols(limits[0], chart_limits[0], min_quantities[0])
-        print('... "Top symbols" sheet was written')
-        self.sheet_top_symbol_bigrams(limits[1], chart_limits[1], min_quantities[1])
-        print('... "Top symbol bigrams" sheet was written')
-        self.sheet_all_symbol_bigrams(min_quantities[4])
-        print('... "All symbol bigrams" table sheet was written')
-        self.sheet_top_words(limits[2], chart_limits[2], min_quantities[2])
-        print('... "Top words" sheet was written')
-        self.sheet_top_word_bigrams(limits[3], chart_limits[3], min_quantities[3])
-        print('... "Top word bigrams" sheet was written')
+        try:
+            self.sheet_stats()
+            print('... "Stats" sheet was written')
+            self.sheet_top_symbols(limits[0], chart_limits[0], min_quantities[0])
+            print('... "Top symbols" sheet was written')
+            self.sheet_top_symbol_bigrams(limits[1], chart_limits[1], min_quantities[1])
+            print('... "Top symbol bigrams" sheet was written')
+            self.sheet_all_symbol_bigrams(min_quantities[4])
+            print('... "All symbol bigrams" table sheet was written')
+            self.sheet_top_words(limits[2], chart_limits[2], min_quantities[2])
+            print('... "Top words" sheet was written')
+            self.sheet_top_word_bigrams(limits[3], chart_limits[3], min_quantities[3])
+            print('... "Top word bigrams" sheet was written')
+            for _, sheet_function, e, n in orders:
+                sheet_function(n, limits[e], chart_limits[e], min_quantities[e])
+        finally:
+            # selections of skipped (already existing) sheets
+            for rows in self.prepared.values():
+                rows.close()
+            self.prepared.clear()
+            if executor:
+                executor.shutdown()
         print('End of writing main sheets.')
         print(
             'You can call additional functions to create more sheets '
@@ -225,6 +395,12 @@ class ExcelWriter:
             '.\nYou can also call 2D sheet functions with "ignore_case=True" argument.'
         )
 
+    def stats(self) -> dict:
+        '''Return snapshot of the profiler timers and counters (see profiling.Profiler.stats()).'''
+        if not self.profiler:
+            raise Exception("Profiling is disabled. Use Result(profile=True) to enable it.")
+        return self.profiler.stats()
+
     def sheet_stats(self):
         '''Create main statistic of analysis. Is called from main "treat()".'''
         try:
@@ -232,26 +408,16 @@ class ExcelWriter:
         except xlsxwriter.exceptions.DuplicateWorksheetName:
             print('Sheet "Stats" already exists')
             return
-        count_list = [
-            self.cursor.execute(f'SELECT COUNT(*) FROM {x};').fetchone()[0]
-            for x in ('symbols', 'symbol_bigrams', 'words', 'word_bigrams')
-        ]
-        avg_pos_list = [
-            self.cursor.execute(
-                f'''
-                SELECT SUM(quantity*position)/SUM(quantity)
-                FROM {x}
-                {"WHERE chr != ' '" if x == "symbols" else ""};
-                '''
-            ).fetchone()[0]
-            for x in ('symbols', 'symbol_bigrams', 'words', 'word_bigrams')
-        ]
+        _, count_list, avg_pos_list = zip(*self.__select(selection.table_stats).fetchall())
         self.__add_main_style(stats, 15, 15)
         stats.write_row(0, 1, ('Total', 'Quantity', 'Avg. position'))
-        stats.write_column(1, 0, ('Symbols', 'Symbol bigrams', 'Words', 'Word bigrams'))
-        stats.write_column(1, 1, count_list, self.f_int)
-        stats.write_column(1, 2, self.sum_list, self.f_int)
-        stats.write_column(1, 3, avg_pos_list, self.f_float)
+        for row, data in enumerate(
+            zip(('Symbols', 'Symbol bigrams', 'Words', 'Word bigrams'), count_list, self.sum_list),
+            1,
+        ):
+            stats.write(row, 0, data[0])
+            stats.write_row(row, 1, data[1:], self.f_int)
+            stats.write(row, 3, avg_pos_list[row - 1], self.f_float)
 
     def sheet_top_symbols(self, limit=0, chart_limit=20, min_quantity=1):
         '''Create top-list of all analyzed symbols by quantity. Is called from main "treat()".'''
@@ -261,13 +427,13 @@ class ExcelWriter:
             print('Sheet "Top symb bigrams" already exists')
             return
         self.__add_main_style(top_symbols, two_rows=6, color='green')
-        self.cursor.execute('SELECT * FROM symbols')
         self.__fill_top_data(
             top_symbols,
             'Top symbols',
-            self.pos_list[0] != 1,
+            self.pos_list[0],
             ('Symb',),
             False,
+            '',
             limit,
             chart_limit,
             min_quantity,
@@ -282,13 +448,13 @@ class ExcelWriter:
             print('Sheet "Top symb bigrams" already exists')
             return
         self.__add_main_style(top_symbol_bigrams, two_columns=True, two_rows=7, color='green')
-        self.cursor.execute('SELECT * FROM symbol_bigrams')
         self.__fill_top_data(
             top_symbol_bigrams,
             'Top symb bigrams',
             bool(self.pos_list[1]),
             ('1st', '2nd'),
             True,
+            '',
             limit,
             chart_limit,
             min_quantity,
@@ -314,30 +480,34 @@ class ExcelWriter:
         except xlsxwriter.exceptions.DuplicateWorksheetName:
             print('Sheet "Top words" already exists')
             return
-        self.__add_main_style(top_words, 16, color='yellow')
-        top_words.write_row(0, 0, ('Word', 'Quantity', '% from all', 'As first', 'As last'))
-        if self.pos_list[2] and self.pos_list[2] != 1:
-            top_words.write(0, 5, 'Avg. position')
-
-        self.cursor.execute(
-            f'''
-            SELECT *
-            FROM words
-            WHERE quantity >= {min_quantity}
-            ORDER BY quantity DESC, word ASC
-            {f'LIMIT {limit}' if limit else ''};
-            '''
-        )
+
+        def header(sheet):
+            self.__add_main_style(sheet, 16, color='yellow')
+            sheet.write_row(0, 0, ('Word', 'Quantity', '% from all', 'As first', 'As last'))
+            if self.pos_list[2]:
+                sheet.write(0, 5, 'Avg. position')
+            if self.error_list[0]:
+                sheet.write(0, 6, 'Max. error')
+
+        rows = self.__select(selection.top_words, limit, min_quantity)
         max_len = 1
-        for row, word in enumerate(self.cursor.fetchall(), 1):
-            max_len = len(word[0]) if (len(word[0]) > max_len and row <= chart_limit) else max_len
-            top_words.write_string(row, 0, word[0])
-            top_words.write_number(row, 1, word[1], self.f_int)
-            top_words.write_number(row, 2, word[1] / self.sum_list[2], self.f_percent)
-            top_words.write_number(row, 3, word[2], self.f_int)
-            top_words.write_number(row, 4, word[3], self.f_int)
+        for sheet, row, word in self.__continued(top_words, 'Top words', header, rows):
+            if sheet is top_words and row <= chart_limit:
+                max_len = max(max_len, len(word[0]))
+            sheet.write_string(row, 0, word[0])
+            sheet.write_number(row, 1, word[1], self.f_int)
+            sheet.write_number(row, 2, word[1] / self.sum_list[2], self.f_percent)
+            sheet.write_number(row, 3, word[2], self.f_int)
+            sheet.write_number(row, 4, word[3], self.f_int)
             if self.pos_list[2]:
-                top_words.write_number(row, 5, word[4], self.f_float)
+                sheet.write_number(
+                    row,
+                    5,
+                    word[4] / (word[1] - word[5]) if word[1] - word[5] else 0,
+                    self.f_float,
+                )
+            if self.error_list[0]:
+                sheet.write_number(row, 6, word[5], self.f_int)
 
         chart = self.workbook.add_chart({'type': 'pie'})
         chart.add_series(
@@ -361,31 +531,36 @@ class ExcelWriter:
         except xlsxwriter.exceptions.DuplicateWorksheetName:
             print('Sheet "Top word bigrams" already exists')
             return
-        self.__add_main_style(top_word_bigrams, 16, 12, two_columns=True, color='yellow')
-        top_word_bigrams.write_row(
-            0, 0, ('First word', 'Second word', 'Quantity', '% from all', 'As first', 'As last')
-        )
-        if self.pos_list[3]:
-            top_word_bigrams.write(0, 6, 'Avg. position')
-
-        self.cursor.execute(
-            f'''
-            SELECT *
-            FROM word_bigrams
-            WHERE quantity >= {min_quantity}
-            ORDER BY quantity DESC, first_word ASC, second_word ASC
-            {f'LIMIT {limit}' if limit else ''};
-            '''
-        )
-        for row, bigr in enumerate(self.cursor.fetchall(), 1):
-            top_word_bigrams.write_string(row, 0, bigr[0])
-            top_word_bigrams.write_string(row, 1, bigr[1])
-            top_word_bigrams.write_number(row, 2, bigr[2], self.f_int)
-            top_word_bigrams.write_number(row, 3, bigr[2] / self.sum_list[3], self.f_percent)
-            top_word_bigrams.write_number(row, 4, bigr[3], self.f_int)
-            top_word_bigrams.write_number(row, 5, bigr[4], self.f_int)
+
+        def header(sheet):
+            self.__add_main_style(sheet, 16, 12, two_columns=True, color='yellow')
+            sheet.write_row(
+                0, 0, ('First word', 'Second word', 'Quantity', '% from all', 'As first', 'As last')
+            )
             if self.pos_list[3]:
-                top_word_bigrams.write_number(row, 6, bigr[5], self.f_float)
+                sheet.write(0, 6, 'Avg. position')
+            if self.error_list[1]:
+                sheet.write(0, 7, 'Max. error')
+
+        rows = self.__select(selection.top_word_bigrams, limit, min_quantity)
+        for sheet, row, bigr in self.__continued(
+            top_word_bigrams, 'Top word bigrams', header, rows
+        ):
+            sheet.write_string(row, 0, bigr[0])
+            sheet.write_string(row, 1, bigr[1])
+            sheet.write_number(row, 2, bigr[2], self.f_int)
+            sheet.write_number(row, 3, bigr[2] / self.sum_list[3], self.f_percent)
+            sheet.write_number(row, 4, bigr[3], self.f_int)
+            sheet.write_number(row, 5, bigr[4], self.f_int)
+            if self.pos_list[3]:
+                sheet.write_number(
+                    row,
+                    6,
+                    bigr[5] / (bigr[2] - bigr[6]) if bigr[2] - bigr[6] else 0,
+                    self.f_float,
+                )
+            if self.error_list[1]:
+                sheet.write_number(row, 7, bigr[6], self.f_int)
 
         chart = self.workbook.add_chart({'type': 'pie'})
         chart.add_series(
@@ -400,6 +575,128 @@ class ExcelWriter:
         chart.set_style(6)
         top_word_bigrams.insert_chart('I2', chart)
 
+    def sheet_top_symbol_ngrams(self, n: int, limit=0, chart_limit=20, min_quantity=1):
+        '''Create top-list of symbol n-grams (n > 2) by quantity.
+
+        Is called from main "treat()" for each counted order with limits of symbol bigrams.
+        '''
+        self.__top_ngrams('symbol_ngrams', n, limit, chart_limit, min_quantity)
+
+    def sheet_top_word_ngrams(self, n: int, limit=0, chart_limit=20, min_quantity=1):
+        '''Create top-list of word n-grams (n > 2) by quantity.
+
+        Is called from main "treat()" for each counted order with limits of word bigrams.
+        '''
+        self.__top_ngrams('word_ngrams', n, limit, chart_limit, min_quantity)
+
+    def __top_ngrams(self, table: str, n: int, limit: int, chart_limit: int, min_quantity: int):
+        '''Fill top-list sheet of n-grams from the table of packed keys (see ngrams.py).'''
+        symbols = table == 'symbol_ngrams'
+        name = f'Top {"symb" if symbols else "word"} {n}-grams'
+        try:
+            top_ngrams = self.workbook.add_worksheet(name)
+        except xlsxwriter.exceptions.DuplicateWorksheetName:
+            print(f'Sheet "{name}" already exists')
+            return
+        total, pos_data = self.cursor.execute(
+            f'SELECT SUM(quantity), MAX(position_sum) > 0 FROM {table} WHERE n = ?;', (n,)
+        ).fetchone()
+
+        def header(sheet):
+            self.__add_main_style(sheet, color='green' if symbols else 'yellow')
+            sheet.set_column(0, n - 1, 5 if symbols else 16, self.f_bold)
+            sheet.freeze_panes(1, n)
+            sheet.write_row(
+                0,
+                0,
+                tuple(f'{"Symb" if symbols else "Word"} {x}' for x in range(1, n + 1))
+                + ('Quantity', '% from all', 'As first', 'As last'),
+            )
+            if pos_data:
+                sheet.write(0, n + 4, 'Avg. position')
+
+        rows = self.__select(selection.top_ngrams, table, n, limit, min_quantity)
+        for sheet, row, (items, quantity, as_first, as_last, position_sum) in self.__continued(
+            top_ngrams, name, header, self.__ngram_rows(rows, n, symbols)
+        ):
+            sheet.write_row(row, 0, items)
+            sheet.write_number(row, n, quantity, self.f_int)
+            sheet.write_number(row, n + 1, quantity / total, self.f_percent)
+            sheet.write_number(row, n + 2, as_first, self.f_int)
+            sheet.write_number(row, n + 3, as_last, self.f_int)
+            if pos_data:
+                sheet.write_number(row, n + 4, position_sum / quantity, self.f_float)
+
+        chart = self.workbook.add_chart({'type': 'pie'})
+        chart.add_series(
+            {
+                'name': f'Top {chart_limit}',
+                'categories': f"='{name}'!$A2:${chr(64 + n)}{chart_limit+1}",
+                'values': f"='{name}'!${chr(66 + n)}2:${chr(66 + n)}{chart_limit+1}",
+            }
+        )
+        chart.set_size({'width': 534, 'height': 360})
+        chart.set_legend({'layout': {'x': 0.95, 'y': 0.37, 'width': 0.37, 'height': 0.95}})
+        chart.set_style(6)
+        top_ngrams.insert_chart(f'{chr(71 + n)}2', chart)
+        print(f'... "{name}" sheet was written')
+
+    def __ngram_rows(self, selected, n: int, symbols: bool):
+        '''Yield rows of the n-gram selection with unpacked keys (read by batches).'''
+        lookup = self.cursor.connection.cursor()
+        if self.profiler:
+            lookup = profiling.ProfiledCursor(lookup, self.profiler)
+        bits = ngrams.SYMBOL_BITS if symbols else ngrams.WORD_BITS
+        selected = iter(selected)
+        while batch := list(islice(selected, BATCH_SIZE)):
+            rows = [(ngrams.unpack(key, n, bits), *values) for key, *values in batch]
+            if symbols:
+                items = {x: chr(x) for row in rows for x in row[0]}
+            else:
+                items = ngrams.words(lookup, (x for row in rows for x in row[0]))
+            for ids, *values in rows:
+                yield ([items[x] for x in ids], *values)
+
+    def sheet_prefix_words(self, prefixes, limit=20, *, name='Top words by prefix'):
+        '''Create top-lists of words for each prefix of the iterable (side by side).
+
+        Words are found with the prefix index, if it was built and is actual (see FrequencyStore).
+        !This function is not called from main "treat()"!
+        '''
+        while True:
+            try:
+                prefix_words = self.workbook.add_worksheet(name)
+                break
+            except xlsxwriter.exceptions.DuplicateWorksheetName:
+                name += ' – Copy'
+        prefixes = [x.lower() for x in prefixes]
+        index = prefix.load(self.cursor)
+        tops = [
+            index.top(x, limit)
+            if index
+            else [row[:2] for row in selection.prefix_words(self.cursor, x, limit)]
+            for x in prefixes
+        ]
+        if index:
+            index.close()
+
+        prefix_words.set_tab_color('yellow')
+        prefix_words.freeze_panes(2, 0)
+        prefix_words.set_row(0, None, self.f_bold)
+        prefix_words.set_row(1, None, self.f_bold)
+        for e, word_prefix in enumerate(prefixes):
+            prefix_words.set_column(3 * e, 3 * e, 16, self.f_bold)
+            prefix_words.set_column(3 * e + 1, 3 * e + 1, 12)
+            prefix_words.merge_range(0, 3 * e, 0, 3 * e + 1, f'{word_prefix}…', self.f_bold)
+        for e in range(len(prefixes)):
+            prefix_words.write_row(1, 3 * e, ('Word', 'Quantity'))
+        for row in range(2, 2 + max((len(x) for x in tops), default=0)):
+            for e, top in enumerate(tops):
+                if row - 2 < len(top):
+                    prefix_words.write_string(row, 3 * e, top[row - 2][0])
+                    prefix_words.write_number(row, 3 * e + 1, top[row - 2][1], self.f_int)
+        print(f'... "{name}" sheet was written.')
+
     def sheet_custom_top_symbols(self, symbols: str, chart_limit=20, *, name='Custom top symbols'):
         '''Create symbol top-list with user inputed symbols.
 
@@ -412,9 +709,17 @@ class ExcelWriter:
             except xlsxwriter.exceptions.DuplicateWorksheetName:
                 name += ' – Copy'
         self.__add_main_style(custom_top_symbols, two_rows=6, color='gray')
-        self.cursor.execute(f'SELECT * FROM symbols WHERE chr IN {str(tuple(symbols))}')
         self.__fill_top_data(
-            custom_top_symbols, name, self.pos_list[0], ('Symb',), False, 0, chart_limit, 0, 0
+            custom_top_symbols,
+            name,
+            self.pos_list[0],
+            ('Symb',),
+            False,
+            symbols,
+            0,
+            chart_limit,
+            0,
+            0,
         )
         print(f'... "{name}" sheet was written.')
 
@@ -430,9 +735,17 @@ class ExcelWriter:
             print(f'Sheet "{name}" already exists')
             return
         self.__add_main_style(en_top_symbols, two_rows=6, color='gray')
-        self.cursor.execute(f'SELECT * FROM symbols WHERE chr IN {str(tuple(ascii_letters))}')
         self.__fill_top_data(
-            en_top_symbols, name, self.pos_list[0], ('Symb',), False, 0, chart_limit, 0, 0
+            en_top_symbols,
+            name,
+            self.pos_list[0],
+            ('Symb',),
+            False,
+            ascii_letters,
+            0,
+            chart_limit,
+            0,
+            0,
         )
         print(f'... "{name}" sheet was written.')
 
@@ -449,9 +762,17 @@ class ExcelWriter:
             return
         ru_symbs = ''.join([chr(x) for x in range(1040, 1104)] + [chr(1105), chr(1025)])
         self.__add_main_style(ru_top_symbols, two_rows=6, color='gray')
-        self.cursor.execute(f'SELECT * FROM symbols WHERE chr IN {str(tuple(ru_symbs))}')
         self.__fill_top_data(
-            ru_top_symbols, name, self.pos_list[0], ('Symb',), False, 0, chart_limit, 0, 0
+            ru_top_symbols,
+            name,
+            self.pos_list[0],
+            ('Symb',),
+            False,
+            ru_symbs,
+            0,
+            chart_limit,
+            0,
+            0,
         )
         print(f'... "{name}" sheet was written.')
 
@@ -522,76 +843,72 @@ class ExcelWriter:
             0, 0, ('Ё вариант', 'Е вариант', 'Ё обязательна?', 'Количество с Ё', 'Количество с Е')
         )
 
-        counter = [0] * 3
-        self.cursor.execute(
-            '''
-            SELECT SUM(quantity)
-            FROM yo_words
-            INNER JOIN words ON ye_word = word
-            WHERE mandatory = 1;
-            '''
-        )
-        counter[0] = self.cursor.fetchone()[0]
-        self.cursor.execute(
-            '''
-            SELECT SUM(quantity)
-            FROM yo_words
-            INNER JOIN words ON ye_word = word
-            WHERE mandatory = 0;
+        counter = self.cursor.execute(
             '''
-        )
-        counter[1] = self.cursor.fetchone()[0]
-        self.cursor.execute(
-            '''
-            SELECT SUM(quantity)
-            FROM yo_words
-            INNER JOIN words ON yo_word = word
-            WHERE mandatory = 1;
-            '''
-        )
-        counter[2] = self.cursor.fetchone()[0]
-
-        self.cursor.execute(
-            f'''
             SELECT
-                yo_word, b.ye_word, mandatory,
-                words.quantity as yo_quantity, ye_quantity
-            FROM yo_words
-            INNER JOIN words ON yo_word = word
-            LEFT JOIN (
-                SELECT ye_word, quantity as ye_quantity
+                SUM(CASE WHEN mandatory = 1 THEN ye_quantity END),
+                SUM(CASE WHEN mandatory = 0 THEN ye_quantity END),
+                SUM(CASE WHEN mandatory = 1 THEN yo_quantity END)
+            FROM (
+                SELECT
+                    mandatory,
+                    IFNULL(yo_quantity, (
+                        SELECT quantity FROM words
+                        WHERE word = (SELECT word FROM vocabulary WHERE id = yo_id)
+                    )) AS yo_quantity,
+                    IFNULL(ye_quantity, (
+                        SELECT quantity FROM words
+                        WHERE word = (SELECT word FROM vocabulary WHERE id = ye_id)
+                    )) AS ye_quantity
                 FROM yo_words
-                INNER JOIN words ON ye_word = word
-            ) b ON b.ye_word=yo_words.ye_word
-            WHERE (yo_quantity + ye_quantity) >= {min_quantity}
-            ORDER BY (yo_quantity + ye_quantity) DESC
-            {f'LIMIT {limit}' if limit else ''};
+            );
             '''
-        )
+        ).fetchone()
 
-        for row, pair in enumerate(self.cursor.fetchall(), 1):
+        rows = selection.yo_words(self.cursor, limit, min_quantity)
+
+        # counters are written next to the first rows (constant memory mode requires row order)
+        labels = ('Ошибочная Е', 'Возможная Ё', 'Правильная Ё')
+        row = 0
+        for row, pair in enumerate(rows, 1):
             yo_words.write_string(row, 0, pair[0])
             yo_words.write_string(row, 1, pair[1])
             yo_words.write_string(row, 2, ('Да' if pair[2] else 'Возможна'), self.f_bold)
             yo_words.write_number(row, 3, pair[3], self.f_int)
             yo_words.write_number(row, 4, pair[4], self.f_int)
-        yo_words.write_string('G2', 'Ошибочная Е', self.f_bold)
-        yo_words.write_number('H2', counter[0])
-        yo_words.write_string('G3', 'Возможная Ё', self.f_bold)
-        yo_words.write_number('H3', counter[1])
-        yo_words.write_string('G4', 'Правильная Ё', self.f_bold)
-        yo_words.write_number('H4', counter[2])
+            if row <= 3:
+                yo_words.write_string(row, 6, labels[row - 1], self.f_bold)
+                yo_words.write_number(row, 7, counter[row - 1])
+        for row in range(row + 1, 4):
+            yo_words.write_string(row, 6, labels[row - 1], self.f_bold)
+            yo_words.write_number(row, 7, counter[row - 1])
 
         print('... "Russian ye/yo words" compare sheet was written.')
 
 
 class Result:
-    '''Context manager with data validation for end-user ExcelWriter class.'''
+    '''Context manager with data validation for end-user ExcelWriter class.
 
-    def __init__(self, name='frequency_analysis'):
+    streaming – write the workbook in constant memory mode (for huge top lists);
+    profile, profile_callback, profile_interval – time the sheets (same as for Analysis).
+    '''
+
+    def __init__(
+        self,
+        name='frequency_analysis',
+        streaming=False,
+        profile=False,
+        profile_callback=None,
+        profile_interval=10,
+    ):
         self.name = name
+        self.streaming = streaming
+        self.profile = profile
+        self.profile_callback = profile_callback
+        self.profile_interval = profile_interval
         self.db = None
         self.workbook = None
+        self.profiler = None
 
     def __enter__(self):
         if not re.search('^[a-zа-яё0-9_.@() -]+$', self.name, re.I):
@@ -606,15 +923,37 @@ class Result:
                 f"xlsx file in the '{self.name}' folder already exist! "
                 "Please, rename or delete an existing file."
             )
+        if self.profile_callback is not None and not callable(self.profile_callback):
+            raise Exception("Profile callback must be a function, which gets the stats dict.")
 
         self.db = sqlite3.connect(os.path.join(os.getcwd(), self.name, 'result.db'))
-        self.workbook = xlsxwriter.Workbook(os.path.join(os.getcwd(), self.name, 'result.xlsx'))
+        db_create.migrate(self.db)
+        # streaming mode flushes each row to the disk, so memory doesn't grow with the sheet size
+        self.workbook = xlsxwriter.Workbook(
+            os.path.join(os.getcwd(), self.name, 'result.xlsx'),
+            {'constant_memory': True} if self.streaming else {},
+        )
 
-        return ExcelWriter(self.workbook, self.db.cursor())
+        if self.profile:
+            self.profiler = profiling.Profiler(
+                self.db, self.profile_callback, self.profile_interval
+            )
+        return ExcelWriter(self.workbook, self.db.cursor(), self.profiler)
 
     def __exit__(self, type_, value, traceback):
-        self.workbook.close()
+        if self.profiler:
+            # xlsx file is written on close (except rows of constant memory sheets)
+            self.profiler.timed('workbook close', self.workbook.close)()
+            self.profiler.close()
+        else:
+            self.workbook.close()
         self.db.close()
 
+    def stats(self) -> dict:
+        '''Return snapshot of the profiler timers and counters (also after the writing).'''
+        if not self.profiler:
+            raise Exception("Profiling is disabled. Use Result(profile=True) to enable it.")
+        return self.profiler.stats()
+
 
 __all__ = ['Result']
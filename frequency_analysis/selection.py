@@ -0,0 +1,237 @@
+﻿'''Additional module to results.py and export.py for selecting top-list data from the DB.
+
+Each function executes the query on the cursor and returns it, so rows can be read by batches.
+Rows of top-lists are ordered by quantity (descending), ties – by the key;
+    limit – max number of rows (0 – unlimited), min_quantity – min quantity of the row.
+Columns of each top-list selection are in COLUMNS.
+Selections of the Stats sheet, 2D sheets and n-gram sheets are used only by results.py.
+'''
+
+#   {selection: ((column, type), ...)}
+COLUMNS = {
+    'symbols': (
+        ('chr', str),
+        ('quantity', int),
+        ('as_first', int),
+        ('as_last', int),
+        ('position_sum', int),
+    ),
+    'symbol_bigrams': (
+        ('first_symb', str),
+        ('second_symb', str),
+        ('quantity', int),
+        ('as_first', int),
+        ('as_last', int),
+        ('position_sum', int),
+    ),
+    'words': (
+        ('word', str),
+        ('quantity', int),
+        ('as_first', int),
+        ('as_last', int),
+        ('position_sum', int),
+        ('error', int),
+    ),
+    'word_bigrams': (
+        ('first_word', str),
+        ('second_word', str),
+        ('quantity', int),
+        ('as_first', int),
+        ('as_last', int),
+        ('position_sum', int),
+        ('error', int),
+    ),
+    'yo_words': (
+        ('yo_word', str),
+        ('ye_word', str),
+        ('mandatory', bool),
+        ('yo_quantity', int),
+        ('ye_quantity', int),
+    ),
+}
+
+
+def _fold(cursor, key: str, ignore_case: bool) -> str:
+    '''Return key expression, lowered with Python lower() for case insensitive selection.
+
+    SQLite lower() folds only ASCII letters, so str.lower is registered as "py_lower".
+    '''
+    if not ignore_case:
+        return key
+    cursor.connection.create_function('py_lower', 1, str.lower, deterministic=True)
+    return f'py_lower({key})'
+
+
+def top_symbols(cursor, limit=0, min_quantity=1, *, ignore_case=False, symbols=''):
+    '''Select symbols (only of the "symbols" string, if it's set).
+
+    Case insensitive symbols are united by the lowered symbol (ties – in order of the first one).
+    '''
+    return cursor.execute(
+        f'''
+        SELECT
+            {_fold(cursor, 'chr', ignore_case)} AS symb,
+            SUM(quantity) AS total, SUM(as_first), SUM(as_last), SUM(position_sum)
+        FROM symbols
+        {f'WHERE chr IN ({", ".join("?" * len(symbols))})' if symbols else ''}
+        GROUP BY symb
+        HAVING total >= ?
+        ORDER BY total DESC, MIN(chr)
+        LIMIT ?;
+        ''',
+        (*symbols, min_quantity, limit or -1),
+    )
+
+
+def top_symbol_bigrams(cursor, limit=0, min_quantity=1, *, ignore_case=False):
+    '''Select symbol bigrams.
+
+    Case insensitive bigrams are united by both lowered symbols
+        (ties – in order of the first one).
+    '''
+    return cursor.execute(
+        f'''
+        SELECT
+            {_fold(cursor, 'first_symb', ignore_case)} AS first,
+            {_fold(cursor, 'second_symb', ignore_case)} AS second,
+            SUM(quantity) AS total, SUM(as_first), SUM(as_last), SUM(position_sum)
+        FROM symbol_bigrams
+        GROUP BY first, second
+        HAVING total >= ?
+        ORDER BY total DESC, MIN(first_symb || second_symb)
+        LIMIT ?;
+        ''',
+        (min_quantity, limit or -1),
+    )
+
+
+def top_words(cursor, limit=0, min_quantity=1):
+    '''Select words.'''
+    return cursor.execute(
+        '''
+        SELECT word, quantity, as_first, as_last, position_sum, error
+        FROM words
+        WHERE quantity >= ?
+        ORDER BY quantity DESC, word ASC
+        LIMIT ?;
+        ''',
+        (min_quantity, limit or -1),
+    )
+
+
+def prefix_words(cursor, prefix: str, limit=0):
+    '''Select words with the prefix (by the range of the primary key, without prefix index).'''
+    return cursor.execute(
+        '''
+        SELECT word, quantity, as_first, as_last, position_sum, error
+        FROM words
+        WHERE word >= ?1 AND word < ?1 || char(1114111)
+        ORDER BY quantity DESC, word ASC
+        LIMIT ?2;
+        ''',
+        (prefix, limit or -1),
+    )
+
+
+def top_word_bigrams(cursor, limit=0, min_quantity=1):
+    '''Select word bigrams.
+
+    With limit words are joined only for bigrams with quantity of the last one in the top and more.
+    '''
+    threshold = '?'
+    params: tuple = (min_quantity,)
+    if limit:
+        threshold = '''MAX(?, IFNULL((
+            SELECT quantity FROM word_bigrams ORDER BY quantity DESC LIMIT 1 OFFSET ?
+        ), 0))'''
+        params += (limit - 1,)
+    return cursor.execute(
+        f'''
+        SELECT a.word, b.word, quantity, as_first, as_last, position_sum, error
+        FROM word_bigrams
+        JOIN vocabulary AS a ON a.id = first_id
+        JOIN vocabulary AS b ON b.id = second_id
+        WHERE quantity >= {threshold}
+        ORDER BY quantity DESC, a.word ASC, b.word ASC
+        LIMIT ?;
+        ''',
+        (*params, limit or -1),
+    )
+
+
+def yo_words(cursor, limit=0, min_quantity=1):
+    '''Select ye/yo word pairs with quantities of both writings (by their sum).
+
+    Quantities, which weren't counted during the analysis (NULL), are taken from the words.
+    '''
+    return cursor.execute(
+        '''
+        SELECT yo_word, ye_word, mandatory, yo_quantity, ye_quantity
+        FROM (
+            SELECT
+                yo.word AS yo_word,
+                ye.word AS ye_word,
+                mandatory,
+                IFNULL(yo_quantity, (SELECT quantity FROM words WHERE word = yo.word))
+                    AS yo_quantity,
+                IFNULL(ye_quantity, (SELECT quantity FROM words WHERE word = ye.word))
+                    AS ye_quantity
+            FROM yo_words
+            INNER JOIN vocabulary AS yo ON yo.id = yo_id
+            INNER JOIN vocabulary AS ye ON ye.id = ye_id
+        )
+        WHERE (yo_quantity + ye_quantity) >= ?
+        ORDER BY (yo_quantity + ye_quantity) DESC
+        LIMIT ?;
+        ''',
+        (min_quantity, limit or -1),
+    )
+
+
+def top_ngrams(cursor, table: str, n: int, limit=0, min_quantity=1):
+    '''Select n-grams of the order with packed keys (see ngrams.py).'''
+    return cursor.execute(
+        f'''
+        SELECT key, quantity, as_first, as_last, position_sum
+        FROM {table}
+        WHERE n = ? AND quantity >= ?
+        ORDER BY quantity DESC, key ASC
+        LIMIT ?;
+        ''',
+        (n, min_quantity, limit or -1),
+    )
+
+
+def symbol_bigrams(cursor):
+    '''Select all symbol bigrams (in the table order).'''
+    return cursor.execute(
+        'SELECT first_symb, second_symb, quantity, as_first, as_last, position_sum '
+        'FROM symbol_bigrams;'
+    )
+
+
+def table_stats(cursor):
+    '''Select (number of rows, average position) of symbols, symbol bigrams, words, word bigrams.
+
+    Average position of symbols is counted without space.
+    Average position is 0 for tables without exactly counted items.
+    '''
+    return cursor.execute(
+        '''
+        SELECT 1, COUNT(*), IFNULL(
+            SUM(CASE WHEN chr != ' ' THEN position_sum END) * 1.0
+            / SUM(CASE WHEN chr != ' ' THEN quantity END), 0
+        )
+        FROM symbols
+        UNION ALL
+        SELECT 2, COUNT(*), IFNULL(SUM(position_sum) * 1.0 / SUM(quantity), 0)
+        FROM symbol_bigrams
+        UNION ALL
+        SELECT 3, COUNT(*), IFNULL(SUM(position_sum) * 1.0 / SUM(quantity - error), 0)
+        FROM words
+        UNION ALL
+        SELECT 4, COUNT(*), IFNULL(SUM(position_sum) * 1.0 / SUM(quantity - error), 0)
+        FROM word_bigrams
+        ORDER BY 1;
+        '''
+    )
@@ -0,0 +1,296 @@
+﻿'''Local HTTP server for frequency lookups of the analysis DB (asyncio, without dependencies).
+
+Usage: python -m frequency_analysis.serve [name] [--host HOST] [--port PORT]
+                                          [--connections N] [--cache-size N]
+
+Endpoints (GET, JSON responses):
+    /word?word=<word>                      – {"word": <word>, "quantity": <int>};
+    /words?word=<word>&word=<word>…        – {<word>: <int>, …};
+    /bigram?first=<word>&second=<word>     – {"first": …, "second": …, "quantity": <int>};
+    /symbol?symbol=<symbol>                – {"symbol": <symbol>, "quantity": <int>};
+    /top?n=<n>[&prefix=<prefix>]           – {"words": [[<word>, <int>], …]};
+    /stats                                 – endpoint latencies, batching and cache counters.
+Lookups run in the thread executor on the pool of read-only connections (FrequencyStore objects).
+Single word lookups, which arrive during one event loop iteration, are read by one query.
+'''
+
+import argparse
+import asyncio
+import json
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import parse_qs, urlsplit
+
+from frequency_analysis.store import FrequencyStore
+
+MAX_TOP = 10000
+MAX_BATCH = 512
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+class StorePool:
+    '''Read-only connections, which are used by the executor threads one at a time.'''
+
+    def __init__(self, name: str, size: int, cache_size: int):
+        self.stores = [FrequencyStore(name, cache_size) for _ in range(size)]
+        self.free: queue.SimpleQueue = queue.SimpleQueue()
+        for store in self.stores:
+            self.free.put(store)
+        self.executor = ThreadPoolExecutor(size)
+
+    def __call(self, method, args: tuple):
+        '''Call the method with a free connection (waits for it, if all are in use).'''
+        store = self.free.get()
+        try:
+            return method(store, *args)
+        finally:
+            self.free.put(store)
+
+    async def run(self, method, *args):
+        '''Call FrequencyStore method with a free connection in the executor.'''
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.__call, method, args
+        )
+
+    def cache_info(self) -> dict:
+        '''Return cache counters summed over all connections.'''
+        result: dict = {}
+        for store in self.stores:
+            for cache, info in store.cache_info().items():
+                total = result.setdefault(cache, dict.fromkeys(info, 0))
+                for key, value in info.items():
+                    total[key] += value
+        return result
+
+    def close(self):
+        '''Wait for the running lookups and close all connections.'''
+        self.executor.shutdown()
+        for store in self.stores:
+            store.close()
+
+
+class WordBatcher:
+    '''Collect single word lookups of one event loop iteration and read them by one query.'''
+
+    def __init__(self, pool: StorePool):
+        self.pool = pool
+        self.pending: dict = {}  # {word: [futures]}
+        self.batches = 0
+        self.lookups = 0
+
+    def lookup(self, word: str) -> asyncio.Future:
+        '''Return future of the word quantity.'''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.pending:
+            loop.call_soon(self.__flush)
+        self.pending.setdefault(word.lower(), []).append(future)
+        if len(self.pending) >= MAX_BATCH:
+            self.__flush()
+        return future
+
+    def __flush(self):
+        '''Read all pending words by one query in the executor.'''
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        self.batches += 1
+        self.lookups += sum(map(len, pending.values()))
+        task = asyncio.ensure_future(self.pool.run(FrequencyStore.word_freqs, list(pending)))
+        task.add_done_callback(lambda task: self.__resolve(task, pending))
+
+    @staticmethod
+    def __resolve(task: asyncio.Future, pending: dict):
+        '''Set results (or the error) of the batch to futures of the lookups.'''
+        for word, futures in pending.items():
+            for future in futures:
+                if future.cancelled():
+                    continue
+                if task.exception():
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result()[word])
+
+
+class LatencyStats:
+    '''Count, mean, percentiles (by the last "window" requests) and max latency of endpoints.'''
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.endpoints: dict = {}
+
+    def add(self, endpoint: str, seconds: float):
+        '''Add latency of the request.'''
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = [0, 0.0, 0.0, deque(maxlen=self.window)]
+        data = self.endpoints[endpoint]
+        data[0] += 1
+        data[1] += seconds
+        data[2] = max(data[2], seconds)
+        data[3].append(seconds)
+
+    def report(self) -> dict:
+        '''Return {endpoint: {count, mean_ms, p50_ms, p95_ms, max_ms}}.'''
+        result = {}
+        for endpoint, (count, total, maximum, last) in self.endpoints.items():
+            last = sorted(last)
+            result[endpoint] = {
+                'count': count,
+                'mean_ms': round(total / count * 1000, 3),
+                'p50_ms': round(last[len(last) // 2] * 1000, 3),
+                'p95_ms': round(last[int(len(last) * 0.95)] * 1000, 3),
+                'max_ms': round(maximum * 1000, 3),
+            }
+        return result
+
+
+class Server:
+    '''HTTP/1.1 server (with keep-alive) of the lookup endpoints.'''
+
+    def __init__(self, name='frequency_analysis', connections=4, cache_size=65536):
+        self.pool = StorePool(name, connections, cache_size)
+        self.batcher = WordBatcher(self.pool)
+        self.stats = LatencyStats()
+        self.endpoints = {
+            '/word': self.word,
+            '/words': self.words,
+            '/bigram': self.bigram,
+            '/symbol': self.symbol,
+            '/top': self.top,
+            '/stats': self.report,
+        }
+
+    async def word(self, params: dict) -> dict:
+        word = params['word'][0]
+        return {'word': word, 'quantity': await self.batcher.lookup(word)}
+
+    async def words(self, params: dict) -> dict:
+        return await self.pool.run(FrequencyStore.word_freqs, params['word'])
+
+    async def bigram(self, params: dict) -> dict:
+        first, second = params['first'][0], params['second'][0]
+        quantity = await self.pool.run(FrequencyStore.bigram_freq, first, second)
+        return {'first': first, 'second': second, 'quantity': quantity}
+
+    async def symbol(self, params: dict) -> dict:
+        symbol = params['symbol'][0]
+        quantity = await self.pool.run(FrequencyStore.symbol_freq, symbol)
+        return {'symbol': symbol, 'quantity': quantity}
+
+    async def top(self, params: dict) -> dict:
+        n = int(params.get('n', ['10'])[0])
+        if not 0 < n <= MAX_TOP:
+            raise ValueError(f'n must be from 1 to {MAX_TOP}')
+        if 'prefix' in params:
+            words = await self.pool.run(FrequencyStore.top_by_prefix, params['prefix'][0], n)
+        else:
+            words = await self.pool.run(FrequencyStore.top_words, n)
+        return {'words': words}
+
+    async def report(self, _) -> dict:
+        return {
+            'endpoints': self.stats.report(),
+            'batching': {'batches': self.batcher.batches, 'lookups': self.batcher.lookups},
+            'caches': self.pool.cache_info(),
+        }
+
+    async def __respond(self, method: str, target: str) -> tuple:
+        '''Return (status, endpoint, payload) of the request.'''
+        url = urlsplit(target)
+        if url.path not in self.endpoints:
+            return 404, None, {'error': f'Unknown endpoint {url.path}'}
+        if method != 'GET':
+            return 405, url.path, {'error': 'Only GET requests are allowed'}
+        try:
+            return 200, url.path, await self.endpoints[url.path](parse_qs(url.query))
+        except KeyError as error:
+            return 400, url.path, {'error': f'Missing parameter {error}'}
+        except ValueError as error:
+            return 400, url.path, {'error': str(error)}
+        except Exception as error:  # e.g. sqlite3.OperationalError of the locked DB
+            return 500, url.path, {'error': f'{type(error).__name__}: {error}'}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        '''Serve all requests of the connection.'''
+        try:
+            while True:
+                head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+                start = perf_counter()
+                request_line, *header_lines = head.split('\r\n')
+                method, target, version = request_line.split(' ', 2)
+                headers = {}
+                for line in filter(None, header_lines):
+                    key, _, value = line.partition(':')
+                    headers[key.strip().lower()] = value.strip().lower()
+                if 'content-length' in headers:
+                    await reader.readexactly(int(headers['content-length']))
+                status, endpoint, payload = await self.__respond(method, target)
+                default = 'keep-alive' if version == 'HTTP/1.1' else 'close'
+                keep_alive = headers.get('connection', default) == 'keep-alive'
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                    'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode()
+                    + body
+                )
+                await writer.drain()
+                if endpoint:
+                    self.stats.add(endpoint, perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except ValueError:
+            # malformed request line or header
+            writer.write(
+                b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+            )
+        finally:
+            writer.close()
+
+    def close(self):
+        '''Close the connection pool.'''
+        self.pool.close()
+
+
+async def serve(name: str, host: str, port: int, connections: int, cache_size: int):
+    '''Run the server until it's cancelled.'''
+    server = Server(name, connections, cache_size)
+    try:
+        listener = await asyncio.start_server(server.handle, host, port)
+        host, port = listener.sockets[0].getsockname()[:2]
+        print(f'Serving "{name}" on http://{host}:{port}', flush=True)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m frequency_analysis.serve', description=__doc__.split('\n')[0]
+    )
+    parser.add_argument('name', nargs='?', default='frequency_analysis', help='analysis folder')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='0 – any free port')
+    parser.add_argument('--connections', type=int, default=4, help='read-only DB connections')
+    parser.add_argument('--cache-size', type=int, default=65536, help='LRU cache of each lookup')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.name, args.host, args.port, args.connections, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
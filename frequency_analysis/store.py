@@ -0,0 +1,190 @@
+﻿'''Read-only access to the analysis DB for frequency lookups at request time.
+
+Lookups have a fixed statement text, so each of them is compiled by SQLite only once
+    per connection (sqlite3 module caches statements by their text).
+Results of single lookups are kept in LRU caches (one for each data type) with hit/miss counters.
+Words are looked up in lower case (as they are counted).
+'''
+
+import json
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+
+from frequency_analysis import prefix, selection
+
+WORD = 'SELECT quantity FROM words WHERE word = ?;'
+
+WORDS = '''
+    SELECT word, quantity
+    FROM words
+    WHERE word IN (SELECT value FROM json_each(?));
+'''
+
+WORD_BIGRAM = '''
+    SELECT quantity
+    FROM word_bigrams
+    WHERE first_id = (SELECT id FROM vocabulary WHERE word = ?)
+        AND second_id = (SELECT id FROM vocabulary WHERE word = ?);
+'''
+
+SYMBOL = 'SELECT quantity FROM symbols WHERE chr = ?;'
+
+
+class LRUCache:
+    '''Dict of limited size, which drops the least recently used items.'''
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        '''Return cached value or None.'''
+        if key in self.items:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        '''Add value, dropping the least recently used one if the cache is full.'''
+        if not self.maxsize:
+            return
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def info(self) -> dict:
+        '''Return counters and size of the cache.'''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.items),
+            'maxsize': self.maxsize,
+        }
+
+
+class FrequencyStore:
+    '''Read-only lookups of the analysis DB.
+
+    cache_size – max number of cached lookups of each type (0 – without cache).
+    total_words – quantity of all counted words (e.g. for relative frequency).
+    Connection can be used from any thread, but only by one thread at a time.
+    '''
+
+    def __init__(self, name='frequency_analysis', cache_size=65536):
+        if not re.search('^[a-zа-яё0-9_.@() -]+$', name, re.I):
+            raise Exception(f"Foldername '{name}' is unvalid. Please, enter other.")
+        path = os.path.join(os.getcwd(), name, 'result.db')
+        if not os.path.isfile(path):
+            raise Exception(
+                f"DB file in the '{name}' folder is not exist! "
+                "Create a new analysis, or set name of folder with existing DB."
+            )
+        if not isinstance(cache_size, int) or cache_size < 0:
+            raise Exception("Cache size must be a non-negative integer (0 – without cache).")
+        self.name = name
+        self.db = sqlite3.connect(
+            f'file:{path}?mode=ro', uri=True, check_same_thread=False, cached_statements=16
+        )
+        self.cursor = self.db.cursor()
+        if not self.cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE name = 'vocabulary');"
+        ).fetchone()[0]:
+            raise Exception(
+                f"DB file in the '{name}' folder is from previous versions. "
+                "Open it with Result or Analysis (mode 'a') once to convert."
+            )
+        self.caches = {
+            x: LRUCache(cache_size) for x in ('words', 'word_bigrams', 'symbols')
+        }
+        self.total_words = self.cursor.execute('SELECT SUM(quantity) FROM words;').fetchone()[0]
+        self.prefix_index = prefix.load(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.close()
+
+    def close(self):
+        '''Close the DB connection (and the prefix index).'''
+        if self.prefix_index:
+            self.prefix_index.close()
+        self.db.close()
+
+    def __lookup(self, cache: str, key, query: str, params: tuple) -> int:
+        '''Return cached quantity or read it by the single row query.'''
+        if (quantity := self.caches[cache].get(key)) is None:
+            row = self.cursor.execute(query, params).fetchone()
+            quantity = row[0] if row else 0
+            self.caches[cache].put(key, quantity)
+        return quantity
+
+    def word_freq(self, word: str) -> int:
+        '''Return quantity of the word (0 if it wasn't counted).'''
+        word = word.lower()
+        return self.__lookup('words', word, WORD, (word,))
+
+    def word_freqs(self, words) -> dict:
+        '''Return {lowered word: quantity} for words of the iterable (one query for uncached).'''
+        result = {}
+        missing = []
+        cache = self.caches['words']
+        for word in {x.lower() for x in words}:
+            if (quantity := cache.get(word)) is None:
+                missing.append(word)
+            else:
+                result[word] = quantity
+        if missing:
+            found = dict(self.cursor.execute(WORDS, (json.dumps(missing),)))
+            for word in missing:
+                result[word] = found.get(word, 0)
+                cache.put(word, result[word])
+        return result
+
+    def bigram_freq(self, first: str, second: str) -> int:
+        '''Return quantity of the word bigram (0 if it wasn't counted).'''
+        first, second = first.lower(), second.lower()
+        return self.__lookup('word_bigrams', (first, second), WORD_BIGRAM, (first, second))
+
+    def symbol_freq(self, symbol: str) -> int:
+        '''Return quantity of the symbol (0 if it wasn't counted).'''
+        return self.__lookup('symbols', symbol, SYMBOL, (symbol,))
+
+    def top_words(self, n: int) -> list:
+        '''Return [(word, quantity)] of n most frequent words (by the same query as the sheet).'''
+        return [x[:2] for x in selection.top_words(self.cursor, n)]
+
+    def build_prefix_index(self):
+        '''Build prefix index of the words to the "prefix_index.bin" file near the DB.
+
+        The index is used by top_by_prefix() until the DB is changed.
+        '''
+        path = os.path.join(os.getcwd(), self.name, prefix.FILE_NAME)
+        if self.prefix_index:
+            self.prefix_index.close()
+        prefix.build(self.cursor, os.path.join(os.getcwd(), self.name, 'result.db'), path)
+        self.prefix_index = prefix.PrefixIndex(path)
+
+    def top_by_prefix(self, word_prefix: str, k=10) -> list:
+        '''Return [(word, quantity)] of k most frequent words with the prefix (0 – all).
+
+        Without actual prefix index words are selected by the range of the DB key.
+        '''
+        word_prefix = word_prefix.lower()
+        if self.prefix_index:
+            return self.prefix_index.top(word_prefix, k)
+        return [x[:2] for x in selection.prefix_words(self.cursor, word_prefix, k)]
+
+    def cache_info(self) -> dict:
+        '''Return {data type: {hits, misses, size, maxsize}} of the caches.'''
+        return {x: cache.info() for x, cache in self.caches.items()}
+
+
+__all__ = ['FrequencyStore']
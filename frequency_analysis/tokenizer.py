@@ -0,0 +1,40 @@
+﻿'''Additional module to frequency.py for splitting sentences to words.'''
+
+import re
+
+
+class Tokenizer:
+    '''Extract clear words from a sentence and classify symbols with precompiled data.
+
+    Built once for the analysis from word_pattern and allowed_symbols:
+        pattern         – compiled word_pattern;
+        allowed_symbols – set of allowed symbols;
+        word_symbols    – set of allowed symbols, which are matched by word_pattern themselves
+                            (their position is counted as for "clear" word).
+    '''
+
+    def __init__(self, word_pattern: str, allowed_symbols):
+        self.pattern = re.compile(word_pattern)
+        self.allowed_symbols = frozenset(allowed_symbols)
+        self.word_symbols = frozenset(x for x in self.allowed_symbols if self.pattern.search(x))
+
+    def split(self, word_list: list):
+        '''Split sentence to (raw word, clear word) pairs and the list of clear words.
+
+        A raw word without clear words is paired with an empty string.
+        A raw word with several clear words (e.g. "one/two") is paired with the first of them,
+            the rest are paired with empty raw words.
+        The input list isn't changed.
+        '''
+        findall = self.pattern.findall
+        pairs = []
+        clear_words = []
+        for word in word_list:
+            if found := findall(word):
+                pairs.append((word, found[0]))
+                if len(found) > 1:
+                    pairs.extend(('', x) for x in found[1:])
+                clear_words.extend(found)
+            else:
+                pairs.append((word, ''))
+        return pairs, clear_words
@@ -0,0 +1,274 @@
+﻿'''Additional module to frequency.py for writing counted data to the DB.
+
+RowWriter sends every counted item to the DB right away (one statement per item).
+Accumulator collects counted items in memory and flushes them in bulk.
+Both writers have the same interface, so FrequencyAnalysis doesn't care which one is used.
+Writers also decide when to commit – by number of written rows or by elapsed time.
+'''
+
+from time import monotonic
+
+from frequency_analysis import queries
+
+
+class Writer:
+    '''Base writer with commit scheduling.
+
+    Number of written rows is taken from the connection counter of changes, so it costs nothing.
+    Checkpoints of input sources ({source: (sentences, file position, file tail, file skip)})
+        are saved right before the commit, so they always match the committed data.
+    Additional in-memory counters (e.g. dense.SymbolCounter) are flushed before the commit too.
+    '''
+
+    def __init__(self, db, commit_rows: int, commit_interval: float):
+        self.db = db
+        self.cursor = db.cursor()
+        self.commit_rows = commit_rows
+        self.commit_interval = commit_interval
+        self.changes = db.total_changes
+        self.last_commit = monotonic()
+        self.progress: dict = {}
+        self.counters: list = []
+
+    def commit(self):
+        '''Flush additional counters, save checkpoints and commit all written rows.'''
+        for counter in self.counters:
+            counter.flush(self.cursor)
+        if self.progress:
+            self.cursor.executemany(
+                queries.CHECKPOINT, ((x, *y) for x, y in self.progress.items())
+            )
+            self.progress.clear()
+        self.db.commit()
+        self.changes = self.db.total_changes
+        self.last_commit = monotonic()
+
+    def check(self):
+        '''Commit if number of written rows or time since the last commit exceeds the limit.'''
+        if (
+            self.db.total_changes - self.changes >= self.commit_rows
+            or monotonic() - self.last_commit >= self.commit_interval
+        ):
+            self.commit()
+
+    def flush(self):
+        '''Write all data to the DB (the base writer has no buffered data).'''
+
+    def rollback(self):
+        '''Drop all data after the last commit (on errors during the analysis).
+
+        Additional counters are dropped without flushing, so only the committed data
+            with its checkpoints is left.
+        '''
+        self.counters.clear()
+        self.progress.clear()
+        self.db.rollback()
+
+
+class RowWriter(Writer):
+    '''Write each counted item to the DB immediately.'''
+
+    def space(self):
+        '''Count space between words.'''
+        self.cursor.execute(queries.SPACE)
+
+    def symbol(self, symb: str, position: int):
+        '''Count single symbol. Position is 0 if it isn't counted.'''
+        self.cursor.execute(queries.SYMBOL, (position, symb))
+
+    def symbol_bigram(self, first: str, second: str, position: int):
+        '''Count symbol bigram. Position is 0 if it isn't counted.'''
+        self.cursor.execute(queries.SYMBOL_BIGRAM, (first, second, position))
+
+    def symbol_edges(self, first: str, last: str):
+        '''Count first and last symbols of the word.'''
+        self.cursor.execute(queries.SYMBOL_FIRST, (first,))
+        self.cursor.execute(queries.SYMBOL_LAST, (last,))
+
+    def symbol_bigram_first(self, first: str, second: str):
+        '''Count symbol bigram at the beginning of the word.'''
+        self.cursor.execute(queries.SYMBOL_BIGRAM_FIRST, (first, second))
+
+    def symbol_bigram_last(self, first: str, second: str):
+        '''Count symbol bigram at the end of the word.'''
+        self.cursor.execute(queries.SYMBOL_BIGRAM_LAST, (first, second))
+
+    def word(self, word: str, position: int):
+        '''Count single word. Position is 0 if it isn't counted.'''
+        self.cursor.execute(queries.WORD, (word, position))
+
+    def word_bigram(self, first: int, second: int, position: int):
+        '''Count word bigram (by vocabulary IDs). Position is 0 if it isn't counted.'''
+        self.cursor.execute(queries.WORD_BIGRAM, (first, second, position))
+
+    def word_edges(self, first: str, last: str):
+        '''Count first and last words of the sentence.'''
+        self.cursor.execute(queries.WORD_FIRST, (first,))
+        self.cursor.execute(queries.WORD_LAST, (last,))
+
+    def word_bigram_first(self, first: int, second: int):
+        '''Count word bigram at the beginning of the sentence.'''
+        self.cursor.execute(queries.WORD_BIGRAM_FIRST, (first, second))
+
+    def word_bigram_last(self, first: int, second: int):
+        '''Count word bigram at the end of the sentence.'''
+        self.cursor.execute(queries.WORD_BIGRAM_LAST, (first, second))
+
+    def ngram(self, table: str, key: tuple, position: int):
+        '''Count n-gram of order 3+ (key – (n, packed key)). Position is 0 if it isn't counted.'''
+        self.cursor.execute(queries.UPSERT[table], (1, 0, 0, position, *key))
+
+    def ngram_first(self, table: str, key: tuple):
+        '''Count n-gram at the beginning of the word/sentence.'''
+        self.cursor.execute(queries.EDGES[table], (0, 1, 0, 0, *key))
+
+    def ngram_last(self, table: str, key: tuple):
+        '''Count n-gram at the end of the word/sentence.'''
+        self.cursor.execute(queries.EDGES[table], (0, 0, 1, 0, *key))
+
+
+class Accumulator(Writer):
+    '''Collect counted items in memory and flush them to the DB with bulk executemany calls.
+
+    Each item is stored as [quantity, as_first, as_last, position sum].
+    Data is flushed and committed when the number of collected items exceeds buffer_size,
+        when flush_interval (in seconds) has passed since the last flush
+        and on Analysis exit.
+    '''
+
+    def __init__(
+        self,
+        db,
+        buffer_size: int,
+        flush_interval: float,
+        commit_rows: int = 0,
+        commit_interval: float = 0,
+    ):
+        super().__init__(db, commit_rows, commit_interval)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.last_flush = monotonic()
+        self.symbols: dict = {}
+        self.symbol_bigrams: dict = {}
+        self.words: dict = {}
+        self.word_bigrams: dict = {}
+        self.symbol_ngrams: dict = {}
+        self.word_ngrams: dict = {}
+
+    @staticmethod
+    def __add(table: dict, key, position: int):
+        if (item := table.get(key)) is None:
+            item = table[key] = [0, 0, 0, 0]
+        item[0] += 1
+        item[3] += position
+
+    @staticmethod
+    def __edge(table: dict, key, index: int):
+        if (item := table.get(key)) is None:
+            item = table[key] = [0, 0, 0, 0]
+        item[index] += 1
+
+    def space(self):
+        '''Count space between words.'''
+        self.__add(self.symbols, ' ', 0)
+
+    def symbol(self, symb: str, position: int):
+        '''Count single symbol. Position is 0 if it isn't counted.'''
+        self.__add(self.symbols, symb, position)
+
+    def symbol_bigram(self, first: str, second: str, position: int):
+        '''Count symbol bigram. Position is 0 if it isn't counted.'''
+        self.__add(self.symbol_bigrams, (first, second), position)
+
+    def symbol_edges(self, first: str, last: str):
+        '''Count first and last symbols of the word.'''
+        self.__edge(self.symbols, first, 1)
+        self.__edge(self.symbols, last, 2)
+
+    def symbol_bigram_first(self, first: str, second: str):
+        '''Count symbol bigram at the beginning of the word.'''
+        self.__edge(self.symbol_bigrams, (first, second), 1)
+
+    def symbol_bigram_last(self, first: str, second: str):
+        '''Count symbol bigram at the end of the word.'''
+        self.__edge(self.symbol_bigrams, (first, second), 2)
+
+    def word(self, word: str, position: int):
+        '''Count single word. Position is 0 if it isn't counted.'''
+        self.__add(self.words, word, position)
+
+    def word_bigram(self, first: int, second: int, position: int):
+        '''Count word bigram (by vocabulary IDs). Position is 0 if it isn't counted.'''
+        self.__add(self.word_bigrams, (first, second), position)
+
+    def word_edges(self, first: str, last: str):
+        '''Count first and last words of the sentence.'''
+        self.__edge(self.words, first, 1)
+        self.__edge(self.words, last, 2)
+
+    def word_bigram_first(self, first: int, second: int):
+        '''Count word bigram at the beginning of the sentence.'''
+        self.__edge(self.word_bigrams, (first, second), 1)
+
+    def word_bigram_last(self, first: int, second: int):
+        '''Count word bigram at the end of the sentence.'''
+        self.__edge(self.word_bigrams, (first, second), 2)
+
+    def ngram(self, table: str, key: tuple, position: int):
+        '''Count n-gram of order 3+ (key – (n, packed key)). Position is 0 if it isn't counted.'''
+        self.__add(getattr(self, table), key, position)
+
+    def ngram_first(self, table: str, key: tuple):
+        '''Count n-gram at the beginning of the word/sentence.'''
+        self.__edge(getattr(self, table), key, 1)
+
+    def ngram_last(self, table: str, key: tuple):
+        '''Count n-gram at the end of the word/sentence.'''
+        self.__edge(getattr(self, table), key, 2)
+
+    def check(self):
+        '''Flush and commit collected data if size or time threshold is exceeded.'''
+        size = (
+            len(self.symbols)
+            + len(self.symbol_bigrams)
+            + len(self.words)
+            + len(self.word_bigrams)
+            + len(self.symbol_ngrams)
+            + len(self.word_ngrams)
+        )
+        if size >= self.buffer_size or monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+            self.commit()
+
+    def flush(self):
+        '''Write all collected data to the DB and clear the buffers.'''
+        self.__flush_table(self.symbols, queries.SYMBOLS_ADD)
+        for name in ('symbol_bigrams', 'words', 'word_bigrams', 'symbol_ngrams', 'word_ngrams'):
+            self.__flush_table(getattr(self, name), queries.UPSERT[name], queries.EDGES[name])
+        self.last_flush = monotonic()
+
+    def __flush_table(self, table: dict, query: str, query_edges=None):
+        '''Write collected items with bulk statements.
+
+        Items with only as_first/as_last are updated as existing (if query_edges is passed).
+        '''
+        counted = []
+        edges_only = []
+        for key, item in table.items():
+            params = (*item, *key) if isinstance(key, tuple) else (*item, key)
+            if query_edges and not item[0]:
+                edges_only.append(params)
+            else:
+                counted.append(params)
+        self.cursor.executemany(query, counted)
+        if query_edges:
+            self.cursor.executemany(query_edges, edges_only)
+        table.clear()
+
+    def rollback(self):
+        '''Drop collected and written data after the last commit.'''
+        for name in (
+            'symbols', 'symbol_bigrams', 'words', 'word_bigrams', 'symbol_ngrams', 'word_ngrams'
+        ):
+            getattr(self, name).clear()
+        super().rollback()
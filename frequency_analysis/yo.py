@@ -0,0 +1,81 @@
+﻿'''Additional module to frequency.py for counting ye/yo word pairs during the analysis.
+
+Pairs of the "yo_words" table are loaded once to the read-only map
+    {word: ((yo ID, ye ID, writing), ...)} (writing: 0 – yo, 1 – ye).
+YoCounter wraps the word writer: counted words of the map add to quantities of their pairs,
+    which are written to the "yo_words" table on flush (right before each commit),
+    so result sheets read them without joining the pairs with the "words" table.
+The map is optional (Analysis(yo_map=True)). Analysis without it sets quantities of pairs
+    to NULL, result sheets then take them from the "words" table; the next analysis with the map
+    sets them from the "words" table once before counting.
+'''
+
+from frequency_analysis import db_create, queries
+
+
+def _exists(db) -> bool:
+    return db.execute(
+        "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'yo_words');"
+    ).fetchone()[0]
+
+
+def load_pairs(db) -> dict:
+    '''Load the map of ye/yo words ({} if there are no pairs).
+
+    Quantities of pairs, which weren't counted (NULL), are set from the "words" table.
+    '''
+    if not _exists(db):
+        return {}
+    if db.execute('SELECT EXISTS(SELECT 1 FROM yo_words WHERE yo_quantity IS NULL);').fetchone()[0]:
+        db_create.yo_quantities(db.cursor())
+        db.commit()
+    pairs: dict = {}
+    for yo_id, ye_id, yo_word, ye_word in db.execute(
+        '''
+        SELECT yo_id, ye_id, yo.word, ye.word
+        FROM yo_words
+        INNER JOIN vocabulary AS yo ON yo.id = yo_id
+        INNER JOIN vocabulary AS ye ON ye.id = ye_id;
+        '''
+    ):
+        pairs.setdefault(yo_word, []).append((yo_id, ye_id, 0))
+        pairs.setdefault(ye_word, []).append((yo_id, ye_id, 1))
+    return {x: tuple(y) for x, y in pairs.items()}
+
+
+def reset_quantities(db):
+    '''Set quantities of pairs to NULL before the analysis without the map.'''
+    if _exists(db):
+        db.execute(
+            'UPDATE yo_words SET yo_quantity = NULL, ye_quantity = NULL '
+            'WHERE yo_quantity IS NOT NULL;'
+        )
+        db.commit()
+
+
+class YoCounter:
+    '''Count writings of ye/yo pairs and pass all words to the word writer.
+
+    A word of several pairs is counted for each of them
+        (pair with the same yo and ye writing gets both quantities).
+    '''
+
+    def __init__(self, pairs: dict, writer):
+        self.pairs = pairs
+        self.writer = writer
+        self.word_edges = writer.word_edges
+        self.counts: dict = {}  # {(yo ID, ye ID): [yo quantity, ye quantity]}
+
+    def word(self, word: str, position: int):
+        '''Count single word. Position is 0 if it isn't counted.'''
+        if (pairs := self.pairs.get(word)) is not None:
+            for yo_id, ye_id, writing in pairs:
+                if (item := self.counts.get((yo_id, ye_id))) is None:
+                    item = self.counts[(yo_id, ye_id)] = [0, 0]
+                item[writing] += 1
+        self.writer.word(word, position)
+
+    def flush(self, cursor):
+        '''Add counted quantities to the DB.'''
+        cursor.executemany(queries.YO_WORD_QUANTITY, ((*y, *x) for x, y in self.counts.items()))
+        self.counts.clear()
@@ -18,5 +18,6 @@ setup(
     keywords='frequency analysis bigram linguistic cryptanalysis',
     packages=['frequency_analysis'],
     install_requires=['xlsxwriter'],
+    extras_require={'numpy': ['numpy'], 'parquet': ['pyarrow']},
     url='https://github.com/uqqu/frequency_analysis',
 )
@@ -0,0 +1 @@
+'''Tests for the frequency_analysis package. Run with "python -m pytest tests".'''
@@ -0,0 +1,28 @@
+'''Shared fixtures. Each analysis of a test is created in its own temp folder.'''
+
+import os
+
+import pytest
+
+from tests.helpers import counts
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    '''Temp folder as the current working directory (Analysis and Result use it for DBs).'''
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope='session')
+def baseline_db():
+    '''DB of the initial version for helpers.SENTENCES counted by count_all(pos=True).'''
+    return os.path.join(DATA, 'baseline.db')
+
+
+@pytest.fixture(scope='session')
+def baseline(baseline_db):
+    '''Counted data of the initial version (see helpers.counts()).'''
+    return counts(baseline_db)
@@ -0,0 +1,85 @@
+'''Reproducible test corpus and reading of the counted data from DBs of any version.'''
+
+import random
+import sqlite3
+
+WORDS = (
+    'The', 'the', 'cat', "don't", 'well-known', 'Ёлка', 'ёлка', 'елка', 'мир', 'Мир', 'x', 'a',
+    'I', "UN's", 'co-op', '--', "it's", '1999', '(see', 'note)', 'end.', 'Hello,', 'world!',
+    '«цитата»', 'тест-драйв', 'e-mail', 'Über', 'and/or', 'всё', 'все', 'осёл', 'осел',
+)
+PUNCTUATION = ('', '', '', '.', ',', '!', '?')
+
+
+def sentences(number=300, seed=1) -> list:
+    '''Generate list of sentences (word lists) with Latin, Cyrillic and punctuation symbols.'''
+    rnd = random.Random(seed)
+    return [
+        [rnd.choice(WORDS) + rnd.choice(PUNCTUATION) for _ in range(rnd.randint(1, 15))]
+        for _ in range(number)
+    ]
+
+
+SENTENCES = sentences()
+
+
+def split_lines(text: str) -> list:
+    '''Sentence splitter of test files with a sentence per line (picklable for workers).'''
+    return text.split('\n')
+
+
+def write_corpus(path):
+    '''Write SENTENCES to the text file (a sentence per line).'''
+    path.write_text('\n'.join(' '.join(x) for x in SENTENCES), encoding='utf-8')
+
+QUERIES = {
+    'symbols': 'SELECT chr, quantity, as_first, as_last, {} FROM symbols',
+    'symbol_bigrams': '''
+        SELECT first_symb || second_symb, quantity, as_first, as_last, {} FROM symbol_bigrams
+    ''',
+    'words': 'SELECT word, quantity, as_first, as_last, {} FROM words',
+    'word_bigrams': {
+        'first_word': '''
+            SELECT first_word || ' ' || second_word, quantity, as_first, as_last, {}
+            FROM word_bigrams
+        ''',
+        'first_id': '''
+            SELECT a.word || ' ' || b.word, quantity, as_first, as_last, {}
+            FROM word_bigrams
+            INNER JOIN vocabulary AS a ON a.id = first_id
+            INNER JOIN vocabulary AS b ON b.id = second_id
+        ''',
+    },
+}
+
+
+def counts(path: str) -> dict:
+    '''Return {table: {key: (quantity, as_first, as_last, average position)}} of the DB.
+
+    Works with DBs of the initial version (REAL average "position") and of the current one
+        ("position_sum"). Average position is None for items with zero quantity and the space.
+    '''
+    db = sqlite3.connect(path)
+    result = {}
+    for table, query in QUERIES.items():
+        columns = [x[1] for x in db.execute(f'PRAGMA table_info({table});')]
+        if isinstance(query, dict):
+            query = query['first_id' if 'first_id' in columns else 'first_word']
+        position = 'position_sum * 1.0 / quantity' if 'position_sum' in columns else 'position'
+        result[table] = {
+            key: (*values, None if not values[0] or key == ' ' else average)
+            for key, *values, average in db.execute(query.format(position))
+        }
+    db.close()
+    return result
+
+
+def assert_same_counts(actual: dict, expected: dict):
+    '''Compare quantities and edge counters exactly, average positions approximately.'''
+    for table, items in expected.items():
+        assert {x: y[:3] for x, y in actual[table].items()} == {
+            x: y[:3] for x, y in items.items()
+        }, table
+        for key, values in items.items():
+            if values[3] is not None:
+                assert abs(actual[table][key][3] - values[3]) < 1e-9, (table, key)
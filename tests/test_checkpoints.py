@@ -0,0 +1,62 @@
+'''Continuation of the analysis (mode 'c') from the persisted checkpoints.'''
+
+import sqlite3
+from copy import copy
+from itertools import count
+
+import pytest
+
+from frequency_analysis import Analysis, dense
+from tests.helpers import SENTENCES, assert_same_counts, counts, split_lines, write_corpus
+
+
+def interrupt(analysis, sentences: int):
+    '''Raise KeyboardInterrupt on splitting of the sentence with the number (from 0).'''
+    tokenizer = copy(analysis.tokenizer)
+    split = tokenizer.split
+    calls = count()
+
+    def interrupted(word_list):
+        if next(calls) == sentences:
+            raise KeyboardInterrupt
+        return split(word_list)
+
+    tokenizer.split = interrupted
+    analysis.tokenizer = tokenizer
+
+
+def test_continue_stream(workdir, baseline):
+    with Analysis('result', buffer_size=50) as analysis:
+        analysis.count_stream(SENTENCES[:150], pos=True, batch_size=40, source='corpus')
+    with Analysis('result', mode='c', buffer_size=50) as analysis:
+        analysis.count_stream(SENTENCES, pos=True, batch_size=40, source='corpus')
+    assert_same_counts(counts(workdir / 'result' / 'result.db'), baseline)
+
+
+@pytest.mark.parametrize(
+    'options', ({}, {'buffer_size': 50}, {'symbol_backend': 'numpy', 'buffer_size': 50})
+)
+def test_continue_interrupted_file(workdir, baseline, options):
+    '''Data of the interrupted batch is rolled back and counted once on continuation.'''
+    if options.get('symbol_backend') == 'numpy' and dense.np is None:
+        pytest.skip('numpy is not installed')
+    path = workdir / 'corpus.txt'
+    write_corpus(path)
+    with pytest.raises(KeyboardInterrupt):
+        with Analysis('result', **options) as analysis:
+            interrupt(analysis, 250)
+            analysis.count_file(str(path), split_lines, pos=True, read_size=500, batch_size=20)
+    with Analysis('result', mode='c', **options) as analysis:
+        analysis.count_file(str(path), split_lines, pos=True, read_size=500, batch_size=20)
+    assert_same_counts(counts(workdir / 'result' / 'result.db'), baseline)
+
+
+def test_interrupted_workers(workdir):
+    '''Shards of worker processes aren't merged after an error.'''
+    with pytest.raises(KeyboardInterrupt):
+        with Analysis('result', workers=2, chunk_size=40) as analysis:
+            analysis.count_stream(SENTENCES, pos=True)
+            raise KeyboardInterrupt
+    db = sqlite3.connect(workdir / 'result' / 'result.db')
+    assert db.execute('SELECT COUNT(*) FROM words;').fetchone()[0] == 0
+    assert sorted(x.name for x in (workdir / 'result').iterdir()) == ['result.db']
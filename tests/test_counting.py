@@ -0,0 +1,49 @@
+'''Each counting path must give the same counts as the initial version.'''
+
+import pytest
+
+from frequency_analysis import Analysis, dense
+from tests.helpers import SENTENCES, assert_same_counts, counts, split_lines, write_corpus
+
+PATHS = {
+    'row': {},
+    'accumulator': {'buffer_size': 50},
+    'numpy': {'symbol_backend': 'numpy'},
+    'numpy accumulator': {'symbol_backend': 'numpy', 'buffer_size': 50},
+    'parallel': {'workers': 2, 'chunk_size': 40},
+}
+
+
+@pytest.fixture(params=PATHS)
+def options(request):
+    if 'numpy' in request.param and dense.np is None:
+        pytest.skip('numpy is not installed')
+    return PATHS[request.param]
+
+
+def test_count_all(workdir, baseline, options):
+    with Analysis('result', **options) as analysis:
+        for sentence in SENTENCES:
+            analysis.count_all(list(sentence), pos=True)
+    assert_same_counts(counts(workdir / 'result' / 'result.db'), baseline)
+
+
+def test_count_stream(workdir, baseline, options):
+    with Analysis('result', **options) as analysis:
+        analysis.count_stream(SENTENCES, pos=True, batch_size=37)
+    assert_same_counts(counts(workdir / 'result' / 'result.db'), baseline)
+
+
+def test_count_file(workdir, baseline, options):
+    path = workdir / 'corpus.txt'
+    write_corpus(path)
+    with Analysis('result', **options) as analysis:
+        analysis.count_file(str(path), split_lines, pos=True, read_size=500, batch_size=37)
+    assert_same_counts(counts(workdir / 'result' / 'result.db'), baseline)
+
+
+def test_input_is_not_changed(workdir):
+    sentence = ['and/or', 'cat.']
+    with Analysis('result') as analysis:
+        analysis.count_all(sentence, pos=True)
+    assert sentence == ['and/or', 'cat.']
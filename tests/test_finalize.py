@@ -0,0 +1,43 @@
+'''Report preparation of the finished analysis.'''
+
+import sqlite3
+
+from frequency_analysis import Analysis, db_create
+from tests.helpers import SENTENCES, counts
+
+
+def prepared(path) -> set:
+    '''Return names of the report indexes and planner statistics tables of the DB.'''
+    db = sqlite3.connect(path)
+    names = {
+        x
+        for x, in db.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE '%_by_quantity' "
+            "OR name LIKE 'sqlite_stat%';"
+        )
+    }
+    db.close()
+    return names
+
+
+def test_indexes_are_dropped_before_counting(workdir):
+    folder = workdir / 'result'
+    with Analysis('result', finalize=True) as analysis:
+        analysis.count_stream(SENTENCES[:100])
+    assert prepared(folder / 'result.db') >= set(db_create.INDEXES)
+    assert prepared(folder / 'result_compact.db') == prepared(folder / 'result.db')
+    with Analysis('result', mode='a') as analysis:
+        analysis.count_stream(SENTENCES[100:])
+    assert not prepared(folder / 'result.db')
+
+
+def test_repeated_finalize(workdir):
+    folder = workdir / 'result'
+    with Analysis('result', finalize=True) as analysis:
+        analysis.count_stream(SENTENCES[:100])
+    for start, end in ((100, 200), (200, None)):
+        with Analysis('result', mode='a', finalize=True) as analysis:
+            analysis.count_stream(SENTENCES[start:end])
+        assert counts(folder / 'result_compact.db') == counts(folder / 'result.db')
+    assert Analysis('result').finalize().keys() == {'indexes', 'analyze', 'vacuum'}
+    assert sorted(x.name for x in folder.iterdir()) == ['result.db', 'result_compact.db']
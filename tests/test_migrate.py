@@ -0,0 +1,45 @@
+'''Conversion of DBs of the initial version.'''
+
+import shutil
+import sqlite3
+
+from frequency_analysis import Analysis
+from tests.helpers import SENTENCES, assert_same_counts, counts
+
+POSITION_SUMS = (
+    'SELECT chr, quantity, position_sum FROM symbols ORDER BY 1;',
+    '''
+    SELECT first_symb, second_symb, quantity, position_sum FROM symbol_bigrams ORDER BY 1, 2;
+    ''',
+    '''
+    SELECT word, quantity, position_sum FROM words
+    UNION ALL
+    SELECT a.word || ' ' || b.word, quantity, position_sum
+    FROM word_bigrams
+    INNER JOIN vocabulary AS a ON a.id = first_id
+    INNER JOIN vocabulary AS b ON b.id = second_id
+    ORDER BY 1;
+    ''',
+)
+
+
+def test_migrate_baseline(workdir, baseline_db, baseline):
+    (workdir / 'old').mkdir()
+    shutil.copy(baseline_db, workdir / 'old' / 'result.db')
+    with Analysis('old', mode='a'):
+        pass
+    assert_same_counts(counts(workdir / 'old' / 'result.db'), baseline)
+
+
+def test_migrated_positions(workdir, baseline_db):
+    '''Position sums of the converted DB are the same as of the new analysis.'''
+    (workdir / 'old').mkdir()
+    shutil.copy(baseline_db, workdir / 'old' / 'result.db')
+    with Analysis('old', mode='a'):
+        pass
+    with Analysis('new') as analysis:
+        for sentence in SENTENCES:
+            analysis.count_all(list(sentence), pos=True)
+    for query in POSITION_SUMS:
+        migrated = sqlite3.connect(workdir / 'old' / 'result.db').execute(query).fetchall()
+        assert migrated == sqlite3.connect(workdir / 'new' / 'result.db').execute(query).fetchall()
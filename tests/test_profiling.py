@@ -0,0 +1,32 @@
+'''Profiling of the result sheets.'''
+
+import os
+
+import pytest
+
+from frequency_analysis import Analysis, Result
+from tests.helpers import SENTENCES
+
+
+@pytest.fixture
+def analysis(workdir):
+    with Analysis('result', word_ngrams=(1, 2, 3)) as result:
+        result.count_stream(SENTENCES, pos=True)
+    return 'result'
+
+
+def profile_treat(name: str, workers: int) -> dict:
+    with Result(name, profile=True) as result:
+        result.treat(workers=workers)
+    os.remove(os.path.join(name, 'result.xlsx'))
+    return result.stats()
+
+
+def test_treat_workers(analysis):
+    '''Selections of worker connections are counted and timed for their sheets.'''
+    single = profile_treat(analysis, 1)
+    concurrent = profile_treat(analysis, 3)
+    assert concurrent['statements']['SELECT'] == single['statements']['SELECT']
+    assert concurrent['sheets'].keys() == single['sheets'].keys()
+    assert all(x['worker_query_seconds'] == 0 for x in single['sheets'].values())
+    assert all(x['worker_query_seconds'] > 0 for x in concurrent['sheets'].values())
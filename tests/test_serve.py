@@ -0,0 +1,105 @@
+'''Endpoints of the HTTP query server.'''
+
+import asyncio
+import json
+import sqlite3
+from urllib.parse import quote
+
+import pytest
+
+from frequency_analysis import Analysis
+from frequency_analysis.serve import Server
+from tests.helpers import SENTENCES
+
+
+async def request(port: int, target: str, method='GET') -> tuple:
+    '''Send the request over a new connection and return (status, JSON of the response).'''
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {target} HTTP/1.1\r\nConnection: close\r\n\r\n'.encode())
+    head, _, body = (await reader.read()).partition(b'\r\n\r\n')
+    writer.close()
+    return int(head.split()[1]), json.loads(body)
+
+
+def run(name: str, *targets) -> list:
+    '''Start the server on a free port and return responses of the requests in order.'''
+
+    async def main():
+        server = Server(name, connections=2)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return [await request(port, *x) for x in targets]
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def analysis(workdir):
+    with Analysis('result') as result:
+        result.count_stream(SENTENCES)
+    return 'result'
+
+
+def test_lookups(analysis, baseline):
+    words = baseline['words']
+    top = sorted(words.items(), key=lambda x: (-x[1][0], x[0]))
+    responses = run(
+        analysis,
+        ('/word?word=The',),
+        (f'/words?word=cat&word={quote("мир")}&word=missing',),
+        ('/bigram?first=the&second=cat',),
+        ('/symbol?symbol=a',),
+        ('/top?n=3',),
+        (f'/top?n=2&prefix={quote("ос")}',),
+        ('/stats',),
+    )
+    assert responses[0] == (200, {'word': 'The', 'quantity': words['the'][0]})
+    assert responses[1] == (
+        200, {'cat': words['cat'][0], 'мир': words['мир'][0], 'missing': 0}
+    )
+    assert responses[2] == (
+        200,
+        {
+            'first': 'the',
+            'second': 'cat',
+            'quantity': baseline['word_bigrams'].get('the cat', (0,))[0],
+        },
+    )
+    assert responses[3] == (200, {'symbol': 'a', 'quantity': baseline['symbols']['a'][0]})
+    assert responses[4] == (200, {'words': [[x, y[0]] for x, y in top[:3]]})
+    assert responses[5] == (
+        200, {'words': [[x, y[0]] for x, y in top if x.startswith('ос')][:2]}
+    )
+    status, stats = responses[6]
+    assert status == 200
+    assert stats['endpoints']['/word']['count'] == 1
+    assert stats['batching'] == {'batches': 1, 'lookups': 1}
+
+
+def test_errors(analysis):
+    responses = run(
+        analysis,
+        ('/unknown',),
+        ('/word?word=cat', 'POST'),
+        ('/word',),
+        ('/top?n=0',),
+    )
+    assert [x[0] for x in responses] == [404, 405, 400, 400]
+    assert responses[2][1] == {'error': "Missing parameter 'word'"}
+
+
+def test_store_error(analysis):
+    db = sqlite3.connect(f'{analysis}/result.db')
+    db.execute('DROP TABLE word_bigrams;')
+    db.commit()
+    db.close()
+    responses = run(analysis, ('/bigram?first=the&second=cat',), ('/word?word=cat',))
+    assert responses[0] == (
+        500, {'error': 'OperationalError: no such table: word_bigrams'}
+    )
+    assert responses[1][0] == 200